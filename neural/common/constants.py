@@ -49,10 +49,55 @@ Constants:
     ALPACA_ACCEPTED_DOWNLOAD_RESOLUTIONS (set):
         The accepted download resolutions for Alpaca API. Accepted
         resolutions are 1Min, 5Min, 15Min, and 30Min.
+    ALPACA_DOWNLOAD_ROW_BUDGET (int):
+        The default maximum estimated number of rows downloaded from
+        Alpaca API with a single request. Consecutive market days are
+        grouped into one request up to this budget. Alpaca API returns
+        at most 10,000 rows per page, so this also bounds the number of
+        pages fetched per request.
     HDF5_DEFAULT_MAX_ROWS (int):
         The default maximum number of rows for HDF5 storage. Note hdf5
         files occupy a contiguous block of memory and they have size of
         HDF5_DEFAULT_MAX_ROWS even when empty.
+    HDF5_DEFAULT_EXTENT_ROWS (int):
+        The default number of rows HDF5 datasets are grown by when
+        appending. Growing in large extents avoids resizing the dataset
+        for every appended market day.
+    HDF5_DEFAULT_CHUNK_SIZE (int):
+        The default maximum size of a chunk of HDF5 datasets in bytes.
+        Chunks hold whole market days up to this size, or equal parts
+        of a day if a day is larger. Chunks up to 1 MB fit in the
+        default chunk cache of h5py.
+    HDF5_ACCEPTED_COMPRESSIONS (set):
+        The accepted compression filters of HDF5 datasets. lzf is fast
+        and ships with h5py, gzip compresses more at a higher read
+        cost.
+    HDF5_DEFAULT_CHECKPOINT_INTERVAL (int):
+        The default number of market days appended between metadata
+        commits when downloading datasets. Lower values lose less
+        progress when a download is interrupted, higher values spend
+        less time writing metadata.
+    MEMMAP_DATA_FILE_EXTENSION (str):
+        The file extension of raw row-major data files written by the
+        memory-mapped feature store. Each dataset is stored in a file
+        named <dataset_name><MEMMAP_DATA_FILE_EXTENSION>.
+    MEMMAP_METADATA_FILE_EXTENSION (str):
+        The file extension of sidecar metadata files written by the
+        memory-mapped feature store. The sidecar holds the dataset
+        metadata, shape and data type of its data file.
+    METADATA_VERSION (int):
+        The version of the JSON document that dataset metadata is
+        serialized to in HDF5 attributes and memory-mapped sidecar
+        files. Incremented when the layout of the document changes.
+    CHECKPOINT_FILE_EXTENSION (str):
+        The file extension of checkpoint files written next to HDF5
+        files by downloaders. A checkpoint of <file_path> is stored in
+        <file_path><CHECKPOINT_FILE_EXTENSION> and records the last
+        committed append of each dataset in the file.
+    DOWNLOAD_CACHE_DEFAULT_MAX_SIZE (int):
+        The default maximum size of a download cache in bytes. Least
+        recently used entries are evicted once the cache exceeds this
+        size.
     ACCEPTED_OBSERVATION_TYPES (set):
         The accepted observation types in this library. Accepted types
         are numpy arrays and dictionaries. If a dictionary is passed,
@@ -104,7 +149,17 @@ ALPACA_ACCEPTED_DOWNLOAD_RESOLUTIONS = {
     Resolution(15, Resolution.Unit.MINUTE),
     Resolution(30, Resolution.Unit.MINUTE)
     }
+ALPACA_DOWNLOAD_ROW_BUDGET = 100_000
 HDF5_DEFAULT_MAX_ROWS = 5_000_000
+HDF5_DEFAULT_EXTENT_ROWS = 100_000
+HDF5_DEFAULT_CHECKPOINT_INTERVAL = 20
+HDF5_DEFAULT_CHUNK_SIZE = 1_000_000  # 1 MB
+HDF5_ACCEPTED_COMPRESSIONS = {'lzf', 'gzip'}
+MEMMAP_DATA_FILE_EXTENSION = '.dat'
+MEMMAP_METADATA_FILE_EXTENSION = '.meta'
+METADATA_VERSION = 1
+CHECKPOINT_FILE_EXTENSION = '.checkpoint'
+DOWNLOAD_CACHE_DEFAULT_MAX_SIZE = 10_000_000_000  # 10 GB
 
 ACCEPTED_OBSERVATION_TYPES = {np.ndarray, dict}
 ACCEPTED_ACTION_TYPES = {np.ndarray, dict}
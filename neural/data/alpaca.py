@@ -42,29 +42,40 @@ Classes:
         A class to process financial data from the Alpaca API.
 ------------
 """
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from itertools import islice
 import os
-from typing import List, Optional, Dict
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
-from neural.client.alpaca import AlpacaDataClient
 from neural.common.constants import (ALPACA_ACCEPTED_DOWNLOAD_RESOLUTIONS,
-                                     GLOBAL_DATA_TYPE)
+                                     ALPACA_DOWNLOAD_ROW_BUDGET,
+                                     GLOBAL_DATA_TYPE,
+                                     HDF5_DEFAULT_CHECKPOINT_INTERVAL)
+from neural.common.exceptions import CorruptDataError
 from neural.common.log import logger
 from neural.data.base import (AbstractDataType, AbstractAsset, DatasetMetadata,
                               DataSchema)
 from neural.data.enums import AssetType, CalendarType, FeatureType
 from neural.utils.base import (progress_bar, validate_path, RunningStatistics)
-from neural.utils.io import to_hdf5
+from neural.utils.io import (DownloadCache, HDF5Writer, from_checkpoint,
+                             repair_hdf5_dataset)
 from neural.utils.misc import resolution_to_timeframe
 from neural.utils.time import Resolution
 
+if TYPE_CHECKING:
+    from neural.client.alpaca import AlpacaDataClient
+
 
-class AlpacaDataType(Enum, AbstractDataType):
+class AlpacaDataType(AbstractDataType, Enum):
     """
     Shows the types of data that can be downloaded from the Alpaca API.
     Each type has certain column schema that can be used to extract
@@ -156,7 +167,7 @@ class AlpacaDataType(Enum, AbstractDataType):
                 A dictionary that maps the column names to the feature
                 types.
         """
-        return AlpacaDataType.COLUMN_SCHEMA[self]
+        return AlpacaDataType.COLUMN_SCHEMA.value[self.value]
 
     COLUMN_SCHEMA = {
         BAR: {
@@ -188,8 +199,8 @@ class AlpacaAsset(AbstractAsset):
     https://alpaca.markets/. This can be a stock, or cryptocurrency.
     This class standardizes the representation of assets in Alpaca API.
     Natively encodes the mechanics for opening and closing positions.
-    When creating nonmarginable assets, maintenance_margin, shortable,
-    and easy_to_borrow attributes are set to None by default.
+    When creating nonmarginable assets, maintenance_margin is None by
+    default, and shortable and easy_to_borrow are set to False.
 
     Attributes:
     ----------
@@ -217,11 +228,14 @@ class AlpacaAsset(AbstractAsset):
             You can then buy the asset at a lower price and return it to
             the brokerage. This form of trading allows making profit in
             a bear market. More info here:
-            https://www.investopedia.com/terms/s/shortselling.asp.
+            https://www.investopedia.com/terms/s/shortselling.asp. In
+            Alpaca API shorted assets cannot have faractional
+            quantities. Always False for nonmarginable assets.
         easy_to_borrow (bool):
             A boolean indicating whether the asset can be borrowed
             easily. Alpaca API has restrictive rules for hard to borrow
-            assets and in general HTB assets cannot be shorted.
+            assets and in general HTB assets cannot be shorted. Always
+            False for nonmarginable assets.
         maintenance_margin (float | None):
             A float representing the maintenance margin of the asset.
             This means that maintenace_margin * position value should be
@@ -234,14 +248,6 @@ class AlpacaAsset(AbstractAsset):
             Alpaca API in reality enforces this at the end of day or
             when it is violated by a greate extent.
 
-    Properties:
-    -----------
-        shortable (bool | None):
-            A boolean indicating whether the asset can be sold short.
-        easy_to_borrow (bool | None):
-            A boolean indicating whether the asset can be borrowed
-            easily.
-
     Methods:
     --------
         get_initial_margin(self, short: bool = False) -> float | None:
@@ -250,6 +256,10 @@ class AlpacaAsset(AbstractAsset):
             -> (float | None)
             A float representing the maintenance margin
             of the asset.
+        get_maintenance_margins(self, prices: np.ndarray, short:
+        np.ndarray) -> np.ndarray
+            An array of maintenance margins of the asset for arrays of
+            prices and position sides.
 
     Notes:
     ------
@@ -272,39 +282,17 @@ class AlpacaAsset(AbstractAsset):
     shortable: Optional[bool] = None
     easy_to_borrow: Optional[bool] = None
 
-    @property
-    def shortable(self) -> bool | None:
-        """
-        A boolean indicating whether the asset can be sold short (i.e.,
-        sold before buying to profit from a price decrease). In Alpaca
-        API shorted assets cannot have faractional quantities. Also if
-        asset is not marginable it cannot be shorted. There are rare
-        cases where non-marginable assets can be shorted, but this is
-        not supported by this library due to the complexity of the
-        process.
-
-        Returns:
-        --------
-            bool:
-                A boolean indicating whether the asset can be sold
-                short.
-        """
-        return self.shortable if self.marginable else False
-
-    @property
-    def easy_to_borrow(self) -> bool | None:
+    def __post_init__(self) -> None:
         """
-        A boolean indicating whether the asset can be borrowed easily.
-        Alpaca API has restrictive rules for hard to borrow assets and
-        in general HTB assets cannot be shorted.
-
-        Returns:
-        --------
-            bool:
-                A boolean indicating whether the asset can be borrowed
-                easily.
+        Sets shortable and easy_to_borrow to False for nonmarginable
+        assets. There are rare cases where non-marginable assets can be
+        shorted, but this is not supported by this library due to the
+        complexity of the process.
         """
-        return self.easy_to_borrow if self.marginable else False
+        if not self.marginable:
+            object.__setattr__(self, 'shortable', False)
+            object.__setattr__(self, 'easy_to_borrow', False)
+        return None
 
     def get_initial_margin(self, short: bool = False) -> float | None:
         """
@@ -360,6 +348,8 @@ class AlpacaAsset(AbstractAsset):
         nonmarginable assets is 0. Since nonmarginable assets cannot be
         margined this is an abuse of terminalogy to provide a convenient
         interface for working with marginable and onnmarginable assets.
+        Since initial margin of nonmarginable assets is 1, their
+        maintenance margin is at least 1.
         
         Default maintenance marigin is the maintenance margin that
         Alpaca API reports by default. maintenance margin attribute is
@@ -437,11 +427,59 @@ class AlpacaAsset(AbstractAsset):
                 elif price >= 5.00:
                     return max(5.0 / price, 0.3)
 
-        required_margin = max(self.maintenance_margin,
-                              default_maintenance_margin(price, short),
+        required_margin = max(default_maintenance_margin(price, short),
                               self.get_initial_margin(short))
+        if self.maintenance_margin is not None:
+            required_margin = max(required_margin, self.maintenance_margin)
         return required_margin
 
+    def get_maintenance_margins(self, prices: np.ndarray,
+                                short: np.ndarray) -> np.ndarray:
+        """
+        Array counterpart of get_maintenance_margin. Computes the
+        maintenance margin of the asset for arrays of prices and
+        position sides with the same rules, namely the maximum of the
+        default maintenance margin, initial margin and maintenance
+        margin attribute. Used by offline backtests to compute margin
+        requirements of many time steps at once. If maintenance margin
+        attribute is None it is ignored, like in
+        get_maintenance_margin.
+
+        Args:
+        -----
+            prices (np.ndarray):
+                An array of prices of the asset.
+            short (np.ndarray):
+                A boolean array broadcastable to prices indicating
+                whether the position is short.
+
+        Returns:
+        --------
+            np.ndarray:
+                An array of maintenance margins with the broadcast
+                shape of prices and short.
+        """
+        prices = np.asarray(prices)
+        short = np.asarray(short, dtype=bool)
+
+        if not self.marginable:
+            default_margins = np.zeros(np.broadcast(prices, short).shape)
+            initial_margins = 1
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                default_margins = np.where(
+                    short,
+                    np.where(prices < 5.00, np.maximum(2.5 / prices, 1.0),
+                             np.maximum(5.0 / prices, 0.3)),
+                    np.where(prices >= 2.50, 0.3, 1.0))
+            initial_margins = np.where(short, 1.5, 0.5)
+
+        required_margins = np.maximum(default_margins, initial_margins)
+        if self.maintenance_margin is not None:
+            required_margins = np.maximum(required_margins,
+                                          self.maintenance_margin)
+        return required_margins
+
 
 class AlpacaDataDownloader():
     """
@@ -450,6 +488,10 @@ class AlpacaDataDownloader():
     basis and saved to disk in an HDF5 file. The download later can be
     resumed for consecutive market days. The data is downloaded in daily
     chunks to avoid exceeding the memory limit and saving progress.
+    Consecutive days are downloaded together in windows
+    sized by a row budget to reduce the number of requests, and
+    multiple windows can be downloaded concurrently, while days are
+    still written to disk one by one in calendar order.
 
     Attributes:
     ----------
@@ -457,6 +499,10 @@ class AlpacaDataDownloader():
             An instance of the AlpacaDataClient class. This is
             responsible for communicating with the Alpaca API and
             providing the basic facility to download data.
+        cache (Optional[DownloadCache]):
+            An optional on-disk cache of raw datasets, keyed by dataset
+            type, symbol, resolution and market day. If provided, only
+            symbols and days missing from the cache are downloaded.
 
     Methods:
     -------
@@ -472,6 +518,22 @@ class AlpacaDataDownloader():
             dataframe downloaded from the API. Typically daily data is
             downloaded in chunks using this method and saved to disk day
             by day. This is to avoid memory issues and to save progress.
+        _get_download_windows:
+            Groups consecutive market days of a schedule into download
+            windows sized by an estimated row budget.
+        _split_dataset:
+            Splits raw dataset of a download window into raw datasets
+            of its market days.
+        _download_window:
+            Downloads raw dataset of a download window, serving symbols
+            from the cache when all their market days are cached.
+        _download_datasets:
+            Downloads raw datasets for consecutive market days of a
+            schedule, keeping a bounded number of requests in flight on
+            a thread pool and yielding the results in calendar order.
+        _process_dataset:
+            Processes raw dataset of a single market day into a
+            features dataframe with one block of columns per symbol.
         download_to_hdf5: 
             Downloads financial features data for the given symbols and
             saves it in an HDF5 file format. Ensures the data is
@@ -479,7 +541,9 @@ class AlpacaDataDownloader():
             a consistent format, supported by the library.
     """
 
-    def __init__(self, data_client: AlpacaDataClient) -> None:
+    def __init__(self,
+                 data_client: AlpacaDataClient,
+                 cache: Optional[DownloadCache] = None) -> None:
         """
         Initializes the AlpacaDataFetcher class.
 
@@ -489,8 +553,14 @@ class AlpacaDataDownloader():
                 An instance of the AlpacaDataClient class. This is
                 responsible for communicating with the Alpaca API and
                 providing the basic facilities to download data.
+            cache (Optional[DownloadCache]):
+                An optional on-disk cache of raw datasets. Raw data of
+                each symbol and market day is stored in the cache after
+                download, and rebuilding datasets with cached symbols
+                and days does not access the network. Default is None.
         """
         self.data_client = data_client
+        self.cache = cache
 
         return None
 
@@ -532,13 +602,13 @@ class AlpacaDataDownloader():
 
     def download_dataset(
         self,
-        dataset_type: AlpacaDataSource.DatasetType,
+        dataset_type: AlpacaDataType,
         asset_type: AssetType,
-        symbols: List[AlpacaAsset],
+        symbols: List[str],
         resolution: Resolution,
         start: datetime,
         end: datetime,
-    ) -> None:
+    ) -> pd.DataFrame:
         """
         Downloads raw dataset from the Alpaca API. This is a dataframe
         downloaded from the API. Note that in Alpaca API the download
@@ -605,15 +675,479 @@ class AlpacaDataDownloader():
 
         return dataset
 
+    def _get_download_windows(
+        self,
+        schedule: pd.DataFrame,
+        dataset_type: AlpacaDataType,
+        n_symbols: int,
+        resolution: Resolution,
+        row_budget: int,
+    ) -> List[pd.DataFrame]:
+        """
+        Groups consecutive market days of the schedule into download
+        windows. Each window is downloaded with a single request and
+        later split back into market days. A request returns bars over
+        the whole wall-clock span of the window, including extended
+        hours bars between market days, so rows of a window are
+        estimated as the number of resolution intervals from the start
+        of its first day to the end of its last day, both ends included,
+        times the number of symbols. Days are added to a window greedily
+        until the estimated rows of the window would exceed the row
+        budget. A window always contains at least one market day, so
+        days that on their own exceed the budget are downloaded
+        individually.
+
+        Args:
+        ----------
+            schedule (pd.DataFrame):
+                The schedule of market days to download with 'start'
+                and 'end' columns.
+            dataset_type (AlpacaDataType):
+                The type of dataset to download. Rows of trades and
+                quotes cannot be estimated from resolution, so for
+                these dataset types each window is a single market day.
+            n_symbols (int):
+                The number of symbols downloaded in each request.
+            resolution (Resolution):
+                The frequency at which to sample the data.
+            row_budget (int):
+                The maximum estimated number of rows in a window.
+
+        Returns:
+        ----------
+            List[pd.DataFrame]:
+                Consecutive slices of the schedule, one for each
+                download window.
+        """
+        if dataset_type != AlpacaDataType.BAR:
+            return [schedule.iloc[[index]] for index in range(len(schedule))]
+
+        starts = schedule['start'].to_numpy()
+        ends = schedule['end'].to_numpy()
+        resolution_timedelta = resolution.pandas_timedelta.to_timedelta64()
+
+        windows = list()
+        window_start = 0
+        for index in range(1, len(schedule)):
+            window_rows = ((ends[index] - starts[window_start]) //
+                           resolution_timedelta + 1) * n_symbols
+            if window_rows > row_budget:
+                windows.append(schedule.iloc[window_start:index])
+                window_start = index
+        windows.append(schedule.iloc[window_start:])
+
+        return windows
+
+    def _split_dataset(
+        self,
+        dataset: pd.DataFrame,
+        window: pd.DataFrame,
+    ) -> Iterator[Tuple[datetime, datetime, pd.DataFrame]]:
+        """
+        Splits raw dataset of a download window into raw datasets of
+        its market days. Rows with timestamps in [start, end) of a
+        market day are assigned to that day. Rows outside of market
+        hours, such as extended hours bars between consecutive market
+        days, are dropped.
+
+        Args:
+        ----------
+            dataset (pd.DataFrame):
+                The raw dataset downloaded for the window, indexed by
+                symbol and timestamp.
+            window (pd.DataFrame):
+                The slice of the schedule the dataset was downloaded
+                for.
+
+        Yields:
+        ----------
+            Tuple[datetime, datetime, pd.DataFrame]:
+                The start and end of the market day and the raw dataset
+                of that day, in calendar order.
+        """
+        if len(window) == 1:
+            start, end = window.values[0]
+            yield start, end, dataset
+            return None
+
+        day_indices = self._get_day_indices(dataset=dataset, window=window)
+        for day_index, (start, end) in enumerate(window.values):
+            yield start, end, dataset[day_indices == day_index]
+
+        return None
+
+    def _get_day_indices(self, dataset: pd.DataFrame,
+                         window: pd.DataFrame) -> np.ndarray:
+        """
+        Returns the index of the market day of the window that each row
+        of the dataset belongs to, namely the day whose [start, end)
+        range contains the timestamp of the row. Rows outside of market
+        hours get an index of -1.
+        """
+        timestamps = dataset.index.get_level_values('timestamp')
+        day_indices = window['start'].searchsorted(timestamps,
+                                                   side='right') - 1
+        ends = window['end'].to_numpy()[day_indices.clip(min=0)]
+        day_indices[(day_indices < 0) | (timestamps >= ends)] = -1
+        return day_indices
+
+    def _download_window(
+        self,
+        window: pd.DataFrame,
+        dataset_type: AlpacaDataType,
+        asset_type: AssetType,
+        symbols: List[str],
+        resolution: Resolution,
+    ) -> pd.DataFrame:
+        """
+        Downloads raw dataset of a download window. If a cache is set,
+        symbols with all market days of the window in the cache are
+        read from the cache, and only the remaining symbols are
+        downloaded with a single request. Downloaded data is split by
+        symbol and market day and stored in the cache, including empty
+        data of symbols that did not trade in a day.
+
+        Args:
+        ----------
+            window (pd.DataFrame):
+                The slice of the schedule to download.
+            dataset_type (AlpacaDataType):
+                The type of dataset to download.
+            asset_type (AssetType):
+                The type of asset to download data for.
+            symbols (List[str]):
+                The list of symbol names to download features data for.
+            resolution (Resolution):
+                The frequency at which to sample the data.
+
+        Returns:
+        ----------
+            dataset (pd.DataFrame):
+                The raw dataset of the window, indexed by symbol and
+                timestamp. When read from the cache, rows outside of
+                market hours are not included.
+        """
+        start, end = window['start'].iloc[0], window['end'].iloc[-1]
+        if self.cache is None:
+            return self.download_dataset(dataset_type=dataset_type,
+                                         asset_type=asset_type,
+                                         symbols=symbols,
+                                         resolution=resolution,
+                                         start=start,
+                                         end=end)
+
+        def get_key(symbol, day_start):
+            return (dataset_type.value, symbol, str(resolution),
+                    pd.Timestamp(day_start).isoformat())
+
+        datasets = list()
+        missing_symbols = list()
+        for symbol in symbols:
+            symbol_datasets = list()
+            for day_start in window['start']:
+                dataset = self.cache.get(get_key(symbol, day_start))
+                if dataset is None:
+                    missing_symbols.append(symbol)
+                    break
+                symbol_datasets.append(dataset)
+            else:
+                datasets.extend(symbol_datasets)
+
+        if missing_symbols:
+            dataset = self.download_dataset(dataset_type=dataset_type,
+                                            asset_type=asset_type,
+                                            symbols=missing_symbols,
+                                            resolution=resolution,
+                                            start=start,
+                                            end=end)
+            day_indices = self._get_day_indices(dataset=dataset,
+                                                window=window)
+            symbol_values = dataset.index.get_level_values('symbol')
+            groups = pd.Series(np.arange(len(dataset))).groupby(
+                [symbol_values, day_indices]).indices
+
+            for symbol in missing_symbols:
+                for day_index, day_start in enumerate(window['start']):
+                    positions = groups.get((symbol, day_index), [])
+                    symbol_dataset = dataset.iloc[positions]
+                    self.cache.put(get_key(symbol, day_start), symbol_dataset)
+                    datasets.append(symbol_dataset)
+
+        dataset = pd.concat(datasets)
+
+        return dataset
+
+    def _download_datasets(
+        self,
+        schedule: pd.DataFrame,
+        n_workers: int,
+        row_budget: int,
+        dataset_type: AlpacaDataType,
+        asset_type: AssetType,
+        symbols: List[str],
+        resolution: Resolution,
+    ) -> Iterator[Tuple[datetime, datetime, pd.DataFrame]]:
+        """
+        Downloads raw datasets for market days in the schedule and
+        yields them in calendar order. Consecutive market days are
+        grouped into download windows of at most row_budget estimated
+        rows, such that each window is downloaded with a single request
+        and split back into market days. Windows are submitted to a
+        thread pool of n_workers threads and at most n_workers windows
+        are in flight at any time. Results are consumed in the order of
+        submission, so a window that finishes early waits for the
+        windows before it. This keeps the memory footprint bounded by
+        n_workers windows, while the network latency of consecutive
+        requests overlaps. Downloading is I/O bound and the requests
+        release the GIL while waiting on the network, so threads are
+        sufficient to overlap them.
+
+        Args:
+        ----------
+            schedule (pd.DataFrame):
+                The schedule of market days to download with 'start'
+                and 'end' columns.
+            n_workers (int):
+                The maximum number of windows downloaded concurrently.
+            row_budget (int):
+                The maximum estimated number of rows in a window.
+            dataset_type (AlpacaDataType):
+                The type of dataset to download.
+            asset_type (AssetType):
+                The type of asset to download data for.
+            symbols (List[str]):
+                The list of symbol names to download features data for.
+            resolution (Resolution):
+                The frequency at which to sample the data.
+
+        Yields:
+        ----------
+            Tuple[datetime, datetime, pd.DataFrame]:
+                The start and end of the market day and the raw dataset
+                downloaded for that day, in calendar order.
+
+        Notes:
+        ------
+            If a download fails the exception is raised when its window
+            is reached in calendar order, after all days before it have
+            been yielded. Pending downloads are cancelled when the
+            generator is closed or an exception is raised, so a failed
+            download does not leave requests running in background.
+        """
+        windows = iter(
+            self._get_download_windows(schedule=schedule,
+                                       dataset_type=dataset_type,
+                                       n_symbols=len(symbols),
+                                       resolution=resolution,
+                                       row_budget=row_budget))
+        in_flight = deque()
+        executor = ThreadPoolExecutor(max_workers=n_workers)
+
+        def submit(windows_to_submit):
+            for window in windows_to_submit:
+                future = executor.submit(self._download_window,
+                                         window=window,
+                                         dataset_type=dataset_type,
+                                         asset_type=asset_type,
+                                         symbols=symbols,
+                                         resolution=resolution)
+                in_flight.append((window, future))
+
+        try:
+            submit(islice(windows, n_workers))
+            while in_flight:
+                window, future = in_flight.popleft()
+                dataset = future.result()
+                submit(islice(windows, 1))
+                yield from self._split_dataset(dataset=dataset, window=window)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        return None
+
+    def _process_dataset(
+        self,
+        dataset: pd.DataFrame,
+        symbols: List[str],
+        resolution: Resolution,
+        start: datetime,
+        end: datetime,
+        data_processor: AlpacaDataProcessor,
+    ) -> pd.DataFrame:
+        """
+        Processes raw dataset of a single market day into a features
+        dataframe. All symbols are reindexed and forward filled over the
+        [start, end) range of the day in a single vectorized pass, such
+        that each row of the features dataframe corresponds to one time
+        interval of the day and columns are grouped by symbol in the
+        order of symbols argument.
+
+        Args:
+        ----------
+            dataset (pd.DataFrame):
+                The raw dataset downloaded from the Alpaca API, indexed
+                by symbol and timestamp.
+            symbols (List[str]):
+                The list of symbol names expected in the dataset.
+            resolution (Resolution):
+                The resolution of the dataset.
+            start (datetime):
+                The start of the market day.
+            end (datetime):
+                The end of the market day.
+            data_processor (AlpacaDataProcessor):
+                The data processor used to reindex and forward fill the
+                data. Its processing statistics are updated in place.
+
+        Returns:
+        ----------
+            features_dataframe (pd.DataFrame):
+                The processed numerical features of the market day.
+
+        Raises:
+        ----------
+            ValueError:
+                If there is no data for some symbols in the dataset.
+        """
+        symbols_in_dataset = dataset.index.get_level_values(
+            'symbol').unique().tolist()
+        missing_symbols = set(symbols_in_dataset) ^ set(symbols)
+        if missing_symbols:
+            raise ValueError(f'No data for symbols {missing_symbols} in '
+                             f'{start}, {end} time range.')
+
+        features_dataframe = data_processor.reindex_and_forward_fill_symbols(
+            dataset=dataset,
+            symbols=symbols,
+            open=start,
+            close=end,
+            resolution=resolution)
+
+        return features_dataframe
+
+    def _get_resumed_schedule(
+        self,
+        file_path: str | os.PathLike,
+        dataset_name: str,
+        stored_metadata: DatasetMetadata,
+        data_schema: DataSchema,
+        resolution: Resolution,
+        calendar_type: CalendarType,
+        schedule: pd.DataFrame,
+    ) -> pd.DataFrame:
+        """
+        Validates a download request against a stored dataset and
+        returns the market days of the request that are not stored yet.
+        The request must have the data schema, resolution and calendar
+        type of the stored dataset, it cannot start before the stored
+        dataset and its first missing day must be the market day right
+        after the end of the stored dataset. This is checked before any
+        download, so a mismatched request fails immediately instead of
+        after its first window is downloaded. The checkpoint of the
+        dataset, if any, is compared with the stored metadata to detect
+        committed days that were lost, for example when the file was
+        replaced by an older copy.
+
+        Args:
+        ----------
+            file_path (str | os.PathLike):
+                The file path of the HDF5 file.
+            dataset_name (str):
+                The name of the stored dataset.
+            stored_metadata (DatasetMetadata):
+                The metadata of the stored dataset.
+            data_schema (DataSchema):
+                The data schema of the request.
+            resolution (Resolution):
+                The resolution of the request.
+            calendar_type (CalendarType):
+                The calendar type of the request.
+            schedule (pd.DataFrame):
+                The schedule of market days of the request.
+
+        Returns:
+        ----------
+            pd.DataFrame:
+                The schedule of market days that are not stored yet.
+                Empty if the dataset is up to date.
+
+        Raises:
+        ----------
+            ValueError:
+                If data schema, resolution or calendar type of the
+                request does not match the stored dataset.
+            ValueError:
+                If the request starts before the stored dataset.
+            ValueError:
+                If there are market days missing between the stored
+                dataset and the first missing day of the request.
+            CorruptDataError:
+                If the checkpoint of the dataset records more rows than
+                the stored dataset has.
+        """
+        if data_schema != stored_metadata.data_schema:
+            raise ValueError(
+                f'Requested data schema {data_schema} does not match data '
+                f'schema of stored dataset {stored_metadata.data_schema}.')
+        if resolution != stored_metadata.resolution:
+            raise ValueError(
+                f'Requested resolution {resolution} does not match '
+                f'resolution of stored dataset {stored_metadata.resolution}.')
+        if calendar_type != stored_metadata.calendar_type:
+            raise ValueError(
+                f'Requested calendar type {calendar_type} does not match '
+                'calendar type of stored dataset '
+                f'{stored_metadata.calendar_type}.')
+        if schedule['start'].iloc[0] < stored_metadata.start:
+            raise ValueError(
+                f'Requested start {schedule["start"].iloc[0]} is before start '
+                f'of stored dataset {stored_metadata.start}. Market days '
+                'cannot be prepended to a stored dataset.')
+
+        checkpoint = from_checkpoint(file_path=file_path).get(dataset_name)
+        if (checkpoint is not None
+                and checkpoint['n_rows'] > stored_metadata.n_rows):
+            raise CorruptDataError(
+                f'Checkpoint of {dataset_name} records {checkpoint["n_rows"]} '
+                f'rows up to {checkpoint["end"]}. Stored dataset has '
+                f'{stored_metadata.n_rows} rows up to {stored_metadata.end}.')
+
+        stored_sessions = schedule['start'] < stored_metadata.end
+        schedule = schedule[~stored_sessions]
+        logger.info(f'Resuming dataset {dataset_name}:'
+                    f'\n\t stored start = {stored_metadata.start}'
+                    f'\n\t stored end = {stored_metadata.end}'
+                    f'\n\t skipped days = {stored_sessions.sum()}')
+
+        if len(schedule) > 0:
+            next_schedule = calendar_type.schedule(
+                start_date=stored_metadata.end.date(),
+                end_date=schedule['start'].iloc[0].date())
+            next_starts = next_schedule['start'][
+                next_schedule['start'] >= stored_metadata.end]
+            if schedule['start'].iloc[0] != next_starts.iloc[0]:
+                raise ValueError(
+                    f'Requested days start at {schedule["start"].iloc[0]}. '
+                    f'Market days from {next_starts.iloc[0]} are missing '
+                    f'after end of stored dataset {stored_metadata.end}.')
+
+        return schedule
+
     def download_to_hdf5(
         self,
         file_path: str | os.PathLike,
         dataset_name: str,
-        dataset_type: AlpacaDataSource.DatasetType,
+        dataset_type: AlpacaDataType,
         symbols: List[str],
         resolution: Optional[Resolution],
         start_date: str | datetime,
         end_date: str | datetime,
+        n_workers: int = 1,
+        row_budget: int = ALPACA_DOWNLOAD_ROW_BUDGET,
+        checkpoint_interval: int = HDF5_DEFAULT_CHECKPOINT_INTERVAL,
+        chunk_rows: Optional[int] = None,
+        compression: Optional[str] = None,
+        shuffle: bool = False,
     ) -> None:
         """
         Downloads financial features data for the given symbols and
@@ -631,6 +1165,22 @@ class AlpacaDataDownloader():
         types. Handling mix of marginable and non-marginable assets is
         not supported in the library.
 
+        Downloads are resumable. If the dataset already exists in the
+        file, market days that end before the end of the stored dataset
+        are skipped and download resumes from the first missing day,
+        so the same call can be repeated to recover from an interrupted
+        download or to extend a dataset with new market days. The
+        request is validated against the stored dataset before anything
+        is downloaded, so it must have the symbols, dataset type and
+        resolution of the stored dataset, start no earlier than the
+        stored dataset and leave no market days missing after it. Rows of
+        an append that was interrupted before its metadata was written
+        are truncated before resuming. Days are appended within a
+        single HDF5 session and metadata is committed every
+        checkpoint_interval days and when the download ends or fails.
+        After each commit, a checkpoint recording the state of the
+        dataset is written atomically next to the file.
+
         Args:
         ----------
             file_path (str | os.PathLike):
@@ -660,9 +1210,50 @@ class AlpacaDataDownloader():
                 The end date to download data for, inclusive. example:
                 '2020-01-01', or datetime(2020, 1, 1), or '05/01/2020'.
                 This should be a format accepted by pandas to_datetime
-    
+            n_workers (int):
+                The number of market days downloaded concurrently.
+                Downloads run on a thread pool while a single writer
+                processes the days and appends them to the HDF5 file in
+                calendar order. Default is 1, which overlaps one
+                download with processing and writing of the previous
+                day. Keep this below the rate limit of the API, since
+                each worker issues at least one request per window.
+            row_budget (int):
+                The maximum estimated number of rows downloaded with a
+                single request. Consecutive market days are grouped
+                into windows of at most row_budget rows, where rows of
+                a day are estimated as intervals in the day times the
+                number of symbols. Default is
+                ALPACA_DOWNLOAD_ROW_BUDGET. Set to 1 to download each
+                market day with a separate request.
+            checkpoint_interval (int):
+                The number of market days appended between metadata
+                commits. An interrupted download resumes from the last
+                commit. Default is HDF5_DEFAULT_CHECKPOINT_INTERVAL.
+            chunk_rows (Optional[int]):
+                The number of rows in an HDF5 chunk of a new dataset.
+                Default is None, namely as many whole market days as
+                fit in HDF5_DEFAULT_CHUNK_SIZE bytes, or an equal part
+                of a market day if a day does not fit.
+            compression (Optional[str]):
+                The compression filter of a new dataset, 'lzf' or
+                'gzip'. Default is None, namely no compression.
+            shuffle (bool):
+                Whether to apply the shuffle filter to a new dataset.
+                Default is False. Layouts can be compared with
+                neural.utils.benchmark.benchmark_hdf5_layouts.
+
         Raises:
         ----------
+            ValueError:
+                If n_workers is less than 1.
+            ValueError:
+                If row_budget is less than 1.
+            ValueError:
+                If checkpoint_interval is less than 1.
+            ValueError:
+                If chunk_rows is less than 1 or compression is not
+                accepted.
             ValueError:
                 If the resolution is not accepted.
             ValueError:
@@ -679,9 +1270,22 @@ class AlpacaDataDownloader():
             ValueError:
                 If there is no data for some symbols in the given date
                 range.
+            ValueError:
+                If the request does not match the stored dataset it
+                resumes.
+            CorruptDataError:
+                If the stored dataset has fewer rows than recorded in
+                its metadata or in its checkpoint.
         """
         validate_path(file_path=file_path)
 
+        if n_workers < 1:
+            raise ValueError(f'n_workers = {n_workers} must be at least 1.')
+        if row_budget < 1:
+            raise ValueError(f'row_budget = {row_budget} must be at least 1.')
+        if checkpoint_interval < 1:
+            raise ValueError(f'checkpoint_interval = {checkpoint_interval} '
+                             'must be at least 1.')
         if not symbols:
             raise ValueError('symbols argument cannot be an empty sequence.')
         duplicate_symbols = [
@@ -691,8 +1295,8 @@ class AlpacaDataDownloader():
             raise ValueError(f'Duplicate symbols found: {duplicate_symbols}.')
 
         assets = self.data_client.symbols_to_assets(symbols)
-        asset_types = set(asset.asset_type for asset in symbols)
-        marginability_types = set(asset.marginable for asset in symbols)
+        asset_types = set(asset.asset_type for asset in assets)
+        marginability_types = set(asset.marginable for asset in assets)
 
         if len(asset_types) != 1:
             raise ValueError(f'Non-homogenous asset types: {asset_types}.')
@@ -714,6 +1318,21 @@ class AlpacaDataDownloader():
                 f'No market hours in date range {start_date}-{end_date}.')
         self._validate_resolution(resolution=resolution, schedule=schedule)
 
+        stored_metadata = repair_hdf5_dataset(file_path=file_path,
+                                              dataset_name=dataset_name)
+        if stored_metadata is not None:
+            schedule = self._get_resumed_schedule(
+                file_path=file_path,
+                dataset_name=dataset_name,
+                stored_metadata=stored_metadata,
+                data_schema=DataSchema(data_type=dataset_type, assets=assets),
+                resolution=resolution,
+                calendar_type=calendar_type,
+                schedule=schedule)
+            if len(schedule) == 0:
+                logger.info(f'Dataset {dataset_name} is up to date.')
+                return None
+
         days = len(schedule)
         n_assets = len(assets)
         logger.info('Downloading dataset:'
@@ -721,64 +1340,57 @@ class AlpacaDataDownloader():
                     f'\n\t end = {end_date}'
                     f'\n\t days = {days}'
                     f'\n\t resolution = {resolution}'
-                    f'\n\t n_assets = {n_assets}')
+                    f'\n\t n_assets = {n_assets}'
+                    f'\n\t n_workers = {n_workers}'
+                    f'\n\t row_budget = {row_budget:,}')
         progress_bar_ = progress_bar(len(schedule))
 
-        for start, end in schedule.values:
-            dataset = self.download_dataset(dataset_type=dataset_type,
-                                            asset_type=asset_type,
-                                            symbols=symbols,
-                                            resolution=resolution,
-                                            start=start,
-                                            end=end)
-
-            symbols_in_dataset = dataset.index.get_level_values(
-                'symbol').unique().tolist()
-            missing_symbols = set(symbols_in_dataset) ^ set(symbols)
-            if missing_symbols:
-                raise ValueError(f'No data for symbols {missing_symbols} in '
-                                 f'{start}, {end} time range.')
-
-            dataset = dataset.reindex(index=pd.MultiIndex.from_product(
-                [symbols, dataset.index.levels[1]]))
-            dataset = dataset.reset_index(level=0, names='symbol')
-
-            data_processor = AlpacaDataProcessor()
-            processing_statistics = data_processor.processing_statistics
-            symbol_groups = list()
-
-            for symbol, group in dataset.groupby('symbol'):
-                processed_group = data_processor.reindex_and_forward_fill(
-                    dataset=group, open=start, close=end, resolution=resolution)
-                symbol_groups.append(processed_group)
-
-            features_dataframe = pd.concat(symbol_groups, axis=1)
-            features_dataframe = features_dataframe.select_dtypes(
-                include=np.number)
-
-            feature_schema = FeatureSchema(dataframe=features_dataframe)
-            data_schema = DataSchema(data_type=dataset_type,
-                                     assets=assets,
-                                     feature_schema=feature_schema)
-            dataset_metadata = DatasetMetadata(
-                data_schema=data_schema,
-                resolution=resolution,
-                calendar_type=calendar_type,
-                start=start,
-                end=end,
-            )
-            features_array = features_dataframe.to_numpy(dtype=GLOBAL_DATA_TYPE)
-            to_hdf5(file_path=file_path,
-                    numpy_array=features_array,
-                    dataset_metadata=dataset_metadata,
-                    dataset_name=dataset_name)
-
-            progress_bar_.set_description(
-                f'low:{processing_statistics.minimum:.0%}/'
-                f'high:{processing_statistics.maximum:.0%}/'
-                f'mean:{processing_statistics.mean:.0%}')
-
-            progress_bar_.update(1)
+        datasets = self._download_datasets(schedule=schedule,
+                                           n_workers=n_workers,
+                                           row_budget=row_budget,
+                                           dataset_type=dataset_type,
+                                           asset_type=asset_type,
+                                           symbols=symbols,
+                                           resolution=resolution)
+
+        writer = HDF5Writer(file_path=file_path,
+                            dataset_name=dataset_name,
+                            checkpoint_interval=checkpoint_interval,
+                            checkpoint=True,
+                            chunk_rows=chunk_rows,
+                            compression=compression,
+                            shuffle=shuffle)
+        with writer:
+            for start, end, dataset in datasets:
+                data_processor = AlpacaDataProcessor()
+                processing_statistics = data_processor.processing_statistics
+                features_dataframe = self._process_dataset(
+                    dataset=dataset,
+                    symbols=symbols,
+                    resolution=resolution,
+                    start=start,
+                    end=end,
+                    data_processor=data_processor)
+
+                data_schema = DataSchema(data_type=dataset_type, assets=assets)
+                dataset_metadata = DatasetMetadata(
+                    data_schema=data_schema,
+                    resolution=resolution,
+                    calendar_type=calendar_type,
+                    start=start,
+                    end=end,
+                )
+                features_array = features_dataframe.to_numpy(
+                    dtype=GLOBAL_DATA_TYPE)
+                writer.append(numpy_array=features_array,
+                              dataset_metadata=dataset_metadata)
+
+                progress_bar_.set_description(
+                    f'low:{processing_statistics.minimum:.0%}/'
+                    f'high:{processing_statistics.maximum:.0%}/'
+                    f'mean:{processing_statistics.mean:.0%}')
+
+                progress_bar_.update(1)
         progress_bar_.close()
 
         return None
@@ -826,6 +1438,11 @@ class AlpacaDataProcessor:
             time < open + resolution will be included in the time_index
             interval. The final interval will have time_index = close -
             resolution.
+        reindex_and_forward_fill_symbols:
+            Same as reindex_and_forward_fill, but for a dataset of
+            multiple symbols at once. The dataset is pivoted to a (time
+            x symbol x feature) array and reindexed, forward filled and
+            backward filled in a single vectorized pass.
     """
 
     def __init__(self):
@@ -877,7 +1494,7 @@ class AlpacaDataProcessor:
         """
         index = pd.date_range(start=open,
                               end=close,
-                              freq=resolution,
+                              freq=resolution.pandas_timedelta,
                               inclusive='left')
 
         processed = dataset.reindex(index)
@@ -892,3 +1509,92 @@ class AlpacaDataProcessor:
             processed = processed.bfill()
 
         return processed
+
+    def reindex_and_forward_fill_symbols(
+        self,
+        dataset: pd.DataFrame,
+        symbols: List[str],
+        open: datetime,
+        close: datetime,
+        resolution: Resolution,
+    ) -> pd.DataFrame:
+        """
+        Reindexes and forward fills missing rows of multiple symbols in
+        [open, close) range. Equivalent to applying
+        reindex_and_forward_fill to each symbol and concatenating the
+        results column wise, but avoids per symbol reindexing. The
+        numerical columns of the dataset are scattered once into a
+        (time x symbol x feature) array, and forward and backward
+        filling is done for all columns at once by propagating indices
+        of the last observed rows. Density of each symbol is computed
+        before filling and added to processing statistics.
+
+        Args:
+        ----------
+            dataset (pd.DataFrame):
+                The data to reindex and forward fill. Must be indexed
+                by a (symbol, timestamp) multi-index, as returned by
+                the Alpaca API.
+            symbols (List[str]):
+                The symbols to include in the output. Columns of the
+                output are grouped by symbol in this order.
+            open (datetime):
+                The open time of the time index.
+            close (datetime):
+                The close time of the time index.
+            resolution (Resolution):
+                The resolution of the time index.
+
+        Returns:
+        ----------
+            processed (pd.DataFrame):
+                The reindexed and forward filled data, indexed by time
+                and with (symbol, feature) multi-index columns.
+
+        Notes:
+        ------
+            Rows with timestamps that do not fall on the time index are
+            dropped, same as reindexing each symbol individually. If all
+            values of a column are missing, the column remains missing
+            after filling.
+        """
+        index = pd.date_range(start=open,
+                              end=close,
+                              freq=resolution.pandas_timedelta,
+                              inclusive='left')
+        features = dataset.select_dtypes(include=np.number)
+        n_rows, n_symbols, n_features = (len(index), len(symbols),
+                                         len(features.columns))
+
+        row_indices = index.get_indexer(
+            features.index.get_level_values('timestamp'))
+        symbol_indices = pd.Index(symbols).get_indexer(
+            features.index.get_level_values('symbol'))
+        on_index = (row_indices != -1) & (symbol_indices != -1)
+
+        array = np.full((n_rows, n_symbols, n_features), np.nan)
+        array[row_indices[on_index],
+              symbol_indices[on_index]] = features.to_numpy(
+                  dtype=np.float64)[on_index]
+        array = array.reshape(n_rows, n_symbols * n_features)
+
+        observed = ~np.isnan(array)
+        densities = observed.reshape(n_rows, n_symbols,
+                                     n_features).mean(axis=(0, 2))
+        for density in densities:
+            self.processing_statistics.update(density)
+
+        if not observed.all():
+            rows = np.arange(n_rows)[:, None]
+            fill_indices = np.where(observed, rows, 0)
+            np.maximum.accumulate(fill_indices, axis=0, out=fill_indices)
+            first_observed = observed.argmax(axis=0)
+            fill_indices = np.where(rows < first_observed, first_observed,
+                                    fill_indices)
+            array = array[fill_indices, np.arange(array.shape[1])]
+
+        columns = pd.MultiIndex.from_product([symbols, features.columns],
+                                             names=['symbol', 'feature'])
+        processed = pd.DataFrame(array, index=index, columns=columns)
+
+        return processed
@@ -59,6 +59,10 @@ Classes:
     DatasetMetadata:
         Subclass of AbstractDataMetaData that provides metadata for
         static data.
+    SharedMemoryDataset:
+        A two dimensional dataset held in a shared memory block. Data
+        feeders of environments running in subprocesses attach to the
+        block by name instead of loading their own copy of the data.
     AbstractDataFeeder:
         Abstract base class for defining a data feeder that is
         responsible for feeding data to a market environment,
@@ -70,6 +74,13 @@ Classes:
     StaticDataFeeder:
         Subclass of AbstractStaticDataFeeder that iteratively returns
         data required for the environment from a static source.
+    RandomEpisodeDataFeeder:
+        Subclass of StaticDataFeeder that feeds a random day-aligned
+        window of a fixed number of days at each episode.
+    TeeDataFeeder:
+        Subclass of AbstractDataFeeder that reads the rows of a data
+        feeder once and feeds them to several environments stepping in
+        lockstep.
     AsyncDataFeeder:
         Subclass of AbstractDataFeeder that iteratively returns data
         required for the environment from a live stream.
@@ -78,10 +89,17 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from collections import OrderedDict, defaultdict
-from copy import deepcopy
+from copy import copy, deepcopy
 from dataclasses import dataclass
 from datetime import datetime
-from typing import (TYPE_CHECKING, Dict, List, Callable, Iterable, Optional)
+from itertools import tee
+from multiprocessing import resource_tracker, shared_memory
+import os
+import queue
+import threading
+import weakref
+from typing import (TYPE_CHECKING, Dict, List, Callable, Iterable, Optional,
+                    Tuple)
 
 import h5py as h5
 import numpy as np
@@ -94,7 +112,7 @@ if TYPE_CHECKING:
     from neural.utils.time import Resolution
 
 
-class AbstractDataType(ABC):
+class AbstractDataType:
     """
     Abstract base class for defining a data type. A data type is a
     representation of data that is used to define the structure of the
@@ -119,7 +137,7 @@ class AbstractDataType(ABC):
 
     Example:
     --------
-    >>> class APIDataType(Enum, AbstractDataType):
+    >>> class APIDataType(AbstractDataType, Enum):
     ...     BAR = 'BAR'
     ...     TRADE = 'TRADE'
     ... @property
@@ -136,6 +154,12 @@ class AbstractDataType(ABC):
     ... APIDataType.BAR.feature_schema
     {FeatureType.ASSET_OPEN_PRICE: [True, False, False, False],
     FeatureType.ASSET_HIGH_PRICE: [False, True, False, False]}
+
+    Notes:
+    ------
+        This class does not derive from ABC, since ABCMeta conflicts
+        with the metaclass of Enum that concrete data types mix in.
+        Enum mixins must also precede Enum in the bases of a data type.
     """
 
     @property
@@ -204,6 +228,13 @@ class AbstractAsset(ABC):
         __eq__(self, other) -> bool:
             Checks if two assets are equal. Two assets are equal if they
             have the same symbol.
+        get_maintenance_margin(self, price: float, short: bool = False)
+        -> float | None:
+            The maintenance margin of the asset for a price and position
+            side. Implemented by assets that support margin accounts.
+        get_maintenance_margins(self, prices: np.ndarray, short:
+        np.ndarray) -> np.ndarray:
+            Array counterpart of get_maintenance_margin.
     """
     symbol: str
     asset_type: AssetType
@@ -228,6 +259,59 @@ class AbstractAsset(ABC):
             return False
         return self.symbol.lower() == other.symbol.lower()
 
+    def get_maintenance_margin(self,
+                               price: float,
+                               short: bool = False) -> float | None:
+        """
+        The maintenance margin of the asset, namely the fraction of
+        position value that should be available in marginable equity,
+        for a price and position side.
+
+        Args:
+        -----
+            price (float):
+                The price of the asset.
+            short (bool):
+                Whether the position is short. By default False.
+
+        Returns:
+        --------
+            float | None:
+                The maintenance margin of the asset.
+
+        Raises:
+        -------
+            NotImplementedError:
+                If the asset does not support margin accounts.
+        """
+        raise NotImplementedError
+
+    def get_maintenance_margins(self, prices: np.ndarray,
+                                short: np.ndarray) -> np.ndarray:
+        """
+        Array counterpart of get_maintenance_margin, used by offline
+        backtests to compute margin requirements of many time steps at
+        once. The default calls get_maintenance_margin for each element.
+        Subclasses can override it with array operations.
+
+        Args:
+        -----
+            prices (np.ndarray):
+                An array of prices of the asset.
+            short (np.ndarray):
+                A boolean array broadcastable to prices indicating
+                whether the position is short.
+
+        Returns:
+        --------
+            np.ndarray:
+                An array of maintenance margins with the broadcast
+                shape of prices and short.
+        """
+        get_maintenance_margins = np.vectorize(self.get_maintenance_margin,
+                                               otypes=[float])
+        return get_maintenance_margins(prices, np.asarray(short, dtype=bool))
+
 
 class DataSchema:
     """
@@ -289,6 +373,11 @@ class DataSchema:
             features that are text based, they can use this method to
             get the mask for text features FeatureType.TEXT and filter
             out the columns that have True values in the mask.
+        get_assets_mask(assets: List[AbstractAsset]) -> List[bool]:
+            Retrieves the boolean mask for the columns of a subset of
+            assets. Combined with feature masks this selects columns of
+            given feature types of given assets, for example to project
+            the columns read by a data feeder.
         __repr__(self) -> str:
             Returns a string representation of the data schema.
         __eq__(self, other) -> bool:
@@ -377,7 +466,7 @@ class DataSchema:
             int:
                 The number of columns in the dataset.
         """
-        n_features = len(self.feature_schema.values()[0])
+        n_features = len(next(iter(self.feature_schema.values())))
         return n_features
 
     @property
@@ -514,6 +603,49 @@ class DataSchema:
         """
         return self.feature_schema[feature_type]
 
+    def get_assets_mask(self, assets: List[AbstractAsset]) -> List[bool]:
+        """
+        Retrieves the boolean mask for the columns of a subset of
+        assets. Columns of each data type are laid out asset by asset,
+        and each asset occupies the columns of the column schema of the
+        data type. Assets are matched by symbol, so the mask covers an
+        asset in every data type it appears in.
+
+        Args:
+        ------
+            assets (List[AbstractAsset]):
+                The assets for which the mask is to be retrieved.
+
+        Returns:
+        --------
+            List[bool]:
+                A boolean mask that is True for columns of the given
+                assets.
+
+        Example:
+        --------
+            Selecting close and high prices of two assets:
+
+            >>> data_schema = metadata.data_schema
+            >>> columns = np.logical_and(
+            ...     data_schema.get_assets_mask([AAPL, MSFT]),
+            ...     np.logical_or(
+            ...         data_schema.get_features_mask(
+            ...             FeatureType.ASSET_CLOSE_PRICE),
+            ...         data_schema.get_features_mask(
+            ...             FeatureType.ASSET_HIGH_PRICE)))
+            >>> data_feeder = StaticDataFeeder(metadata, datasets,
+            ...                                columns=columns)
+        """
+        symbols = {asset.symbol for asset in assets}
+        assets_mask = list()
+
+        for data_type, data_type_assets in self.data_type_assets_map.items():
+            n_columns = len(data_type.column_schema)
+            for asset in data_type_assets:
+                assets_mask.extend([asset.symbol in symbols] * n_columns)
+        return assets_mask
+
 
 @dataclass
 class AbstractDataMetadata:
@@ -763,7 +895,7 @@ class AbstractDataMetadata:
         if self.resolution != other.resolution:
             raise ValueError('Datasets must have the same resolution.')
 
-        if not self.calendar_type != other.calendar_type:
+        if self.calendar_type != other.calendar_type:
             raise ValueError(
                 f'Metadata {other} has calendar type {other.calendar_type} '
                 'which is not compatible with {self.calendar_type}.')
@@ -828,7 +960,7 @@ class AbstractDataMetadata:
                 f'Dataset resolutions{self.resolution} and {other.resolution} '
                 'are mismatched.')
 
-        if not self.calendar_type != other.calendar_type:
+        if self.calendar_type != other.calendar_type:
             raise ValueError(
                 f'Metadata {other} has calendar type {other.calendar_type} '
                 f'which is not compatible with {self.calendar_type}.')
@@ -948,6 +1080,11 @@ class DatasetMetadata(AbstractDataMetadata):
         of the episode and also adjusting the start and end times of
         the data feeders to match the start and end of days, namely
         making sure that data feeders work with integer number of days.
+    _schedule: pd.DataFrame
+        The schedule of the dataset, computed once and cached.
+    _day_start_times: pd.DatetimeIndex
+        Start times of days in the schedule, backed by a numpy
+        datetime64 array. Used to map row indices to dates.
 
     Properties:
     -----------
@@ -959,7 +1096,11 @@ class DatasetMetadata(AbstractDataMetadata):
         environment.
     schedule:
         Returns a DataFrame representing the schedule of the dataset
-        according to its calendar type.
+        according to its calendar type. The schedule is computed once
+        and cached.
+    day_start_times: pd.DatetimeIndex
+        Returns the start times of days in the schedule, computed once
+        and cached.
     days: int
         Returns the number of days in the dataset.
     n_rows: int
@@ -980,10 +1121,18 @@ class DatasetMetadata(AbstractDataMetadata):
         Checks if two dates are consecutive market days. This is used to
         validate the process of appending datasets to ensure temporal
         continuity of the data.
+    from_cumulative_daily_rows(cls, cumulative_daily_rows, **kwargs) ->
+    DatasetMetadata
+        Creates a metadata object from stored cumulative daily rows,
+        without generating and validating the schedule. Used to load
+        serialized metadata.
     index_to_date(self, index: int) -> datetime
         Returns the date of the episode corresponding to the given
         index. This is useful for mapping the index of the dataset to
         the date of the episode.
+    index_to_dates(self, indices: np.ndarray) -> pd.DatetimeIndex
+        Vectorized version of index_to_date that maps many indices to
+        dates at once.
     __or__(self, other: AbstractDataMetaData, **kwargs) ->
     AbstractDataMetaData
         Merges two metadata objects. This is useful for joining datasets
@@ -1003,10 +1152,61 @@ class DatasetMetadata(AbstractDataMetadata):
     end: datetime
 
     def __post_init__(self) -> None:
+        self._schedule = None
+        self._day_start_times = None
         self._validate_times()
         self.cumulative_daily_rows = self._get_cumulative_daily_rows()
         return None
 
+    def __getstate__(self) -> dict:
+        """
+        Returns the state of the metadata object for pickling. Cached
+        schedule is not pickled, to keep serialized metadata compact,
+        and is recomputed on first access after unpickling.
+
+        Returns:
+        --------
+            dict:
+                The state of the metadata object.
+        """
+        state = self.__dict__.copy()
+        state['_schedule'] = None
+        state['_day_start_times'] = None
+        return state
+
+    @classmethod
+    def from_cumulative_daily_rows(cls, cumulative_daily_rows: np.ndarray,
+                                   **kwargs) -> DatasetMetadata:
+        """
+        Creates a metadata object from stored cumulative daily rows.
+        Initializing metadata generates the schedule of the dataset to
+        validate start and end times and to count rows per day, which
+        dominates the time of loading a dataset. Serialized metadata
+        already holds the cumulative daily rows of a validated dataset,
+        so this skips the schedule. The schedule is still generated on
+        first access to schedule or dates.
+
+        Args:
+        ------
+            cumulative_daily_rows (np.ndarray):
+                The cumulative number of rows per day of the dataset.
+            **kwargs:
+                The fields of the metadata object, namely data_schema,
+                resolution, calendar_type, start and end.
+
+        Returns:
+        --------
+            DatasetMetadata:
+                The metadata object.
+        """
+        dataset_metadata = cls.__new__(cls)
+        dataset_metadata.__dict__.update(kwargs)
+        dataset_metadata._schedule = None
+        dataset_metadata._day_start_times = None
+        dataset_metadata.cumulative_daily_rows = np.asarray(
+            cumulative_daily_rows, dtype=np.int64)
+        return dataset_metadata
+
     @property
     def stream(self) -> StreamMetaData:
         """
@@ -1031,7 +1231,10 @@ class DatasetMetadata(AbstractDataMetadata):
     @property
     def schedule(self) -> pd.DataFrame:
         """
-        Schedule of the dataset according to its calendar type.
+        Schedule of the dataset according to its calendar type. The
+        schedule is computed once and cached, since generating it
+        through the calendar is slow and dates are frequently looked up
+        during training. Do not modify the returned DataFrame in place.
 
         Returns:
         --------
@@ -1039,21 +1242,40 @@ class DatasetMetadata(AbstractDataMetadata):
                 A DataFrame representing the schedule of the dataset
                 according to its calendar type.
         """
-        schedule = super().schedule(start_date=self.start.date(),
-                                    end_date=self.end.date())
-        return schedule
+        if getattr(self, '_schedule', None) is None:
+            self._schedule = super().schedule(start_date=self.start.date(),
+                                              end_date=self.end.date())
+        return self._schedule
+
+    @property
+    def day_start_times(self) -> pd.DatetimeIndex:
+        """
+        Start times of days in the schedule, computed once and cached.
+        Backed by a numpy datetime64 array, so that indexing with an
+        integer returns a timestamp and indexing with an array of
+        integers returns timestamps without a python loop.
+
+        Returns:
+        --------
+            pd.DatetimeIndex:
+                Start times of days in the schedule.
+        """
+        if getattr(self, '_day_start_times', None) is None:
+            self._day_start_times = pd.DatetimeIndex(self.schedule['start'])
+        return self._day_start_times
 
     @property
     def days(self) -> int:
         """
-        Returns the number of days in the dataset.
+        Returns the number of market days in the dataset, according to
+        its calendar type.
 
         Returns:
         --------    
             int:
-                The number of days in the dataset.
+                The number of market days in the dataset.
         """
-        days = (self.start.date() - self.end.date()).days + 1
+        days = len(self.cumulative_daily_rows)
         return days
 
     @property
@@ -1154,17 +1376,46 @@ class DatasetMetadata(AbstractDataMetadata):
         """
         Returns the date corresponding to the current index. This is useful for
         mapping the current row index of the dataset to the date of the
-        episode.
+        episode. The day of the index is found by binary search over
+        cumulative daily rows.
 
+        Args:
+        ------
+            index (int):
+                The row index of the dataset.
         Returns:
         --------
             date (datetime):
                 The date corresponding to the current index.
         """
-        day_index = (index < self.cumulative_daily_rows).argmax()
-        date = self.schedule.loc[day_index, 'start']
+        day_index = np.searchsorted(self.cumulative_daily_rows,
+                                    index,
+                                    side='right')
+        date = self.day_start_times[day_index]
         return date
 
+    def index_to_dates(self, indices: np.ndarray) -> pd.DatetimeIndex:
+        """
+        Returns the dates corresponding to an array of row indices.
+        Vectorized version of index_to_date, useful for mapping many
+        indices to dates at once, for example when exporting episode
+        histories.
+
+        Args:
+        ------
+            indices (np.ndarray):
+                The row indices of the dataset.
+        Returns:
+        --------
+            dates (pd.DatetimeIndex):
+                The dates corresponding to the indices.
+        """
+        day_indices = np.searchsorted(self.cumulative_daily_rows,
+                                      indices,
+                                      side='right')
+        dates = self.day_start_times[day_indices]
+        return dates
+
     def __or__(self, other: AbstractDataMetadata) -> AbstractDataMetadata:
         """
         This is useful for joining datasets that are large to download
@@ -1242,6 +1493,213 @@ class DatasetMetadata(AbstractDataMetadata):
         return super().__add__(other, start=self.start, end=other.end)
 
 
+class SharedMemoryDataset:
+    """
+    A two dimensional dataset held in a shared memory block. Loading a
+    dataset in every environment of a vectorized environment that runs
+    in subprocesses multiplies memory usage and load time by the number
+    of environments. A shared memory dataset is loaded once by the
+    parent process. When pickled, only the name, shape and data type of
+    the block are serialized, and unpickling attaches to the block, so
+    environments in subprocesses read the same memory through zero-copy
+    numpy views.
+
+    The block holds the rows of a range of the dataset. Rows are indexed
+    by their index in the whole dataset, so data feeders use the same
+    start and end indices as with the original datasets. Only slicing
+    rows within the range is supported. The block can hold a subset of
+    the columns of the dataset, in which case the indices of the held
+    columns are recorded in columns.
+
+    Attributes:
+    -----------
+        name (str):
+            The name of the shared memory block.
+        row_offset (int):
+            The index of the first row of the block in the dataset.
+        columns (Optional[np.ndarray]):
+            The indices of the columns of the dataset held by the
+            block, in increasing order. None if the block holds all
+            columns.
+        _shared_memory (shared_memory.SharedMemory):
+            The shared memory block.
+        _array (np.ndarray):
+            A numpy view of the rows in the block.
+        _finalizer (Optional[weakref.finalize]):
+            Unlinks the block when the dataset that created it is
+            garbage collected or the interpreter exits. None in
+            processes that attached to the block.
+
+    Properties:
+    -----------
+        shape (Tuple[int, int]):
+            The shape of the dataset, namely the index after the last
+            row of the block and the number of columns.
+        dtype (np.dtype):
+            The data type of the dataset.
+
+    Methods:
+    --------
+        unlink() -> None:
+            Releases the shared memory block.
+
+    Notes:
+    ------
+        The block is released when the dataset in the process that
+        created it is garbage collected, when the interpreter exits, or
+        when unlink is called. Processes that attached to the block
+        never release it, and unregister it from their resource tracker,
+        so that their exit does not unlink it. Environments in
+        subprocesses must be closed before the block is released.
+    """
+
+    def __init__(self,
+                 shape: Tuple[int, int],
+                 dtype: np.dtype,
+                 row_offset: int = 0,
+                 name: Optional[str] = None,
+                 columns: Optional[np.ndarray] = None) -> None:
+        """
+        Initializes the shared memory dataset. If name is None, a new
+        block is created, otherwise the existing block with the given
+        name is attached to.
+
+        Args:
+        ------
+            shape (Tuple[int, int]):
+                The number of rows and columns in the block.
+            dtype (np.dtype):
+                The data type of the dataset.
+            row_offset (int):
+                The index of the first row of the block in the dataset.
+                Default is 0.
+            name (Optional[str]):
+                The name of an existing block to attach to. Default is
+                None, namely a new block is created.
+            columns (Optional[np.ndarray]):
+                The indices of the columns of the dataset held by the
+                block. Default is None, namely all columns.
+        """
+        dtype = np.dtype(dtype)
+        create = name is None
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1) if create else 0
+
+        self._shared_memory = shared_memory.SharedMemory(name=name,
+                                                         create=create,
+                                                         size=size)
+        self.name = self._shared_memory.name
+        self.row_offset = row_offset
+        self.columns = columns
+        self._array = np.ndarray(shape=tuple(shape),
+                                 dtype=dtype,
+                                 buffer=self._shared_memory.buf)
+        self._finalizer = (weakref.finalize(
+            self, SharedMemoryDataset._release, self._shared_memory,
+            os.getpid()) if create else None)
+
+        if not create:
+            # Attaching registers the block with the resource tracker
+            # of this process, which would unlink it when this process
+            # exits, while the creating process is still using it.
+            resource_tracker.unregister(self._shared_memory._name,
+                                        'shared_memory')
+
+        return None
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """
+        The shape of the dataset, namely the index after the last row of
+        the block and the number of columns.
+
+        Returns:
+        --------
+            Tuple[int, int]:
+                The shape of the dataset.
+        """
+        n_rows, n_columns = self._array.shape
+        return self.row_offset + n_rows, n_columns
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        The data type of the dataset.
+
+        Returns:
+        --------
+            np.dtype:
+                The data type of the dataset.
+        """
+        return self._array.dtype
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key: slice | Tuple[slice, ...]) -> np.ndarray:
+        """
+        Returns a view of rows of the block. Row indices are indices in
+        the whole dataset and must be within the rows of the block.
+
+        Args:
+        ------
+            key (slice | Tuple[slice, ...]):
+                A slice of rows, optionally followed by a column key.
+
+        Returns:
+        --------
+            np.ndarray:
+                A view of the selected rows.
+
+        Raises:
+        -------
+            IndexError:
+                If the rows are not within the rows of the block.
+        """
+        row_key, *column_key = key if isinstance(key, tuple) else (key, )
+        start, stop, step = row_key.indices(self.shape[0])
+
+        if start < self.row_offset and start < stop:
+            raise IndexError(f'Rows {start}:{stop} are not in shared memory '
+                             f'rows {self.row_offset}:{self.shape[0]}.')
+
+        row_key = slice(start - self.row_offset, stop - self.row_offset, step)
+        return self._array[(row_key, *column_key)]
+
+    def __reduce__(self) -> Tuple:
+        """
+        Pickles the dataset by the name of its block, so that unpickling
+        attaches to the block instead of copying its rows.
+        """
+        arguments = (self._array.shape, self.dtype.str, self.row_offset,
+                     self.name, self.columns)
+        return SharedMemoryDataset, arguments
+
+    def unlink(self) -> None:
+        """
+        Releases the shared memory block. Only the dataset that created
+        the block releases it, later calls have no effect.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+        return None
+
+    @staticmethod
+    def _release(shared_memory_: shared_memory.SharedMemory,
+                 pid: int) -> None:
+        """
+        Unlinks a shared memory block, if called from the process that
+        created it. Forked subprocesses inherit the finalizer of the
+        block, but must not release it. Subprocesses share the resource
+        tracker of the creating process, so the block is registered
+        again before unlinking, in case an attaching subprocess
+        unregistered it.
+        """
+        if os.getpid() == pid:
+            resource_tracker.register(shared_memory_._name, 'shared_memory')
+            shared_memory_.unlink()
+        return None
+
+
 class AbstractDataFeeder(ABC):
     """
     Abstract base class for defining a data feeder that is responsible
@@ -1262,6 +1720,14 @@ class AbstractDataFeeder(ABC):
         done: bool
             Returns True if the data feeder has been exhausted, False
             otherwise. Asynchronous data feeders always return False.
+        n_features: int
+            The number of columns in rows fed by the data feeder.
+        assets: List[AbstractAsset]
+            The tradable assets whose prices are in rows fed by the
+            data feeder.
+        asset_prices_mask: List[bool] | np.ndarray
+            A mask for the asset close prices in rows fed by the data
+            feeder.
     
     Methods:
     --------
@@ -1284,6 +1750,45 @@ class AbstractDataFeeder(ABC):
         self.metadata = metadata
         return None
 
+    @property
+    def n_features(self) -> int:
+        """
+        The number of columns in rows fed by the data feeder. By
+        default all columns of the metadata are fed.
+
+        Returns:
+        --------
+            int:
+                The number of columns in rows fed by the data feeder.
+        """
+        return self.metadata.n_features
+
+    @property
+    def assets(self) -> List[AbstractAsset]:
+        """
+        The tradable assets whose prices are in rows fed by the data
+        feeder. By default all tradable assets of the metadata.
+
+        Returns:
+        --------
+            List[AbstractAsset]:
+                The tradable assets of the data feeder.
+        """
+        return self.metadata.assets
+
+    @property
+    def asset_prices_mask(self) -> List[bool] | np.ndarray:
+        """
+        A mask for the asset close prices in rows fed by the data
+        feeder. The order of prices matches the order of assets.
+
+        Returns:
+        --------
+            List[bool] | np.ndarray:
+                A mask for the asset close prices.
+        """
+        return self.metadata.asset_prices_mask
+
     @property
     @abstractmethod
     def done(self):
@@ -1317,14 +1822,17 @@ class StaticDataFeeder(AbstractDataFeeder):
     dataset. Common use case is to pair with gym AsyncVectorEnv, and
     SyncVectorEnv to parallelize running multiple trading environments,
     leading to significant speedup of training process and improvement
-    in generalization.
+    in generalization. A data feeder can feed a projection of the
+    columns of the datasets, in which case only the selected columns
+    are read from storage and held in memory.
 
     Attributes:
     -----------
         metadata (DatasetMetadata):
             Contains metadata for the dataset being loaded.
-        datasets (List[h5.Dataset | np.ndarray]):
-            Represents the actual dataset(s) to be loaded.
+        datasets (List[h5.Dataset | np.ndarray | SharedMemoryDataset]):
+            Represents the actual dataset(s) to be loaded. Datasets
+            loaded from a memory-mapped store are np.memmap instances.
         start_index (int):
             Specifies the starting index to load the data from.
         end_index (int):
@@ -1334,12 +1842,36 @@ class StaticDataFeeder(AbstractDataFeeder):
             for loading. Loads one chunk at a time. Useful if datasets
             do not fit in memory or to allocate more memory for the
             training process.
+        prefetch_depth (int):
+            Number of chunks loaded ahead of the chunk being fed by a
+            background thread. If 0, chunks are loaded synchronously
+            when the previous chunk is exhausted.
         _index (int):
             Current row index of the data feeder. This is useful to have
             a reference to the current row index being fed to the market
             environment.
+        columns (np.ndarray):
+            The indices of the columns of the metadata fed by the data
+            feeder, in increasing order.
+        universe_columns (np.ndarray):
+            The indices of the columns selected at initialization. Asset
+            subsets set by set_assets are selected among these columns.
         _cumulative_daily_rows (List[int]):
             A list that contains the cumulative number of rows per day.
+        _column_runs (List[List[Tuple[int, int, int, int]]]):
+            Runs of consecutive selected columns of each dataset. A run
+            (column_start, column_end, buffer_start, buffer_end) copies
+            columns column_start to column_end of a dataset into columns
+            buffer_start to buffer_end of a joined row.
+        _asset_prices_mask (np.ndarray):
+            A mask for the asset close prices in fed rows.
+        _asset_column_indices (Optional[Dict[str, np.ndarray]]):
+            Maps symbols of universe assets to the indices of their
+            universe columns. Computed once when assets are first set.
+        _shared_column_indices (Optional[np.ndarray]):
+            Indices of universe columns that belong to no universe
+            asset, such as columns of financial indices. These columns
+            are fed with any subset of assets.
 
     Properties:
     -----------
@@ -1359,18 +1891,66 @@ class StaticDataFeeder(AbstractDataFeeder):
             Returns the current date of the episode.
         days (int):
             Returns the number of days in the dataset.
+        n_features (int):
+            The number of columns in fed rows.
+        assets (List[AbstractAsset]):
+            The tradable assets whose close prices are fed.
+        asset_prices_mask (np.ndarray):
+            A mask for the asset close prices in fed rows.
+        universe_assets (List[AbstractAsset]):
+            The tradable assets whose close prices are among universe
+            columns.
 
     Methods:
     --------
+        _get_columns(self, columns) -> np.ndarray
+            Converts a column selection to sorted column indices.
+        _update_columns(self, columns: np.ndarray) -> None
+            Sets the fed columns and the column runs and price mask that
+            depend on them.
+        _get_column_assets(self, columns: np.ndarray) ->
+        List[AbstractAsset]
+            Returns the tradable assets whose close prices are among
+            given columns.
+        _get_asset_column_indices(self) -> Tuple[Dict[str,
+        np.ndarray], np.ndarray]
+            Returns the per-asset column index tables of universe
+            columns.
+        set_assets(self, assets: Optional[List[AbstractAsset]]) -> None
+            Feeds only the columns of a subset of universe assets.
+        _get_column_runs(self) -> List[List[Tuple[int, int, int, int]]]
+            Returns runs of consecutive selected columns of each
+            dataset.
+        _get_day_edge_indices(self) -> np.ndarray
+            Returns the row indices of the edges of days between start
+            and end indices.
         _validate_indices(self) -> None
             Validates the start and end indices to make sure that they
             correspond to the start and end of days. This is useful for
             making sure that data feeders work with integer number of
             days.
+        _get_chunk_buffers(self, chunk_edge_indices: np.ndarray) ->
+        List[np.ndarray]
+            Allocates reusable buffers that chunks are loaded into.
+        _load_chunk(self, start: int, end: int, buffer: np.ndarray) ->
+        np.ndarray
+            Loads rows start to end of the joined datasets in memory.
+        _get_prefetched_chunks(self, chunk_arguments: List[Tuple]) ->
+        Iterable[np.ndarray]
+            Yields chunks loaded ahead of time by a background thread.
+        _get_chunks(self) -> Iterable[np.ndarray]
+            Yields joined chunks of rows between start and end indices.
         get_row_generator(self) -> Iterable[np.ndarray]
             Resets the internal state of the data feeder. Yields:
             Iterable[np.ndarray]: a generator object returning features
             as numpy array.
+        get_feature_blocks(self, block_size: int) ->
+        Iterable[np.ndarray]
+            Resets the internal state of the data feeder. Yields: 2-D
+            views of up to block_size consecutive rows.
+        to_shared_memory(self) -> StaticDataFeeder
+            Loads the rows of the data feeder once into a shared memory
+            block and returns a data feeder that reads from it.
         split(self, n_splits: int) -> List[StaticDataFeeder]
             Splits the data feeder into multiple non-overlapping
             contiguous sub-feeders that span the dataset. Common use
@@ -1380,6 +1960,24 @@ class StaticDataFeeder(AbstractDataFeeder):
             improvement in generalization. Another use case is to split
             the dataset into train, test sets. If train, test,
             validation decomposition is required, use this method twice.
+
+    Notes:
+    ------
+        Projected columns are read into chunk buffers with one read per
+        run of consecutive columns. Chunks of HDF5 datasets hold whole
+        rows, so compressed chunks are still decompressed in full, but
+        memory of chunk buffers and copying shrink in proportion to the
+        unselected columns.
+
+    Example:
+    --------
+        Feeding close prices of all assets only:
+
+        >>> columns = metadata.data_schema.get_features_mask(
+        ...     FeatureType.ASSET_CLOSE_PRICE)
+        >>> data_feeder = StaticDataFeeder(metadata, datasets,
+        ...                                columns=columns)
+        >>> env = TrainMarketEnv(data_feeder=data_feeder)
     """
 
     def __init__(self,
@@ -1387,7 +1985,10 @@ class StaticDataFeeder(AbstractDataFeeder):
                  datasets: List[h5.Dataset | np.ndarray],
                  start_index: int = 0,
                  end_index: Optional[int] = None,
-                 n_chunks: Optional[int] = 1) -> None:
+                 n_chunks: Optional[int] = 1,
+                 prefetch_depth: int = 0,
+                 columns: Optional[List[bool] | List[int]
+                                   | np.ndarray] = None) -> None:
         """
         Initializes a StaticDataFeeder object. 
         
@@ -1407,6 +2008,25 @@ class StaticDataFeeder(AbstractDataFeeder):
             for loading. Loads one chunk at a time. Useful if datasets
             do not fit in memory or to allocate more memory for the
             training process. Default is 1.
+        prefetch_depth (int, optional):
+            Number of chunks loaded ahead of the chunk being fed by a
+            background thread. While rows of a chunk are fed, the next
+            chunks are loaded, hiding the stall at chunk boundaries
+            when n_chunks > 1 and the consumer releases the GIL. See
+            _get_prefetched_chunks. If 0, prefetching is disabled and
+            chunks are loaded synchronously. Default is 0.
+        columns (List[bool] | List[int] | np.ndarray, optional):
+            The columns of the metadata to feed, either as a boolean
+            mask with one entry per column, for example a mask from
+            DataSchema.get_features_mask, or as column indices. Only
+            the selected columns are read from the datasets. If None,
+            all columns are fed. Default is None.
+
+        Raises:
+        -------
+            ValueError:
+                If prefetch_depth is negative or columns is not a valid
+                selection of columns held by the datasets.
         """
         super().__init__(metadata=metadata)
         self.datasets = datasets
@@ -1415,8 +2035,22 @@ class StaticDataFeeder(AbstractDataFeeder):
             self.metadata.n_rows
         self.n_chunks = n_chunks
 
+        if prefetch_depth < 0:
+            raise ValueError(
+                f'prefetch_depth must be non-negative, got {prefetch_depth}.')
+        self.prefetch_depth = prefetch_depth
+
         self._index = None
         self._cumulative_daily_rows = (self.metadata.cumulative_daily_rows)
+
+        self.columns = None
+        self.universe_columns = self._get_columns(columns)
+        self._column_runs = None
+        self._asset_prices_mask = None
+        self._asset_column_indices = None
+        self._shared_column_indices = None
+
+        self._update_columns(self.universe_columns)
         return None
 
     @property
@@ -1475,14 +2109,15 @@ class StaticDataFeeder(AbstractDataFeeder):
     @property
     def end_date(self) -> datetime:
         """
-        Returns the date corresponding to the end index. 
+        Returns the date corresponding to the end index, namely the
+        date of the last row fed by the data feeder.
 
         Returns:
         --------
             datetime:
                 The date corresponding to the end index.
         """
-        return self.metadata.index_to_date(self.end_index)
+        return self.metadata.index_to_date(self.end_index - 1)
 
     @property
     def date(self):
@@ -1509,6 +2144,257 @@ class StaticDataFeeder(AbstractDataFeeder):
         days = (self.end_date - self.start_date).days + 1
         return days
 
+    @property
+    def n_features(self) -> int:
+        """
+        The number of columns in rows fed by the data feeder.
+
+        Returns:
+        --------
+            int:
+                The number of selected columns.
+        """
+        return len(self.columns)
+
+    @property
+    def assets(self) -> List[AbstractAsset]:
+        """
+        The tradable assets whose close prices are among the selected
+        columns, in the order of the metadata. Close price columns
+        appear in the same order as tradable assets of the metadata.
+
+        Returns:
+        --------
+            List[AbstractAsset]:
+                The tradable assets of the data feeder.
+        """
+        return self._get_column_assets(self.columns)
+
+    @property
+    def asset_prices_mask(self) -> np.ndarray:
+        """
+        A mask for the asset close prices in rows fed by the data
+        feeder, namely the price mask of the metadata remapped to the
+        selected columns.
+
+        Returns:
+        --------
+            np.ndarray:
+                A boolean mask for the asset close prices.
+        """
+        return self._asset_prices_mask
+
+    @property
+    def universe_assets(self) -> List[AbstractAsset]:
+        """
+        The tradable assets whose close prices are among universe
+        columns. Subsets of these assets can be fed with set_assets.
+
+        Returns:
+        --------
+            List[AbstractAsset]:
+                The tradable assets of the universe.
+        """
+        return self._get_column_assets(self.universe_columns)
+
+    def _get_columns(
+            self, columns: Optional[List[bool] | List[int]
+                                    | np.ndarray]) -> np.ndarray:
+        """
+        Converts a column selection to sorted unique column indices of
+        the metadata.
+
+        Args:
+        ------
+            columns (List[bool] | List[int] | np.ndarray, optional):
+                A boolean mask or column indices. If None, all columns
+                are selected.
+        Returns:
+        --------
+            np.ndarray:
+                The indices of the selected columns.
+        Raises:
+        -------
+            ValueError:
+                If a boolean mask does not match the number of columns,
+                or if indices are empty or out of range.
+        """
+        n_features = self.metadata.n_features
+        if columns is None:
+            return np.arange(n_features)
+
+        columns = np.asarray(columns)
+        if columns.dtype == bool:
+            if len(columns) != n_features:
+                raise ValueError(
+                    f'Column mask has {len(columns)} entries, expected '
+                    f'{n_features}.')
+            columns = np.flatnonzero(columns)
+
+        if not len(columns):
+            raise ValueError('At least one column must be selected.')
+        if not np.issubdtype(columns.dtype, np.integer):
+            raise ValueError(
+                f'Columns must be a boolean mask or integer indices, got '
+                f'{columns.dtype}.')
+
+        columns = np.unique(columns)
+        if columns[0] < 0 or columns[-1] >= n_features:
+            raise ValueError(
+                f'Column indices must be in [0, {n_features}), got '
+                f'{columns[0]} to {columns[-1]}.')
+        return columns
+
+    def _update_columns(self, columns: np.ndarray) -> None:
+        """
+        Sets the fed columns and the column runs and price mask that
+        depend on them.
+
+        Args:
+        ------
+            columns (np.ndarray):
+                Sorted indices of the columns to feed.
+        """
+        self.columns = columns
+        self._column_runs = self._get_column_runs()
+        self._asset_prices_mask = np.isin(
+            self.columns, np.flatnonzero(self.metadata.asset_prices_mask))
+        return None
+
+    def _get_column_assets(self,
+                           columns: np.ndarray) -> List[AbstractAsset]:
+        """
+        Returns the tradable assets whose close prices are among given
+        columns, in the order of the metadata. Close price columns
+        appear in the same order as tradable assets of the metadata.
+
+        Args:
+        ------
+            columns (np.ndarray):
+                Indices of columns of the metadata.
+        Returns:
+        --------
+            List[AbstractAsset]:
+                The tradable assets with close prices in columns.
+        """
+        price_columns = np.flatnonzero(self.metadata.asset_prices_mask)
+        is_selected = np.isin(price_columns, columns)
+        assets = [
+            asset for asset, selected in zip(self.metadata.assets, is_selected)
+            if selected
+        ]
+        return assets
+
+    def _get_asset_column_indices(
+            self) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Returns the per-asset column index tables of universe columns.
+        Tables are computed once, so that selecting a subset of assets
+        only concatenates the tables of the selected assets. Columns
+        are matched to assets by symbol in the layout of
+        DataSchema.get_assets_mask, namely an asset owns its columns in
+        every data type it appears in.
+
+        Returns:
+        --------
+            Tuple[Dict[str, np.ndarray], np.ndarray]:
+                A dictionary mapping symbols of universe assets to the
+                indices of their universe columns, and the indices of
+                universe columns that belong to no universe asset.
+        """
+        if self._asset_column_indices is not None:
+            return self._asset_column_indices, self._shared_column_indices
+
+        column_symbols = np.array([
+            asset.symbol for data_type, assets in
+            self.metadata.data_schema.data_type_assets_map.items()
+            for asset in assets for _ in data_type.column_schema
+        ])[self.universe_columns]
+        symbols = [asset.symbol for asset in self.universe_assets]
+
+        self._asset_column_indices = {
+            symbol: self.universe_columns[column_symbols == symbol]
+            for symbol in symbols
+        }
+        self._shared_column_indices = self.universe_columns[~np.isin(
+            column_symbols, symbols)]
+        return self._asset_column_indices, self._shared_column_indices
+
+    def _get_column_runs(self) -> List[List[Tuple[int, int, int, int]]]:
+        """
+        Returns runs of consecutive selected columns of each dataset.
+        Datasets hold consecutive columns of the metadata in order,
+        except shared memory datasets holding a projection of columns,
+        which record their columns. Each run is read from a dataset
+        with a single slice.
+
+        Returns:
+        --------
+            List[List[Tuple[int, int, int, int]]]:
+                For each dataset, runs of (column_start, column_end,
+                buffer_start, buffer_end).
+        Raises:
+        -------
+            ValueError:
+                If the selected columns are not held by the datasets
+                exactly once.
+        """
+        column_runs = list()
+        n_held_columns = 0
+        next_column = 0
+
+        for dataset in self.datasets:
+            if (isinstance(dataset, SharedMemoryDataset)
+                    and dataset.columns is not None):
+                dataset_columns = np.asarray(dataset.columns)
+            else:
+                dataset_columns = np.arange(next_column,
+                                            next_column + dataset.shape[1])
+            if len(dataset_columns):
+                next_column = dataset_columns[-1] + 1
+
+            is_selected = np.isin(dataset_columns, self.columns)
+            column_indices = np.flatnonzero(is_selected)
+            buffer_indices = np.searchsorted(self.columns,
+                                             dataset_columns[is_selected])
+            n_held_columns += len(column_indices)
+
+            run_edges = np.flatnonzero((np.diff(column_indices) != 1)
+                                       | (np.diff(buffer_indices) != 1)) + 1
+            dataset_column_runs = [
+                (int(run_column_indices[0]), int(run_column_indices[-1]) + 1,
+                 int(run_buffer_indices[0]), int(run_buffer_indices[-1]) + 1)
+                for run_column_indices, run_buffer_indices in zip(
+                    np.split(column_indices, run_edges),
+                    np.split(buffer_indices, run_edges))
+                if len(run_column_indices)
+            ]
+            column_runs.append(dataset_column_runs)
+
+        if n_held_columns != len(self.columns):
+            raise ValueError(
+                f'Datasets hold {n_held_columns} of {len(self.columns)} '
+                'selected columns. Each selected column must be held by '
+                'exactly one dataset.')
+        return column_runs
+
+    def _get_day_edge_indices(self) -> np.ndarray:
+        """
+        Returns the row indices of the edges of days between start and
+        end indices, inclusive. Rows of a day i are the rows between
+        consecutive edges i and i + 1.
+
+        Returns:
+        --------
+            np.ndarray:
+                The row indices of the edges of days.
+        """
+        day_edge_indices = np.concatenate(([0], self._cumulative_daily_rows))
+        day_edge_indices = day_edge_indices[
+            (day_edge_indices >= self.start_index)
+            & (day_edge_indices <= self.end_index)]
+        return day_edge_indices
+
     def _validate_indices(self) -> None:
         """
         Validates the start and end indices to make sure that they
@@ -1521,7 +2407,7 @@ class StaticDataFeeder(AbstractDataFeeder):
                 if the start index or end index does not correspond to
                 the start or end of a day.
         """
-        valid_indices = np.concatenate([0], self._cumulative_daily_rows)
+        valid_indices = np.concatenate(([0], self._cumulative_daily_rows))
         if (self.start_index not in valid_indices
                 or self.end_index not in valid_indices):
             raise ValueError(
@@ -1530,6 +2416,199 @@ class StaticDataFeeder(AbstractDataFeeder):
                 'to the start/end of a day.')
         return None
 
+    def _get_chunk_buffers(
+            self, chunk_edge_indices: np.ndarray) -> List[np.ndarray]:
+        """
+        Allocates reusable buffers that chunks are loaded into. Joined
+        datasets are written into a buffer column block by column
+        block, instead of materializing slices of each dataset and then
+        stacking them, which allocates twice per chunk. Buffers are
+        reused in a round robin fashion. Two buffers are used so that
+        rows of the previous chunk stay valid while the next chunk is
+        fed, and when prefetching, enough buffers are allocated to
+        cover chunks waiting in the queue and the chunk being loaded.
+        A single in-memory dataset is sliced without a copy and needs
+        no buffers, as does a shared memory dataset, provided that the
+        selected columns are a single run of its columns.
+
+        Args:
+        ------
+            chunk_edge_indices (np.ndarray):
+                Row indices of the edges of chunks.
+        Returns:
+        --------
+            List[np.ndarray]:
+                The reusable chunk buffers. Empty if chunks are slices
+                of a single in-memory dataset.
+        """
+        if (len(self.datasets) == 1
+                and isinstance(self.datasets[0],
+                               (np.ndarray, SharedMemoryDataset))
+                and len(self._column_runs[0]) == 1):
+            return list()
+
+        n_chunks = len(chunk_edge_indices) - 1
+        n_buffers = (self.prefetch_depth + 3 if self.prefetch_depth > 0 else 2)
+        n_buffers = min(n_buffers, n_chunks)
+        max_chunk_rows = np.diff(chunk_edge_indices).max()
+        dtype = np.result_type(*[dataset.dtype for dataset in self.datasets])
+
+        chunk_buffers = [
+            np.empty((max_chunk_rows, self.n_features), dtype=dtype)
+            for _ in range(n_buffers)
+        ]
+        return chunk_buffers
+
+    def _load_chunk(self,
+                    start: int,
+                    end: int,
+                    buffer: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Loads rows start to end of the selected columns of the joined
+        datasets in memory. Runs of columns of HDF5 datasets are read
+        directly into the buffer and runs of in-memory datasets are
+        copied into the buffer by slice assignment, each into the
+        columns at its precomputed offset.
+
+        Args:
+        ------
+            start (int):
+                The index of the first row of the chunk.
+            end (int):
+                The index after the last row of the chunk.
+            buffer (Optional[np.ndarray]):
+                The buffer to load the chunk into. If None, the chunk
+                must be a slice of a single in-memory dataset.
+        Returns:
+        --------
+            np.ndarray:
+                The joined chunk of rows. A view of the buffer or of the
+                dataset.
+        """
+        if buffer is None:
+            # memory-mapped datasets are sliced without a copy.
+            (column_start, column_end, _, _), = self._column_runs[0]
+            joined_chunks_in_memory = self.datasets[0][start:end,
+                                                       column_start:column_end]
+            return joined_chunks_in_memory
+
+        n_rows = end - start
+        for dataset, column_runs in zip(self.datasets, self._column_runs):
+            for column_start, column_end, buffer_start, buffer_end in (
+                    column_runs):
+                if isinstance(dataset, h5.Dataset):
+                    dataset.read_direct(
+                        buffer,
+                        source_sel=np.s_[start:end, column_start:column_end],
+                        dest_sel=np.s_[0:n_rows, buffer_start:buffer_end])
+                else:
+                    buffer[:n_rows, buffer_start:buffer_end] = dataset[
+                        start:end, column_start:column_end]
+
+        joined_chunks_in_memory = buffer[:n_rows]
+        return joined_chunks_in_memory
+
+    def _get_prefetched_chunks(
+            self, chunk_arguments: List[Tuple]) -> Iterable[np.ndarray]:
+        """
+        Yields chunks loaded ahead of time by a background thread. The
+        thread loads up to prefetch_depth chunks ahead of the chunk
+        being consumed. Copies of in-memory and memory-mapped datasets
+        are done by numpy, which releases the GIL while copying, so
+        page faults of memory-mapped files overlap with feeding rows of
+        the current chunk. h5py serializes all calls under its global
+        lock and holds the GIL while reading and decompressing, so
+        chunks of HDF5 datasets are loaded only while the consuming
+        thread is waiting or releases the GIL, for example in PyTorch
+        operations of a model update. If the generator is closed before
+        exhaustion, for example when an environment is reset
+        mid-episode, the thread is signaled to stop.
+
+        Args:
+        ------
+            chunk_arguments (List[Tuple]):
+                The start, end and buffer of each chunk passed to
+                _load_chunk.
+        Yields:
+        -------
+            np.ndarray:
+                The joined chunks of rows in order.
+        Raises:
+        -------
+            Exception:
+                Any exception raised by the thread while loading a
+                chunk is raised again in the consuming thread.
+        """
+        chunk_queue = queue.Queue(maxsize=self.prefetch_depth)
+        stop_event = threading.Event()
+
+        def put(item) -> bool:
+            while not stop_event.is_set():
+                try:
+                    chunk_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def load_chunks() -> None:
+            try:
+                for start, end, buffer in chunk_arguments:
+                    if not put(self._load_chunk(start, end, buffer)):
+                        return None
+            except Exception as exception:
+                put(exception)
+                return None
+            put(None)
+            return None
+
+        thread = threading.Thread(target=load_chunks, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                chunk = chunk_queue.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            stop_event.set()
+
+    def _get_chunks(self) -> Iterable[np.ndarray]:
+        """
+        Yields joined chunks of rows between start and end indices. If
+        prefetch_depth is positive, chunks are loaded ahead of time by
+        a background thread.
+
+        Yields:
+        -------
+            np.ndarray:
+                The joined chunks of rows in order.
+        """
+        chunk_edge_indices = np.linspace(start=self.start_index,
+                                         stop=self.end_index,
+                                         num=self.n_chunks + 1,
+                                         dtype=int,
+                                         endpoint=True)
+
+        chunk_buffers = self._get_chunk_buffers(chunk_edge_indices)
+        chunk_arguments = [
+            (start, end, chunk_buffers[chunk_index % len(chunk_buffers)]
+             if chunk_buffers else None)
+            for chunk_index, (start, end) in enumerate(
+                zip(chunk_edge_indices[:-1], chunk_edge_indices[1:]))
+        ]
+
+        if self.prefetch_depth > 0:
+            chunks = self._get_prefetched_chunks(chunk_arguments)
+        else:
+            chunks = (self._load_chunk(start, end, buffer)
+                      for start, end, buffer in chunk_arguments)
+
+        yield from chunks
+
     def get_features_generator(self) -> Iterable[np.ndarray]:
         """
         This method returns a generator object that can be used for
@@ -1537,29 +2616,176 @@ class StaticDataFeeder(AbstractDataFeeder):
         loaded in chunks and each chunk is loaded into memory and then
         iteratively returned until chunk is exhausted and next chunk is
         loaded. This is useful for loading large datasets that do not
-        fit in memory or to allocate more memory for the training.
+        fit in memory or to allocate more memory for the training. If
+        prefetch_depth is positive, chunks are loaded ahead of time by
+        a background thread.
 
         Returns:
         --------
             Iterable[np.ndarray]: 
                 a generator object returning features corresponding to
                 each time interval as a numpy array.
+
+        Notes:
+        ------
+            Joined chunks are loaded into reusable buffers. Yielded rows
+            are views that remain valid while the next chunk is fed, but
+            are overwritten once their buffer is reused. Copy rows that
+            need to be kept for longer.
         """
-        chunk_edge_indices = np.linspace(start=self.start_index,
-                                         stop=self.end_index,
-                                         num=self.n_chunks + 1,
-                                         dtype=int,
-                                         endpoint=True)
         self._index = self.start_index - 1
 
-        for start, end in zip(chunk_edge_indices[:-1], chunk_edge_indices[1:]):
-            joined_chunks_in_memory = np.hstack(
-                [dataset[start:end, :] for dataset in self.datasets])
+        for joined_chunks_in_memory in self._get_chunks():
             for row in joined_chunks_in_memory:
                 self._index += 1
                 yield row
 
-    def split(self, n: int = 1 | float) -> List[StaticDataFeeder]:
+    def get_feature_blocks(self, block_size: int) -> Iterable[np.ndarray]:
+        """
+        This method returns a generator object that yields blocks of
+        consecutive rows as 2-D views, instead of one row at a time.
+        Consumers that work vectorized, such as offline backtests,
+        indicator precomputation or normalizer warm-up, do not pay the
+        per-row generator overhead. Blocks follow the same start and end
+        indices and chunking as get_features_generator, so split
+        sub-feeders yield blocks of their own rows only. Blocks do not
+        span chunk boundaries, hence the last block of each chunk may
+        have fewer than block_size rows. After a block is yielded, index
+        of the data feeder points to the last row of the block.
+
+        Args:
+        ------
+            block_size (int):
+                The maximum number of rows in a block.
+        Returns:
+        --------
+            Iterable[np.ndarray]:
+                a generator object returning blocks of features with
+                shape (n_rows, n_features) where n_rows <= block_size.
+        Raises:
+        -------
+            ValueError:
+                If block_size is not a positive integer.
+
+        Notes:
+        ------
+            Blocks are views of chunks and follow the same validity
+            rules as rows yielded by get_features_generator.
+        """
+        if not block_size > 0:
+            raise ValueError(
+                f'block_size must be a positive integer, got {block_size}.')
+
+        self._index = self.start_index - 1
+
+        for joined_chunks_in_memory in self._get_chunks():
+            for block_start in range(0, len(joined_chunks_in_memory),
+                                     block_size):
+                block = joined_chunks_in_memory[block_start:block_start +
+                                                block_size]
+                self._index += len(block)
+                yield block
+
+    def set_assets(self, assets: Optional[List[AbstractAsset]]) -> None:
+        """
+        Feeds only the columns of a subset of universe assets, together
+        with the universe columns that belong to no asset, such as
+        columns of financial indices. The columns of each asset are
+        looked up in precomputed tables, and only the selected columns
+        are read from storage, so full-width rows are never copied.
+        Takes effect for generators requested afterwards. Useful to
+        train on a random subset of a large universe of assets at each
+        episode.
+
+        Args:
+        ------
+            assets (Optional[List[AbstractAsset]]):
+                The assets to feed. Assets are matched to universe
+                assets by symbol and are fed in the order of the
+                metadata. If None, all universe columns are fed.
+
+        Raises:
+        -------
+            ValueError:
+                If an asset is not a universe asset or assets are
+                repeated.
+
+        Notes:
+        ------
+            Data feeders derived by split, to_shared_memory or
+            RandomEpisodeDataFeeder.from_data_feeder feed the universe
+            columns, regardless of the assets set.
+        """
+        if assets is None:
+            self._update_columns(self.universe_columns)
+            return None
+
+        asset_column_indices, shared_column_indices = (
+            self._get_asset_column_indices())
+        symbols = [asset.symbol for asset in assets]
+
+        if len(set(symbols)) != len(symbols):
+            raise ValueError(f'Assets {symbols} contain repeated assets.')
+        missing_symbols = [
+            symbol for symbol in symbols if symbol not in asset_column_indices
+        ]
+        if missing_symbols:
+            raise ValueError(f'Assets {missing_symbols} are not universe '
+                             'assets of the data feeder.')
+
+        columns = np.sort(
+            np.concatenate([shared_column_indices] +
+                           [asset_column_indices[symbol]
+                            for symbol in symbols]))
+        self._update_columns(columns)
+        return None
+
+    def to_shared_memory(self) -> StaticDataFeeder:
+        """
+        Loads the joined rows between start and end indices once into a
+        shared memory block and returns a data feeder that reads from
+        it. Environments that receive the returned data feeder, or its
+        splits, in subprocesses attach to the same block instead of
+        reading and caching their own copy of the data. Only the
+        universe columns are stored in the block. Chunks of the returned
+        data feeder are zero-copy views of the block.
+
+        Returns:
+        --------
+            StaticDataFeeder:
+                A data feeder with the same metadata, indices and
+                chunking that reads from a SharedMemoryDataset.
+
+        Notes:
+        ------
+            The block is released when the returned data feeder and its
+            splits are garbage collected in this process. Keep a
+            reference to them while environments in subprocesses run.
+        """
+        universe_data_feeder = copy(self)
+        universe_data_feeder.set_assets(None)
+
+        dtype = np.result_type(*[dataset.dtype for dataset in self.datasets])
+        shared_dataset = SharedMemoryDataset(
+            shape=(self.n_rows, universe_data_feeder.n_features),
+            dtype=dtype,
+            row_offset=self.start_index,
+            columns=self.universe_columns)
+        shared_rows = shared_dataset[self.start_index:self.end_index]
+        universe_data_feeder._load_chunk(self.start_index,
+                                         self.end_index,
+                                         buffer=shared_rows)
+
+        data_feeder = StaticDataFeeder(metadata=self.metadata,
+                                       datasets=[shared_dataset],
+                                       start_index=self.start_index,
+                                       end_index=self.end_index,
+                                       n_chunks=self.n_chunks,
+                                       prefetch_depth=self.prefetch_depth,
+                                       columns=self.universe_columns)
+        return data_feeder
+
+    def split(self, n: int | float = 1) -> List[StaticDataFeeder]:
         """
         Splits the dataset into multiple non-overlapping contiguous
         sub-feeders that span the dataset. Common use case is it use in
@@ -1610,9 +2836,11 @@ class StaticDataFeeder(AbstractDataFeeder):
 
         start, end, middle = edge_indices[0], edge_indices[-1], edge_indices[
             1:-1]
-        cumulative_closest_indices = np.searchsorted(
-            self._cumulative_daily_rows, middle, side='right') - 1
-        edge_indices = np.concatenate((start, cumulative_closest_indices, end))
+        day_edge_indices = np.concatenate(([0], self._cumulative_daily_rows))
+        cumulative_closest_indices = day_edge_indices[np.searchsorted(
+            day_edge_indices, middle, side='right') - 1]
+        edge_indices = np.concatenate(([start], cumulative_closest_indices,
+                                       [end]))
 
         if len(edge_indices) != len(np.unique(edge_indices)):
             raise ValueError(
@@ -1622,15 +2850,466 @@ class StaticDataFeeder(AbstractDataFeeder):
         static_data_feeders = list()
 
         for start, end in zip(edge_indices[:-1], edge_indices[1:]):
-            static_data_feeder = StaticDataFeeder(metadata=self.metadata,
-                                                  datasets=self.datasets,
-                                                  start_index=start,
-                                                  end_index=end,
-                                                  n_chunks=self.n_chunks)
+            static_data_feeder = StaticDataFeeder(
+                metadata=self.metadata,
+                datasets=self.datasets,
+                start_index=start,
+                end_index=end,
+                n_chunks=self.n_chunks,
+                prefetch_depth=self.prefetch_depth,
+                columns=self.universe_columns)
             static_data_feeders.append(static_data_feeder)
         return static_data_feeders
 
 
+class RandomEpisodeDataFeeder(StaticDataFeeder):
+    """
+    Subclass of StaticDataFeeder that feeds a random window of a fixed
+    number of consecutive days at each episode, instead of replaying the
+    entire range from start to end index. Windows are aligned to the
+    start and end of days using cumulative daily rows and are served by
+    slicing the datasets directly, so the rows before the window are
+    never read. Shorter randomized episodes give more diverse rollouts
+    per unit of time than replaying a long range at each episode.
+
+    Attributes:
+    -----------
+        n_days (int):
+            Number of consecutive days in each episode.
+        range_start_index (int):
+            The starting index of the range that windows are drawn
+            from.
+        range_end_index (int):
+            The ending index of the range that windows are drawn from.
+        start_index (int):
+            The starting index of the current episode window.
+        end_index (int):
+            The ending index of the current episode window.
+        _random_state (np.random.Generator):
+            The random number generator used to draw windows.
+
+    Methods:
+    --------
+        from_data_feeder(data_feeder: StaticDataFeeder, n_days: int,
+        seed: Optional[int] = None) -> RandomEpisodeDataFeeder
+            Creates a random episode data feeder that draws windows from
+            the range of an existing static data feeder.
+        sample_episode(self) -> None
+            Draws a new random window and sets start and end indices of
+            the data feeder to the window.
+        get_features_generator(self) -> Iterable[np.ndarray]
+            Draws a new window and yields its rows.
+        get_feature_blocks(self, block_size: int) -> Iterable[np.ndarray]
+            Draws a new window and yields blocks of its rows.
+        split(self, n: int | float) -> List[RandomEpisodeDataFeeder]
+            Splits the range that windows are drawn from.
+
+    Example:
+    --------
+        >>> data_feeder = StaticDataFeeder(metadata, datasets)
+        >>> episode_data_feeder = RandomEpisodeDataFeeder.from_data_feeder(
+        ...     data_feeder, n_days=5)
+        >>> env = TrainMarketEnv(data_feeder=episode_data_feeder)
+    """
+
+    def __init__(self,
+                 metadata: DatasetMetadata,
+                 datasets: List[h5.Dataset | np.ndarray],
+                 n_days: int,
+                 start_index: int = 0,
+                 end_index: Optional[int] = None,
+                 n_chunks: Optional[int] = 1,
+                 prefetch_depth: int = 0,
+                 seed: Optional[int] = None,
+                 columns: Optional[List[bool] | List[int]
+                                   | np.ndarray] = None) -> None:
+        """
+        Initializes a RandomEpisodeDataFeeder object.
+
+        Args:
+        ------
+        metadata (DatasetMetadata):
+            Contains metadata for the dataset being loaded.
+        datasets (List[h5.Dataset | np.ndarray]):
+            Represents the actual dataset(s) to be loaded.
+        n_days (int):
+            Number of consecutive days in each episode.
+        start_index (int, optional):
+            The starting index of the range that windows are drawn
+            from. Default is 0.
+        end_index (int, optional):
+            The ending index of the range that windows are drawn from.
+            If not provided, defaults to the number of rows indicated in
+            the metadata object. Default is None.
+        n_chunks (int, optional):
+            Number of chunks each window is loaded in. Default is 1.
+        prefetch_depth (int, optional):
+            Number of chunks loaded ahead of time by a background
+            thread. Default is 0.
+        seed (int, optional):
+            Seed of the random number generator used to draw windows.
+            If None, fresh entropy is used. Default is None.
+        columns (List[bool] | List[int] | np.ndarray, optional):
+            The columns of the metadata to feed, as a boolean mask or
+            column indices. If None, all columns are fed. Default is
+            None.
+
+        Raises:
+        -------
+            ValueError:
+                If n_days is not a positive integer or if the range has
+                fewer than n_days full days.
+        """
+        super().__init__(metadata=metadata,
+                         datasets=datasets,
+                         start_index=start_index,
+                         end_index=end_index,
+                         n_chunks=n_chunks,
+                         prefetch_depth=prefetch_depth,
+                         columns=columns)
+
+        self.n_days = n_days
+        self.range_start_index = self.start_index
+        self.range_end_index = self.end_index
+
+        self._range_day_edge_indices = self._get_day_edge_indices()
+        self._random_state = np.random.default_rng(seed)
+
+        if not n_days > 0:
+            raise ValueError(
+                f'n_days must be a positive integer, got {n_days}.')
+        if len(self._range_day_edge_indices) - 1 < n_days:
+            raise ValueError(
+                f'Range of rows {self.range_start_index} to '
+                f'{self.range_end_index} has fewer than {n_days} full days.')
+
+        return None
+
+    @classmethod
+    def from_data_feeder(
+            cls,
+            data_feeder: StaticDataFeeder,
+            n_days: int,
+            seed: Optional[int] = None) -> RandomEpisodeDataFeeder:
+        """
+        Creates a random episode data feeder that draws windows from the
+        range of an existing static data feeder.
+
+        Args:
+        ------
+            data_feeder (StaticDataFeeder):
+                The data feeder whose range windows are drawn from.
+            n_days (int):
+                Number of consecutive days in each episode.
+            seed (int, optional):
+                Seed of the random number generator used to draw
+                windows. Default is None.
+        Returns:
+        --------
+            RandomEpisodeDataFeeder:
+                The random episode data feeder.
+        """
+        random_episode_data_feeder = cls(
+            metadata=data_feeder.metadata,
+            datasets=data_feeder.datasets,
+            n_days=n_days,
+            start_index=data_feeder.start_index,
+            end_index=data_feeder.end_index,
+            n_chunks=data_feeder.n_chunks,
+            prefetch_depth=data_feeder.prefetch_depth,
+            seed=seed,
+            columns=data_feeder.universe_columns)
+        return random_episode_data_feeder
+
+    def sample_episode(self) -> None:
+        """
+        Draws a new random window of n_days consecutive days uniformly
+        among all day-aligned windows in the range, and sets start and
+        end indices of the data feeder to the window.
+        """
+        n_windows = len(self._range_day_edge_indices) - self.n_days
+        window_index = self._random_state.integers(n_windows)
+        self.start_index = int(self._range_day_edge_indices[window_index])
+        self.end_index = int(
+            self._range_day_edge_indices[window_index + self.n_days])
+        return None
+
+    def get_features_generator(self) -> Iterable[np.ndarray]:
+        """
+        Draws a new random window and returns a generator object
+        yielding its rows. Since environments request a new generator at
+        each reset, each episode is fed a different window.
+
+        Returns:
+        --------
+            Iterable[np.ndarray]:
+                a generator object returning features of the window.
+        """
+        self.sample_episode()
+        return super().get_features_generator()
+
+    def get_feature_blocks(self, block_size: int) -> Iterable[np.ndarray]:
+        """
+        Draws a new random window and returns a generator object
+        yielding blocks of its rows.
+
+        Args:
+        ------
+            block_size (int):
+                The maximum number of rows in a block.
+        Returns:
+        --------
+            Iterable[np.ndarray]:
+                a generator object returning blocks of features of the
+                window.
+        """
+        self.sample_episode()
+        return super().get_feature_blocks(block_size=block_size)
+
+    def split(self, n: int | float = 1) -> List[RandomEpisodeDataFeeder]:
+        """
+        Splits the range that windows are drawn from into
+        non-overlapping contiguous day-aligned ranges, and returns a
+        random episode data feeder drawing windows from each range.
+        Each sub-feeder gets its own random number generator seeded from
+        the generator of this data feeder.
+
+        Args:
+        ------
+            n (int | float):
+                if int, number of sub-feeders to split the range into.
+                if float (0, 1) yields two sub-feeders performing n, 1-n
+                split.
+        Returns:
+        --------
+            List[RandomEpisodeDataFeeder]:
+                A list of RandomEpisodeDataFeeder objects.
+        """
+        range_data_feeder = StaticDataFeeder(
+            metadata=self.metadata,
+            datasets=self.datasets,
+            start_index=self.range_start_index,
+            end_index=self.range_end_index,
+            n_chunks=self.n_chunks,
+            prefetch_depth=self.prefetch_depth,
+            columns=self.universe_columns)
+
+        random_episode_data_feeders = [
+            RandomEpisodeDataFeeder.from_data_feeder(
+                data_feeder,
+                n_days=self.n_days,
+                seed=int(self._random_state.integers(2**32)))
+            for data_feeder in range_data_feeder.split(n=n)
+        ]
+        return random_episode_data_feeders
+
+
+class TeeDataFeeder(AbstractDataFeeder):
+    """
+    Subclass of AbstractDataFeeder that reads the rows of a data feeder
+    once and feeds them to n_branches environments. Environments share
+    the tee data feeder, and each environment that resets receives its
+    own branch of a single pass over the rows of the data feeder. This
+    is useful for evaluating many agents on the same period, where
+    reading and joining rows is paid once instead of once per agent.
+    Attributes that are not defined by the tee data feeder, such as
+    dates of the episode, are looked up on the data feeder.
+
+    Attributes:
+    -----------
+        data_feeder (StaticDataFeeder):
+            The data feeder whose rows are fed to all branches.
+        n_branches (int):
+            The number of environments that share each pass over the
+            rows.
+        _branches (List[Iterable[np.ndarray]]):
+            Branches of the current pass that are not handed out yet.
+
+    Properties:
+    -----------
+        done (bool):
+            True if the current pass has reached the end of the rows.
+        index (int):
+            The index of the last row read by the current pass.
+
+    Methods:
+    --------
+        get_features_generator(self) -> Iterable[np.ndarray]
+            Returns a branch yielding the rows of the current pass.
+        get_feature_blocks(self, block_size: int) ->
+        Iterable[np.ndarray]
+            Returns a branch yielding the blocks of the current pass.
+
+    Notes:
+    ------
+        Branches are fed from a buffer of rows that are read but not yet
+        consumed by all branches. Environments must reset and step
+        together, in which case at most one row is buffered. Rows are
+        shared, not copied, so environments must not modify features in
+        place. A new pass starts when all n_branches branches of the
+        previous pass are handed out. Shallow copies share the passes
+        of the tee data feeder, so environments that draw asset subsets
+        can share it, as long as all branches of a pass feed the same
+        subset.
+
+    Example:
+    --------
+        >>> tee_data_feeder = TeeDataFeeder(data_feeder, n_branches=2)
+        >>> envs = [TrainMarketEnv(data_feeder=tee_data_feeder)
+        ...         for _ in range(2)]
+    """
+
+    def __init__(self, data_feeder: StaticDataFeeder,
+                 n_branches: int) -> None:
+        """
+        Initializes a TeeDataFeeder object.
+
+        Args:
+        ------
+            data_feeder (StaticDataFeeder):
+                The data feeder whose rows are fed to all branches.
+            n_branches (int):
+                The number of environments that share each pass over
+                the rows.
+
+        Raises:
+        -------
+            ValueError:
+                If n_branches is not a positive integer.
+        """
+        super().__init__(data_feeder.metadata)
+
+        if n_branches < 1:
+            raise ValueError(
+                f'n_branches must be a positive integer, got {n_branches}.')
+
+        self.data_feeder = data_feeder
+        self.n_branches = n_branches
+        self._branches = []
+
+        return None
+
+    def __getattr__(self, name: str):
+        """
+        Looks up attributes that are not defined by the tee data feeder
+        on the data feeder, for example start_date or days used by
+        wrappers.
+        """
+        if name == 'data_feeder':
+            raise AttributeError(name)
+        return getattr(self.data_feeder, name)
+
+    @property
+    def n_features(self) -> int:
+        """
+        The number of columns in rows fed by the data feeder.
+        """
+        return self.data_feeder.n_features
+
+    @property
+    def assets(self) -> List[AbstractAsset]:
+        """
+        The tradable assets of the data feeder.
+        """
+        return self.data_feeder.assets
+
+    @property
+    def asset_prices_mask(self) -> List[bool] | np.ndarray:
+        """
+        A mask for the asset close prices in rows fed by the data
+        feeder.
+        """
+        return self.data_feeder.asset_prices_mask
+
+    @property
+    def done(self) -> bool:
+        """
+        True if the current pass has reached the end of the rows. Since
+        branches step together, this holds for all of them at once.
+        """
+        return self.data_feeder.done
+
+    @property
+    def index(self) -> int:
+        """
+        The index of the last row read by the current pass.
+        """
+        return self.data_feeder.index
+
+    def _get_branch(self, iterable: Callable[[], Iterable[np.ndarray]]
+                    ) -> Iterable[np.ndarray]:
+        """
+        Hands out a branch of the current pass. If all branches of the
+        current pass are handed out, a new pass is started by calling
+        iterable.
+        """
+        if not self._branches:
+            self._branches.extend(tee(iterable(), self.n_branches))
+        return self._branches.pop(0)
+
+    def set_assets(self, assets: Optional[List[AbstractAsset]]) -> None:
+        """
+        Feeds only the columns of a subset of universe assets, by
+        setting the assets of the data feeder. Environments with
+        episode_assets set the subset of each branch they reset, so the
+        subset can only change between passes.
+
+        Args:
+        ------
+            assets (Optional[List[AbstractAsset]]):
+                The assets to feed. If None, all universe columns are
+                fed.
+
+        Raises:
+        -------
+            ValueError:
+                If a pass is in progress and assets differ from the
+                assets fed by the pass.
+        """
+        if self._branches:
+            symbols = {
+                asset.symbol
+                for asset in (self.universe_assets
+                              if assets is None else assets)
+            }
+            if symbols != {asset.symbol for asset in self.assets}:
+                raise ValueError(
+                    f'Assets {sorted(symbols)} differ from the assets fed '
+                    'by the current pass. All branches of a pass must '
+                    'feed the same assets.')
+        self.data_feeder.set_assets(assets)
+        return None
+
+    def get_features_generator(self) -> Iterable[np.ndarray]:
+        """
+        Returns a branch of the current pass that yields the rows of
+        the data feeder.
+
+        Returns:
+        --------
+            Iterable[np.ndarray]:
+                a generator object returning features.
+        """
+        return self._get_branch(self.data_feeder.get_features_generator)
+
+    def get_feature_blocks(self, block_size: int) -> Iterable[np.ndarray]:
+        """
+        Returns a branch of the current pass that yields blocks of rows
+        of the data feeder.
+
+        Args:
+        ------
+            block_size (int):
+                The maximum number of rows in a block.
+        Returns:
+        --------
+            Iterable[np.ndarray]:
+                a generator object returning blocks of features.
+        """
+        return self._get_branch(lambda: self.data_feeder.get_feature_blocks(
+            block_size=block_size))
+
+
 class AsyncDataFeeder(AbstractDataFeeder):
     """
     A subclass of AbstractDataFeeder that iteratively returns data
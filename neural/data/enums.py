@@ -155,9 +155,8 @@ class CalendarType(Enum):
         ---------
         >>> CalendarType.NEW_YORK_STOCK_EXCHANGE.schedule(start_date, end_date)
         """
-        schedule = CALENDAR(self.value).schedule
-        schedule = lambda start_date, end_date: schedule(
-            self, start_date, end_date)
+        schedule = lambda start_date, end_date: CALENDAR.schedule(
+            calendar_type=self, start_date=start_date, end_date=end_date)
         return schedule
 
 
@@ -0,0 +1,281 @@
+"""
+backtest.py
+
+Description:
+------------
+This module defines an offline backtest that replays a precomputed
+matrix of actions over the rows of a data feeder. Instead of stepping a
+market environment and its wrappers row by row, the state of the
+account and the metadata of a margin account are computed for the whole
+range with cumulative array operations. Backtests follow the mechanics
+of TrainMarketEnv and the metrics of MarginAccountMetaDataWrapper, so
+they can be used to score fixed strategies or many candidate policies
+before running them in the environment.
+
+License:
+--------
+    MIT License. See LICENSE.md file.
+
+Author(s):
+-------
+    Reza Soleymanifar, Email: Reza@Soleymanifar.com
+
+Functions:
+----------
+    backtest(data_feeder, actions, initial_cash,
+    initial_asset_quantities, block_size) -> Dict[str, np.ndarray]:
+        Replays notional actions over the rows of a data feeder and
+        returns the history of account state and margin metrics.
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from neural.common.constants import GLOBAL_DATA_TYPE
+from neural.data.base import StaticDataFeeder
+
+
+def backtest(data_feeder: StaticDataFeeder,
+             actions: np.ndarray,
+             initial_cash: float = 1e6,
+             initial_asset_quantities: Optional[np.ndarray] = None,
+             block_size: int = 1024) -> Dict[str, np.ndarray]:
+    """
+    Replays notional actions over the rows of a data feeder and returns
+    the history of account state and margin metrics. Mechanics are
+    those of TrainMarketEnv: action t is placed at prices of row t,
+    then the account moves to row t + 1, and holds count the rows an
+    asset is held since it was last traded. Metrics are those of
+    MarginAccountMetaDataWrapper, computed for every row at once.
+
+    Only the asset price columns of the rows are kept in memory, so the
+    range of the data feeder can be longer than what fits in memory as
+    a whole. Actions can have leading dimensions, for example a stack
+    of action matrices of candidate policies. Rows are read once and
+    all policies are evaluated together.
+
+    Args:
+    ------
+        data_feeder (StaticDataFeeder):
+            The data feeder that provides the rows of the backtest. The
+            first n_steps + 1 rows of its range are used.
+        actions (np.ndarray):
+            The notional value of assets to buy (positive) or sell
+            (negative) at each step, with shape (..., n_steps,
+            n_assets).
+        initial_cash (float):
+            The initial amount of cash of the account. Default is 1e6.
+        initial_asset_quantities (Optional[np.ndarray]):
+            The initial quantity of each asset. If None, the account
+            starts with no assets.
+        block_size (int):
+            The number of rows read from the data feeder at once.
+            Default is 1024.
+
+    Returns:
+    --------
+        Dict[str, np.ndarray]:
+            A dictionary of histories with n_steps + 1 rows, the first
+            row being the state after reset. Keys are asset_prices,
+            cash, asset_quantities, holds, positions, longs, shorts,
+            portfolio_value, equity, marginable_equity,
+            maintenance_margin_requirement, excess_margin, profit and
+            return_. Per asset histories have shape (..., n_steps + 1,
+            n_assets) and account histories have shape (..., n_steps +
+            1). sharpe has the leading shape of actions and holds the
+            sharpe ratio of the equity history.
+
+    Raises:
+    -------
+        ValueError:
+            If actions do not have one column per asset, or if the data
+            feeder has fewer than n_steps + 1 rows.
+
+    Notes:
+    ------
+        Computing maintenance margin requirement requires assets to
+        implement get_maintenance_margin, like AlpacaAsset. Assets that
+        only implement the scalar version are evaluated element by
+        element by the default get_maintenance_margins. Histories
+        of candidate policies are held in memory together, so memory
+        grows with number of policies times n_steps times n_assets.
+
+    Example:
+    --------
+        Scoring a buy and hold strategy:
+
+        >>> actions = np.zeros((data_feeder.n_rows - 1, n_assets))
+        >>> actions[0] = 1e5
+        >>> history = backtest(data_feeder, actions)
+        >>> history['equity'][-1], history['sharpe']
+    """
+    assets = data_feeder.assets
+    n_assets = len(assets)
+
+    actions = np.asarray(actions, dtype=GLOBAL_DATA_TYPE)
+    if actions.ndim < 2 or actions.shape[-1] != n_assets:
+        raise ValueError(
+            f'Actions must have shape (..., n_steps, {n_assets}), '
+            f'got {actions.shape}.')
+    n_steps = actions.shape[-2]
+
+    asset_prices = _get_asset_prices(data_feeder, n_steps + 1, block_size)
+    traded = actions != 0
+
+    batch_shape = actions.shape[:-2]
+    initial_asset_quantities = (np.zeros(n_assets, dtype=GLOBAL_DATA_TYPE)
+                                if initial_asset_quantities is None else
+                                np.asarray(initial_asset_quantities,
+                                           dtype=GLOBAL_DATA_TYPE))
+    quantity_changes = np.concatenate([
+        np.broadcast_to(initial_asset_quantities,
+                        batch_shape + (1, n_assets)),
+        np.divide(actions,
+                  asset_prices[:-1],
+                  out=np.zeros_like(actions),
+                  where=traded)
+    ], axis=-2)
+    asset_quantities = np.cumsum(quantity_changes, axis=-2)
+
+    cash_changes = np.concatenate([
+        np.full(batch_shape + (1, ), initial_cash, dtype=GLOBAL_DATA_TYPE),
+        -actions.sum(axis=-1)
+    ], axis=-1)
+    cash = np.cumsum(cash_changes, axis=-1)
+
+    holds = _get_holds(asset_quantities, traded)
+
+    values = asset_quantities * asset_prices
+    positions = np.abs(values)
+    longs = np.where(values > 0, values, 0).sum(axis=-1)
+    shorts = np.where(values < 0, positions, 0).sum(axis=-1)
+    portfolio_value = positions.sum(axis=-1)
+    equity = longs + cash - shorts
+
+    non_marginable = np.array([not asset.marginable for asset in assets])
+    non_marginable_longs = np.where(non_marginable & (values > 0), values,
+                                    0).sum(axis=-1)
+    marginable_equity = equity - non_marginable_longs
+
+    short = asset_quantities < 0
+    maintenance_margins = np.stack([
+        asset.get_maintenance_margins(asset_prices[:, index],
+                                      short[..., index])
+        for index, asset in enumerate(assets)
+    ], axis=-1)
+    maintenance_margin_requirement = (maintenance_margins *
+                                      positions).sum(axis=-1)
+    excess_margin = marginable_equity - maintenance_margin_requirement
+
+    initial_equity = equity[..., :1]
+    profit = equity - initial_equity
+    return_ = profit / initial_equity
+
+    equity_history = equity.astype(np.float64)
+    returns = np.diff(equity_history, axis=-1) / equity_history[..., :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = returns.mean(axis=-1) / returns.std(axis=-1, ddof=1)
+
+    history = {
+        'asset_prices': asset_prices,
+        'cash': cash,
+        'asset_quantities': asset_quantities,
+        'holds': holds,
+        'positions': positions,
+        'longs': longs,
+        'shorts': shorts,
+        'portfolio_value': portfolio_value,
+        'equity': equity,
+        'marginable_equity': marginable_equity,
+        'maintenance_margin_requirement': maintenance_margin_requirement,
+        'excess_margin': excess_margin,
+        'profit': profit,
+        'return_': return_,
+        'sharpe': sharpe
+    }
+
+    return history
+
+
+def _get_asset_prices(data_feeder: StaticDataFeeder, n_rows: int,
+                      block_size: int) -> np.ndarray:
+    """
+    Reads the asset prices of the first n_rows rows of a data feeder
+    into an array of shape (n_rows, n_assets). Rows are read in blocks
+    and only the asset price columns are copied.
+
+    Args:
+    ------
+        data_feeder (StaticDataFeeder):
+            The data feeder to read the rows from.
+        n_rows (int):
+            The number of rows to read.
+        block_size (int):
+            The maximum number of rows read at once.
+
+    Returns:
+    --------
+        np.ndarray:
+            The asset prices of the rows.
+
+    Raises:
+    -------
+        ValueError:
+            If the data feeder has fewer than n_rows rows.
+    """
+    asset_prices_index = np.flatnonzero(data_feeder.asset_prices_mask)
+    asset_prices = np.empty((n_rows, len(asset_prices_index)),
+                            dtype=GLOBAL_DATA_TYPE)
+
+    row = 0
+    for block in data_feeder.get_feature_blocks(block_size=block_size):
+        n_block_rows = min(len(block), n_rows - row)
+        asset_prices[row:row + n_block_rows] = (
+            block[:n_block_rows, asset_prices_index])
+        row += n_block_rows
+        if row == n_rows:
+            break
+
+    if row < n_rows:
+        raise ValueError(
+            f'Data feeder has {row} rows, {n_rows} rows are needed for '
+            f'{n_rows - 1} steps.')
+
+    return asset_prices
+
+
+def _get_holds(asset_quantities: np.ndarray, traded: np.ndarray) -> np.ndarray:
+    """
+    Computes the hold counters of TrainMarketEnv from histories of
+    asset quantities and trades. At each row the hold of an asset grows
+    by one if its quantity is not zero, and trading an asset resets its
+    hold to zero before moving to the next row. Hence the hold at a row
+    is the number of rows with nonzero quantity since the row that
+    followed the last trade, which is a difference of cumulative sums.
+
+    Args:
+    ------
+        asset_quantities (np.ndarray):
+            The asset quantities at each row, with shape (..., n_rows,
+            n_assets).
+        traded (np.ndarray):
+            Whether each asset is traded at each step, with shape (...,
+            n_rows - 1, n_assets).
+
+    Returns:
+    --------
+        np.ndarray:
+            The holds at each row, with the shape of asset_quantities.
+    """
+    held = np.cumsum(asset_quantities != 0, axis=-2)
+    held = np.concatenate([np.zeros_like(held[..., :1, :]), held], axis=-2)
+
+    rows = np.arange(1, traded.shape[-2] + 1)[:, None]
+    start_rows = np.maximum.accumulate(np.where(traded, rows, 0), axis=-2)
+    start_rows = np.concatenate(
+        [np.zeros_like(start_rows[..., :1, :]), start_rows], axis=-2)
+
+    holds = held[..., 1:, :] - np.take_along_axis(held, start_rows, axis=-2)
+    return holds.astype(GLOBAL_DATA_TYPE)
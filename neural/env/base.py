@@ -46,6 +46,7 @@ Notes:
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from copy import copy
 from typing import Tuple, Dict, TYPE_CHECKING, Optional
 
 from gym import spaces, Env
@@ -172,15 +173,29 @@ class TrainMarketEnv(AbstractMarketEnv):
         initial_asset_quantities (np.ndarray, optional):
             The initial quantity of assets to allocate to the
             environment. Default is None.
+        block_size (int, optional):
+            If set, features are read from the data feeder in blocks of
+            up to block_size rows and the environment steps through the
+            current block with a cursor. Default is None, namely rows
+            are read one at a time.
+        episode_assets (int, optional):
+            If set, each episode trades a random subset of episode_assets
+            assets drawn from the universe assets of the data feeder,
+            and only the columns of the subset are fed. Default is None,
+            namely all assets of the data feeder are traded.
+        universe_assets (List[AbstractAsset]):
+            The assets that episode subsets are drawn from.
         metadata (DatasetMetadata):
             Metadata about the dataset used. This includes the feature
             schema, asset names, and asset price mask.
         assets (List[AbstractAsset]):
-            A list of assets in the dataset.
+            A list of assets fed by the data feeder.
         n_assets (int):
-            The number of assets in the dataset.
+            The number of assets fed by the data feeder.
         n_features (int):
-            The number of features in the dataset.
+            The number of features fed by the data feeder. Less than
+            the number of columns in the dataset if the data feeder
+            projects columns.
         holds (np.ndarray):
             An integer array representing the number of steps each asset
             has been held by the environment. As soon as a trade
@@ -207,12 +222,33 @@ class TrainMarketEnv(AbstractMarketEnv):
             shares, or integer, allowing for only whole shares.
         _asset_prices (np.ndarray):
             An array representing the current asset prices of the
-            environment.
+            environment. Gathered once per update.
+        _asset_prices_index (np.ndarray):
+            Column indices of asset close prices in features, converted
+            once from the price mask of the data feeder.
         features_generator (Iterator[np.ndarray]):
             An iterator that yields the next feature row of the dataset.
             This iterator is used to update the environment state by
             moving to the next time step and updating the environment
-            variables.
+            variables. If block_size is set, it yields blocks of rows.
+        _block (np.ndarray):
+            The current block of feature rows if block_size is set.
+        _block_cursor (int):
+            Position of the next row to be read from the current block.
+        _random_state (np.random.Generator):
+            The random number generator used to draw asset subsets.
+        preallocate_observation (bool):
+            If True, observations are views of a flat buffer owned by
+            the environment that is filled in place at each step.
+        copy_observation (bool):
+            If True, returned observations are copies that stay valid
+            after later steps.
+        _observation_buffer (Optional[np.ndarray]):
+            The flat buffer holding cash, asset quantities, holds and
+            features, in this order. None unless observations are
+            preallocated.
+        _observation_slices (Dict[str, slice]):
+            The slice of the flat buffer of each observation key.
         info (Dict):
             A dictionary for storing additional information (unused for
             now)
@@ -246,6 +282,8 @@ class TrainMarketEnv(AbstractMarketEnv):
         done (bool):
             A boolean value indicating whether the current episode is
             finished.
+        index (int):
+            The row index of the current features in the dataset.
         cash (float):
             The current amount of cash in the environment.
         asset_quantities (np.ndarray):
@@ -263,6 +301,9 @@ class TrainMarketEnv(AbstractMarketEnv):
     update(self) -> None:
         Uses features_generator to update the environment state by
         moving to the next time step.
+    sample_assets(self) -> None:
+        Draws a random subset of universe assets and sets the data
+        feeder to feed only its columns.
     get_observation(self) -> Dict[str, np.ndarray[float]):
         Constructs the current observation from the environment's state
         variables. The observation includes:
@@ -299,6 +340,11 @@ class TrainMarketEnv(AbstractMarketEnv):
         data_feeder: StaticDataFeeder,
         initial_cash: float = 1e6,
         initial_asset_quantities: Optional[np.ndarray] = None,
+        block_size: Optional[int] = None,
+        episode_assets: Optional[int] = None,
+        seed: Optional[int] = None,
+        preallocate_observation: bool = False,
+        copy_observation: bool = False,
     ) -> None:
         """
         Initialize the TrainMarketEnv class.
@@ -314,15 +360,68 @@ class TrainMarketEnv(AbstractMarketEnv):
         initial_asset_quantities (np.ndarray, optional):
             The initial quantity of assets to allocate to the
             environment. Default is None.
+        block_size (int, optional):
+            If set, features are read from the data feeder in blocks of
+            up to block_size rows using get_feature_blocks, and update
+            steps through the current block with a cursor instead of
+            resuming the feeder generator at every step. Default is
+            None.
+        episode_assets (int, optional):
+            If set, at each reset a random subset of episode_assets
+            assets is drawn from the universe assets of the data
+            feeder, and the data feeder reads only the columns of the
+            subset. The number of assets and features stays fixed, so
+            observation and action spaces do not change. The
+            environment works on a shallow copy of the data feeder, so
+            data feeders shared between environments are not affected.
+            Default is None.
+        seed (int, optional):
+            Seed of the random number generator used to draw asset
+            subsets. Default is None.
+        preallocate_observation (bool, optional):
+            If True, observation arrays are named views of one flat
+            buffer that the environment fills in place at each step,
+            instead of the internal state arrays of the environment.
+            Wrappers that modify observations in place then no longer
+            modify cash, asset quantities or holds of the environment,
+            and flattening observations needs no concatenation. Default
+            is False.
+        copy_observation (bool, optional):
+            If True, each returned observation is a copy, so consumers
+            that keep references to observations, such as observation
+            buffers, do not see them change at later steps. With
+            preallocated observations, the flat buffer is copied once.
+            Default is False.
+
+        Raises:
+        -------
+            ValueError:
+                If episode_assets is not in [1, number of universe
+                assets].
         """
         self.data_feeder = data_feeder
         self.initial_cash = initial_cash
         self.initial_asset_quantities = initial_asset_quantities
+        self.block_size = block_size
+        self.episode_assets = episode_assets
+
+        self.universe_assets = None
+        self._random_state = np.random.default_rng(seed)
+
+        if self.episode_assets is not None:
+            self.data_feeder = copy(data_feeder)
+            self.universe_assets = self.data_feeder.universe_assets
+            if not 0 < episode_assets <= len(self.universe_assets):
+                raise ValueError(
+                    f'episode_assets must be in [1, '
+                    f'{len(self.universe_assets)}], got {episode_assets}.')
+            self.data_feeder.set_assets(
+                self.universe_assets[:episode_assets])
 
         self.metadata = self.data_feeder.metadata
-        self.assets = self.metadata.assets
+        self.assets = self.data_feeder.assets
         self.n_assets = len(self.assets)
-        self.n_features = self.metadata.n_features
+        self.n_features = self.data_feeder.n_features
 
         self.holds = None
         self.features = None
@@ -330,10 +429,28 @@ class TrainMarketEnv(AbstractMarketEnv):
         self._cash = None
         self._asset_quantities = None
         self._asset_prices = None
+        self._asset_prices_index = np.flatnonzero(
+            self.data_feeder.asset_prices_mask)
+
+        self.preallocate_observation = preallocate_observation
+        self.copy_observation = copy_observation
+        self._observation_slices = {
+            "cash": slice(0, 1),
+            "asset_quantities": slice(1, 1 + self.n_assets),
+            "holds": slice(1 + self.n_assets, 1 + 2 * self.n_assets),
+            "features": slice(1 + 2 * self.n_assets,
+                              1 + 2 * self.n_assets + self.n_features),
+        }
+        self._observation_buffer = (np.empty(
+            1 + 2 * self.n_assets + self.n_features, dtype=GLOBAL_DATA_TYPE)
+                                    if preallocate_observation else None)
 
         self.features_generator = None
         self.info = None
 
+        self._block = None
+        self._block_cursor = None
+
         self.action_space = spaces.Box(
             low=-np.inf,
             high=np.inf,
@@ -384,7 +501,27 @@ class TrainMarketEnv(AbstractMarketEnv):
                 A boolean value indicating whether the current episode
                 is finished.
         """
-        return self.data_feeder.done
+        if self.block_size is None:
+            return self.data_feeder.done
+        return (self.data_feeder.done
+                and self._block_cursor == len(self._block))
+
+    @property
+    def index(self) -> int:
+        """
+        The row index of the current features in the dataset. When
+        features are read in blocks, index of the data feeder points to
+        the last row of the current block, and the cursor is used to
+        find the row of the current features.
+
+        Returns:
+        --------
+            index (int):
+                The row index of the current features.
+        """
+        if self.block_size is None:
+            return self.data_feeder.index
+        return self.data_feeder.index - len(self._block) + self._block_cursor
     
     @property
     def cash(self) -> float:
@@ -419,7 +556,8 @@ class TrainMarketEnv(AbstractMarketEnv):
     def asset_prices(self) -> np.ndarray:
         """
         An array representing the current asset prices of the
-        environment.
+        environment. Prices are gathered from features once per update
+        and reused by every access in the same step.
         
         Returns:
         --------
@@ -427,18 +565,55 @@ class TrainMarketEnv(AbstractMarketEnv):
                 An array representing the current asset prices of the
                 assets.
         """
-        asset_prices_mask = self.metadata.asset_prices_mask
-        self._asset_prices = self.features[asset_prices_mask]
-
         return self._asset_prices
 
+    def sample_assets(self) -> None:
+        """
+        Draws a random subset of episode_assets universe assets and sets
+        the data feeder to feed only the columns of the subset. Assets
+        list is updated in place, so wrappers holding a reference to it
+        see the assets of the current episode.
+
+        Raises:
+        -------
+            ValueError:
+                If the subset has a different number of features than
+                the first subset, namely if universe assets have
+                different numbers of columns.
+        """
+        indices = np.sort(
+            self._random_state.choice(len(self.universe_assets),
+                                      size=self.episode_assets,
+                                      replace=False))
+        self.data_feeder.set_assets(
+            [self.universe_assets[index] for index in indices])
+
+        if self.data_feeder.n_features != self.n_features:
+            raise ValueError(
+                f'Asset subset has {self.data_feeder.n_features} features, '
+                f'expected {self.n_features}. Universe assets must have the '
+                'same number of columns.')
+        self.assets[:] = self.data_feeder.assets
+        self._asset_prices_index = np.flatnonzero(
+            self.data_feeder.asset_prices_mask)
+        return None
+
     def update(self) -> None:
         """
         Updates the environment state by moving to the next time step
         and updating the environment variables such as features and
         holds.
         """
-        self.features = next(self.features_generator)
+        if self.block_size is None:
+            self.features = next(self.features_generator)
+        else:
+            if self._block_cursor == len(self._block):
+                self._block = next(self.features_generator)
+                self._block_cursor = 0
+            self.features = self._block[self._block_cursor]
+            self._block_cursor += 1
+
+        self._asset_prices = self.features[self._asset_prices_index]
         self.holds[self.asset_quantities != 0] += 1
 
         return None
@@ -458,6 +633,12 @@ class TrainMarketEnv(AbstractMarketEnv):
             Dict[str, np.ndarray[float]] The observation dictionary
             containing the current cash balance, asset quantities,
             holds, and features.
+
+        Notes:
+        ------
+            Unless copy_observation is True, observation arrays are
+            overwritten at later steps. A new dictionary is returned at
+            each step, so wrappers can add or remove keys.
         """
         observation = {
             "cash": self.cash,
@@ -465,7 +646,26 @@ class TrainMarketEnv(AbstractMarketEnv):
             "holds": self.holds,
             "features": self.features,
         }
-        
+
+        if self._observation_buffer is None:
+            if self.copy_observation:
+                observation = {
+                    key: np.array(array)
+                    for key, array in observation.items()
+                }
+            return observation
+
+        buffer = self._observation_buffer
+        for key, array in observation.items():
+            buffer[self._observation_slices[key]] = array
+
+        if self.copy_observation:
+            buffer = buffer.copy()
+        observation = {
+            key: buffer[observation_slice]
+            for key, observation_slice in self._observation_slices.items()
+        }
+
         return observation
 
     def place_orders(self, actions: np.ndarray[float]) -> None:
@@ -485,15 +685,20 @@ class TrainMarketEnv(AbstractMarketEnv):
                 the asset (e.g. 100 means buy 100 dollars worth of the
                 asset, while -100 means sell 100 dollars worth of the
                 asset, given currency is USD).
+
+        Notes:
+        ------
+            Orders of all assets are applied at once with array
+            operations. Assets with zero action are left untouched,
+            namely their quantities and holds do not change.
         """
-        for asset, action in enumerate(actions):
-            if action == 0:
-                continue
+        actions = np.asarray(actions)
+        traded = actions != 0
 
-            quantity = action / self.asset_prices[asset]
-            self._asset_quantities[asset] += quantity
-            self._cash -= action
-            self.holds[asset] = 0
+        self._asset_quantities[traded] += (actions[traded] /
+                                           self.asset_prices[traded])
+        self._cash -= actions[traded].sum()
+        self.holds[traded] = 0
 
         return None
 
@@ -501,7 +706,8 @@ class TrainMarketEnv(AbstractMarketEnv):
         """
         Resets the market environment to its initial state. Sets initial
         values for cash, asset quantities, and holds. Returns the
-        initial observation. 
+        initial observation. If episode_assets is set, a new subset of
+        assets is drawn.
 
         Returns:
         --------
@@ -509,7 +715,17 @@ class TrainMarketEnv(AbstractMarketEnv):
             The initial observation dictionary containing the current
             cash balance, asset quantities, holds, and features.
         """
-        self.features_generator = self.data_feeder.get_features_generator()
+        if self.episode_assets is not None:
+            self.sample_assets()
+
+        if self.block_size is None:
+            self.features_generator = (
+                self.data_feeder.get_features_generator())
+        else:
+            self.features_generator = self.data_feeder.get_feature_blocks(
+                block_size=self.block_size)
+            self._block = np.empty((0, self.n_features))
+            self._block_cursor = 0
         self.holds = np.zeros((self.n_assets, ), dtype=GLOBAL_DATA_TYPE)
 
         self._cash = np.array([self.initial_cash], dtype=GLOBAL_DATA_TYPE)
@@ -590,11 +806,13 @@ class TradeMarketEnv(TrainMarketEnv):
             Metadata about the dataset used. This includes the feature
             schema, asset names, and asset price mask.
         assets (List[AbstractAsset]):
-            A list of assets in the dataset.
+            A list of assets fed by the data feeder.
         n_assets (int):
-            The number of assets in the dataset.
+            The number of assets fed by the data feeder.
         n_features (int):
-            The number of features in the dataset.
+            The number of features fed by the data feeder. Less than
+            the number of columns in the dataset if the data feeder
+            projects columns.
         holds (np.ndarray):
             An integer array representing the number of steps each asset
             has been held by the environment. As soon as a trade
@@ -621,7 +839,10 @@ class TradeMarketEnv(TrainMarketEnv):
             shares, or integer, allowing for only whole shares.
         _asset_prices (np.ndarray):
             An array representing the current asset prices of the
-            environment.
+            environment. Gathered once per update.
+        _asset_prices_index (np.ndarray):
+            Column indices of asset close prices in features, converted
+            once from the price mask of the data feeder.
         features_generator (Iterator[np.ndarray]):
             An iterator that yields the next feature row of the dataset.
             This iterator is used to update the environment state by
@@ -0,0 +1,689 @@
+"""
+batched.py
+
+Description:
+------------
+This module defines a batched market environment that simulates many
+training accounts in a single object. Cash, asset quantities and holds
+of all accounts are stored as arrays with a leading environment
+dimension, and orders, updates and rewards are computed with numpy
+operations across accounts. The environment exposes the vectorized
+environment interface of stable-baselines3 directly, so the Python
+overhead of a step is paid once for all accounts instead of once per
+environment as with DummyVecEnv or SubprocVecEnv. The environment is
+standalone: trainers build piped TrainMarketEnv instances and do not
+use it, so it is passed to stable-baselines3 algorithms directly.
+
+License:
+--------
+    MIT License. See LICENSE.md file.
+
+Author(s):
+-------
+    Reza Soleymanifar, Email: Reza@Soleymanifar.com
+
+Classes:
+--------
+    BatchedTrainMarketEnv:
+        A bare metal market environment that simulates n_envs accounts
+        with no market logic, exposing the stable-baselines3 VecEnv
+        interface.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+# Spaces of the library stable-baselines3 is built on, namely gym before
+# version 2.0 and gymnasium after, since VecEnv spaces are not converted.
+from stable_baselines3.common.vec_env.base_vec_env import spaces
+
+from neural.common.constants import GLOBAL_DATA_TYPE
+from neural.data.base import RandomEpisodeDataFeeder, StaticDataFeeder
+
+
+class BatchedTrainMarketEnv(VecEnv):
+    """
+    A bare metal market environment that simulates n_envs training
+    accounts with no market logic, similar to n_envs copies of
+    TrainMarketEnv. Cash, asset quantities and holds are arrays of
+    shape (n_envs,), (n_envs, n_assets) and (n_envs, n_assets), and
+    placing orders, updating features and computing rewards are
+    vectorized across accounts. The environment implements the VecEnv
+    interface of stable-baselines3 and can be passed to its algorithms
+    directly, including automatic reset of accounts whose episode is
+    finished.
+
+    Accounts are fed by data feeders in one of two modes. If all
+    accounts receive the same data feeder, rows are streamed from it
+    once and the feature row is shared by all accounts. Otherwise, for
+    example with splits of a data feeder, each distinct data feeder is
+    streamed in blocks of up to block_size rows, and the feature rows
+    of accounts are gathered from the current blocks by per-feeder
+    cursors at each step. Accounts with the same data feeder share its
+    blocks.
+
+    Attributes:
+    -----------
+        data_feeders (List[StaticDataFeeder]):
+            The data feeder of each account.
+        initial_cash (float):
+            The initial amount of cash of each account.
+        initial_asset_quantities (Optional[np.ndarray]):
+            The initial quantity of assets of each account. If None,
+            accounts start with no assets.
+        block_size (int):
+            The maximum number of rows read from a distinct data feeder
+            at once, if rows are gathered.
+        action_bound (float):
+            The maximum absolute notional value of an order.
+        assets (List[AbstractAsset]):
+            A list of assets fed by the data feeders.
+        n_assets (int):
+            The number of assets fed by the data feeders.
+        n_features (int):
+            The number of features fed by the data feeders.
+        cash (np.ndarray):
+            The cash of each account, with shape (n_envs,).
+        asset_quantities (np.ndarray):
+            The asset quantities of each account, with shape (n_envs,
+            n_assets).
+        holds (np.ndarray):
+            The number of steps each asset has been held by each
+            account, with shape (n_envs, n_assets).
+        features (np.ndarray):
+            The current features of each account, with shape (n_envs,
+            n_features). A read only broadcast view if the feature row
+            is shared.
+        asset_prices (np.ndarray):
+            The current asset prices of each account, with shape
+            (n_envs, n_assets).
+        equity (np.ndarray):
+            The current equity of each account, namely cash plus the
+            signed value of asset positions, with shape (n_envs,).
+        action_space (spaces.Box):
+            The action space of a single account. Each action is the
+            notional value of the asset to buy or sell, bounded by
+            action_bound.
+        observation_space (spaces.Dict):
+            The observation space of a single account, identical to
+            that of TrainMarketEnv.
+        _shared (bool):
+            True if all accounts are fed by the same data feeder.
+        _features_generator (Optional[Iterable[np.ndarray]]):
+            The generator of the shared feature rows. None if rows are
+            gathered.
+        _groups (Optional[List[StaticDataFeeder]]):
+            The distinct data feeders. None if the feature row is
+            shared.
+        _account_groups (Optional[np.ndarray]):
+            The index of the data feeder of each account in _groups.
+        _block_generators (Optional[List[Iterable[np.ndarray]]]):
+            The generator of blocks of each distinct data feeder.
+        _blocks (Optional[np.ndarray]):
+            The current block of each distinct data feeder, with shape
+            (n_groups, block_size, n_features).
+        _block_rows (Optional[np.ndarray]):
+            The number of rows in the current block of each distinct
+            data feeder.
+        _block_cursors (Optional[np.ndarray]):
+            The index of the current row of each distinct data feeder
+            in its current block.
+        _episode_rows (Optional[np.ndarray]):
+            The number of rows of each distinct data feeder.
+        _cursors (Optional[np.ndarray]):
+            The index of the current row of each distinct data feeder
+            relative to its first row.
+        _asset_prices_index (np.ndarray):
+            Column indices of asset close prices in features.
+        _actions (Optional[np.ndarray]):
+            The actions passed to step_async.
+
+    Properties:
+    -----------
+        n_envs (int):
+            The number of accounts.
+
+    Methods:
+    --------
+        reset(self) -> Dict[str, np.ndarray]:
+            Resets all accounts and returns the batch of initial
+            observations.
+        step_async(self, actions: np.ndarray) -> None:
+            Stores the actions of all accounts for step_wait.
+        step_wait(self) -> Tuple[Dict[str, np.ndarray], np.ndarray,
+        np.ndarray, List[Dict]]:
+            Places orders, moves all accounts to the next row and
+            returns observations, rewards, dones and infos.
+        place_orders(self, actions: np.ndarray) -> None:
+            Places orders of all accounts at current prices.
+        update(self) -> None:
+            Moves all accounts to the next row.
+        get_equity(self) -> np.ndarray:
+            Returns the equity of each account at current prices.
+        get_observation(self, indices) -> Dict[str, np.ndarray]:
+            Returns a copy of the observations of accounts.
+        close(self) -> None:
+            Closes the feature and block generators.
+        get_attr, set_attr, env_method, env_is_wrapped, seed:
+            Implementations of the VecEnv interface. Accounts are not
+            separate objects, so attributes and methods are those of
+            the batched environment.
+
+    Notes:
+    ------
+        The reward of a step is the change of equity of each account,
+        the same reward signal RewardGeneratorWrapper produces for
+        TrainMarketEnv. Pipes are gym wrappers of single environments
+        and cannot be applied to a batched environment. Use the
+        vectorized wrappers of stable-baselines3, such as VecNormalize,
+        for observation and reward normalization.
+
+        Random episode data feeders are supported only when shared by
+        all accounts, since episodes of gathered rows end after a fixed
+        number of rows. Gathered rows take n_groups * block_size *
+        n_features values of memory, regardless of the length of the
+        data feeders.
+
+        Trainers do not use the batched environment, since pipes cannot
+        be applied to it. Pass it to stable-baselines3 algorithms
+        directly, as in the example below.
+
+    Example:
+    --------
+    >>> from neural.data.base import StaticDataFeeder
+    >>> from neural.env.batched import BatchedTrainMarketEnv
+    >>> data_feeder = StaticDataFeeder(metadata, datasets)
+    >>> env = BatchedTrainMarketEnv(data_feeder.split(n=8),
+    ...                             action_bound=1e4)
+    >>> model = PPO('MultiInputPolicy', env)
+    """
+
+    def __init__(
+        self,
+        data_feeders: List[StaticDataFeeder],
+        initial_cash: float = 1e6,
+        initial_asset_quantities: Optional[np.ndarray] = None,
+        block_size: int = 1024,
+        action_bound: float = 1e4,
+    ) -> None:
+        """
+        Initializes the batched market environment.
+
+        Args:
+        -----------
+        data_feeders (List[StaticDataFeeder]):
+            The data feeder of each account. Passing the same data
+            feeder for all accounts shares the feature row among them.
+        initial_cash (float, optional):
+            The initial amount of cash of each account. Default is 1e6.
+        initial_asset_quantities (np.ndarray, optional):
+            The initial quantity of assets of each account. Default is
+            None.
+        block_size (int, optional):
+            The maximum number of rows read from a distinct data feeder
+            at once, if accounts have different data feeders. Default
+            is 1024.
+        action_bound (float, optional):
+            The maximum absolute notional value of an order. The action
+            space is the box [-action_bound, action_bound] for each
+            asset, and actions outside of it are clipped. Algorithms of
+            stable-baselines3 require a finite action space. Default is
+            1e4.
+
+        Raises:
+        -------
+            ValueError:
+                If no data feeders are passed, if data feeders feed
+                different columns, if random episode data feeders are
+                not shared by all accounts, or if action_bound is not
+                positive and finite.
+        """
+        if not data_feeders:
+            raise ValueError('At least one data feeder is required.')
+        if not 0 < action_bound < np.inf:
+            raise ValueError(
+                f'action_bound = {action_bound} must be positive and finite.')
+
+        self.data_feeders = data_feeders
+        self.initial_cash = initial_cash
+        self.initial_asset_quantities = initial_asset_quantities
+        self.block_size = block_size
+        self.action_bound = action_bound
+
+        data_feeder = data_feeders[0]
+        for other_data_feeder in data_feeders[1:]:
+            if not np.array_equal(data_feeder.columns,
+                                  other_data_feeder.columns):
+                raise ValueError('Data feeders must feed the same columns.')
+
+        self.assets = data_feeder.assets
+        self.n_assets = len(self.assets)
+        self.n_features = data_feeder.n_features
+        self._asset_prices_index = np.flatnonzero(
+            data_feeder.asset_prices_mask)
+
+        self._shared = all(other_data_feeder is data_feeder
+                           for other_data_feeder in data_feeders)
+        self._features_generator = None
+        self._groups = None
+        self._account_groups = None
+        self._block_generators = None
+        self._blocks = None
+        self._block_rows = None
+        self._block_cursors = None
+        self._episode_rows = None
+        self._cursors = None
+        self._actions = None
+
+        if not self._shared:
+            if any(
+                    isinstance(other_data_feeder, RandomEpisodeDataFeeder)
+                    for other_data_feeder in data_feeders):
+                raise ValueError(
+                    'Random episode data feeders must be shared by all '
+                    'environments.')
+            self._set_groups()
+
+        n_envs = len(data_feeders)
+        self.cash = np.zeros((n_envs, ), dtype=GLOBAL_DATA_TYPE)
+        self.asset_quantities = np.zeros((n_envs, self.n_assets),
+                                         dtype=GLOBAL_DATA_TYPE)
+        self.holds = np.zeros((n_envs, self.n_assets), dtype=GLOBAL_DATA_TYPE)
+        self.features = None
+        self.asset_prices = None
+        self.equity = None
+
+        action_space = spaces.Box(
+            low=-action_bound,
+            high=action_bound,
+            shape=(self.n_assets, ),
+            dtype=GLOBAL_DATA_TYPE,
+        )
+        observation_space = spaces.Dict({
+            "cash":
+            spaces.Box(low=-np.inf,
+                       high=np.inf,
+                       shape=(1, ),
+                       dtype=GLOBAL_DATA_TYPE),
+            "asset_quantities":
+            spaces.Box(
+                low=-np.inf,
+                high=np.inf,
+                shape=(self.n_assets, ),
+                dtype=GLOBAL_DATA_TYPE,
+            ),
+            "holds":
+            spaces.Box(
+                low=0,
+                high=np.inf,
+                shape=(self.n_assets, ),
+                dtype=GLOBAL_DATA_TYPE,
+            ),
+            "features":
+            spaces.Box(
+                low=-np.inf,
+                high=np.inf,
+                shape=(self.n_features, ),
+                dtype=GLOBAL_DATA_TYPE,
+            ),
+        })
+
+        super().__init__(num_envs=n_envs,
+                         observation_space=observation_space,
+                         action_space=action_space)
+
+        return None
+
+    @property
+    def n_envs(self) -> int:
+        """
+        The number of accounts simulated by the environment.
+
+        Returns:
+        --------
+            int:
+                The number of accounts.
+        """
+        return self.num_envs
+
+    def _set_groups(self) -> None:
+        """
+        Groups accounts by distinct data feeder and allocates a block
+        buffer of up to block_size rows for each distinct data feeder.
+        Rows are streamed into the buffers as accounts step, so memory
+        does not grow with the length of the data feeders.
+        """
+        group_indices = dict()
+        self._groups = list()
+        for data_feeder in self.data_feeders:
+            if id(data_feeder) not in group_indices:
+                group_indices[id(data_feeder)] = len(self._groups)
+                self._groups.append(data_feeder)
+        n_groups = len(self._groups)
+
+        self._account_groups = np.array([
+            group_indices[id(data_feeder)]
+            for data_feeder in self.data_feeders
+        ])
+        dtype = np.result_type(*[
+            dataset.dtype for data_feeder in self._groups
+            for dataset in data_feeder.datasets
+        ])
+        self._block_generators = [None] * n_groups
+        self._blocks = np.empty((n_groups, self.block_size, self.n_features),
+                                dtype=dtype)
+        self._block_rows = np.zeros(n_groups, dtype=int)
+        self._block_cursors = np.zeros(n_groups, dtype=int)
+        self._episode_rows = np.array(
+            [data_feeder.n_rows for data_feeder in self._groups])
+        self._cursors = np.zeros(n_groups, dtype=int)
+
+        return None
+
+    def _restart_groups(self, groups: np.ndarray) -> None:
+        """
+        Restarts the block generators of distinct data feeders, so that
+        their next row is their first row.
+        """
+        for group in groups:
+            if self._block_generators[group] is not None:
+                self._block_generators[group].close()
+            self._block_generators[group] = (
+                self._groups[group].get_feature_blocks(
+                    block_size=self.block_size))
+        self._cursors[groups] = -1
+        self._block_cursors[groups] = -1
+        self._block_rows[groups] = 0
+        return None
+
+    def _advance_groups(self, groups: np.ndarray | slice) -> None:
+        """
+        Moves distinct data feeders to their next row, reading the next
+        block of those whose current block is exhausted, and gathers
+        the feature rows of all accounts from the current blocks.
+        """
+        self._cursors[groups] += 1
+        self._block_cursors[groups] += 1
+
+        for group in np.flatnonzero(
+                self._block_cursors == self._block_rows):
+            block = next(self._block_generators[group])
+            self._blocks[group, :len(block)] = block
+            self._block_rows[group] = len(block)
+            self._block_cursors[group] = 0
+
+        self.features = self._blocks[
+            self._account_groups, self._block_cursors[self._account_groups]]
+        return None
+
+    def _get_indices(self, indices: Optional[int | Iterable[int]]) -> List:
+        """
+        Converts indices of accounts to a list of indices. None selects
+        all accounts.
+        """
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    def _reset_accounts(self, indices: np.ndarray | slice) -> None:
+        """
+        Resets cash, asset quantities and holds of accounts to their
+        initial values.
+        """
+        self.cash[indices] = self.initial_cash
+        self.asset_quantities[indices] = (0
+                                          if self.initial_asset_quantities
+                                          is None else
+                                          self.initial_asset_quantities)
+        self.holds[indices] = 0
+        return None
+
+    def update(self) -> None:
+        """
+        Moves all accounts to the next row of their data feeders and
+        updates features, asset prices and holds. If the feature row is
+        shared, a single row is read and broadcast to all accounts.
+        Otherwise rows are gathered from the current blocks of distinct
+        data feeders.
+        """
+        if self._shared:
+            row = next(self._features_generator)
+            self.features = np.broadcast_to(row,
+                                            (self.num_envs, self.n_features))
+        else:
+            self._advance_groups(slice(None))
+
+        self.asset_prices = self.features[:, self._asset_prices_index]
+        self.holds[self.asset_quantities != 0] += 1
+
+        return None
+
+    def place_orders(self, actions: np.ndarray) -> None:
+        """
+        Places orders of all accounts at current prices. Actions are
+        notional values of assets to buy or sell, with shape (n_envs,
+        n_assets). Actions are clipped to [-action_bound,
+        action_bound]. Holds of assets that are traded are reset to
+        zero. Assets with zero action are left untouched, and their
+        prices are not used.
+
+        Args:
+        ------
+            actions (np.ndarray):
+                The notional value of assets to buy (positive) or sell
+                (negative) for each account.
+        """
+        actions = np.clip(np.asarray(actions, dtype=GLOBAL_DATA_TYPE),
+                          -self.action_bound, self.action_bound)
+        traded = actions != 0
+        self.asset_quantities += np.divide(actions,
+                                           self.asset_prices,
+                                           out=np.zeros_like(actions),
+                                           where=traded)
+        self.cash -= actions.sum(axis=1)
+        self.holds[traded] = 0
+
+        return None
+
+    def get_equity(self) -> np.ndarray:
+        """
+        Returns the equity of each account, namely cash plus value of
+        longs minus value of shorts at current prices.
+
+        Returns:
+        --------
+            np.ndarray:
+                The equity of each account.
+        """
+        equity = self.cash + np.einsum('ij,ij->i', self.asset_quantities,
+                                       self.asset_prices)
+        return equity
+
+    def get_observation(
+            self,
+            indices: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Returns a copy of the observations of accounts. State arrays are
+        updated in place at each step, so observations are copied to
+        stay valid after later steps.
+
+        Args:
+        ------
+            indices (Optional[np.ndarray]):
+                The accounts to observe. If None, all accounts are
+                observed.
+
+        Returns:
+        --------
+            Dict[str, np.ndarray]:
+                Cash, asset quantities, holds and features of the
+                accounts, with a leading account dimension.
+        """
+        indices = slice(None) if indices is None else indices
+        observation = {
+            "cash": self.cash[indices, None].copy(),
+            "asset_quantities": self.asset_quantities[indices].copy(),
+            "holds": self.holds[indices].copy(),
+            "features": np.array(self.features[indices]),
+        }
+        return observation
+
+    def reset(self) -> Dict[str, np.ndarray]:
+        """
+        Resets all accounts to their initial state and moves them to the
+        first row of their data feeders.
+
+        Returns:
+        --------
+            Dict[str, np.ndarray]:
+                The batch of initial observations.
+        """
+        self._reset_accounts(slice(None))
+
+        if self._shared:
+            self.close()
+            self._features_generator = (
+                self.data_feeders[0].get_features_generator())
+        else:
+            self._restart_groups(np.arange(len(self._groups)))
+
+        self.update()
+        self.equity = self.get_equity()
+        observation = self.get_observation()
+
+        return observation
+
+    def step_async(self, actions: np.ndarray) -> None:
+        """
+        Stores the actions of all accounts for step_wait.
+
+        Args:
+        ------
+            actions (np.ndarray):
+                The actions of all accounts, with shape (n_envs,
+                n_assets).
+        """
+        self._actions = actions
+        return None
+
+    def step_wait(
+        self
+    ) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray, List[Dict]]:
+        """
+        Places orders of all accounts, moves them to the next row and
+        computes rewards as the change of equity. Accounts whose episode
+        is finished are reset, and their last observation is stored in
+        the terminal_observation entry of their info.
+
+        Returns:
+        --------
+            Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray,
+            List[Dict]]:
+                Observations, rewards, dones and infos of all accounts.
+        """
+        self.place_orders(self._actions)
+        self.update()
+
+        equity = self.get_equity()
+        rewards = equity - self.equity
+        self.equity = equity
+
+        if self._shared:
+            dones = np.full(self.num_envs, self.data_feeders[0].done)
+        else:
+            done_groups = self._cursors == self._episode_rows - 1
+            dones = done_groups[self._account_groups]
+
+        infos = [dict() for _ in range(self.num_envs)]
+        observation = self.get_observation()
+
+        if dones.any():
+            done_indices = np.flatnonzero(dones)
+            for index in done_indices:
+                infos[index]['terminal_observation'] = {
+                    key: value[index]
+                    for key, value in observation.items()
+                }
+
+            if self._shared:
+                self.reset()
+                observation = self.get_observation()
+            else:
+                self._reset_accounts(done_indices)
+                done_groups = np.flatnonzero(done_groups)
+                self._restart_groups(done_groups)
+                self._advance_groups(done_groups)
+                self.asset_prices = self.features[:, self._asset_prices_index]
+                self.holds[done_indices] = (
+                    self.asset_quantities[done_indices] != 0)
+                self.equity[done_indices] = self.get_equity()[done_indices]
+                observation = self.get_observation()
+
+        return observation, rewards.astype(GLOBAL_DATA_TYPE), dones, infos
+
+    def close(self) -> None:
+        """
+        Closes the generator of shared feature rows and the block
+        generators of distinct data feeders.
+        """
+        if self._features_generator is not None:
+            self._features_generator.close()
+        for block_generator in self._block_generators or []:
+            if block_generator is not None:
+                block_generator.close()
+        return None
+
+    def get_attr(self,
+                 attr_name: str,
+                 indices: Optional[int | Iterable[int]] = None) -> List[Any]:
+        """
+        Returns an attribute of the batched environment once per
+        selected account.
+        """
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self,
+                 attr_name: str,
+                 value: Any,
+                 indices: Optional[int | Iterable[int]] = None) -> None:
+        """
+        Sets an attribute of the batched environment. Accounts are not
+        separate objects, so the attribute is shared by all accounts.
+        """
+        setattr(self, attr_name, value)
+        return None
+
+    def env_method(self,
+                   method_name: str,
+                   *method_args,
+                   indices: Optional[int | Iterable[int]] = None,
+                   **method_kwargs) -> List[Any]:
+        """
+        Calls a method of the batched environment once per selected
+        account.
+        """
+        method = getattr(self, method_name)
+        return [
+            method(*method_args, **method_kwargs)
+            for _ in self._get_indices(indices)
+        ]
+
+    def env_is_wrapped(self,
+                       wrapper_class: type,
+                       indices: Optional[int | Iterable[int]] = None
+                       ) -> List[bool]:
+        """
+        Accounts are not wrapped by gym wrappers.
+        """
+        return [False] * len(self._get_indices(indices))
+
+    def seed(self, seed: Optional[int] = None) -> Sequence[None]:
+        """
+        The environment is deterministic given actions, so seeding has
+        no effect.
+        """
+        return [None] * self.num_envs
@@ -37,6 +37,8 @@ Examples:
     >>> model = StableBaselinesModel(...)
     >>> agent = Agent(model, pipe)
 """
+from __future__ import annotations
+
 from dataclasses import dataclass
 import dill
 from typing import Optional
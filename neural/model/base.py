@@ -110,7 +110,7 @@ class StableBaselinesModel(AbstractModel):
         if self.base_model is None:
             raise RuntimeError("Model is not trained yet.")
         with torch.no_grad(), torch.set_grad_enabled(False):
-            actions = self.base_model.predict(observation)
+            actions, _ = self.base_model.predict(observation)
             return actions
 
     def _get_algorithm(self, algorithm_name: str) -> OnPolicyAlgorithm:
@@ -10,6 +10,7 @@ Description:
         - Training on multiple environments
         - Random initializaiton of environments
         - Splitting environments into exclusive temporal groups
+        - Random day-aligned episode windows
     
     Training can happen in parallel with random initialization of
     environment conditions. However for the purpose of saving stats for
@@ -37,7 +38,7 @@ from abc import ABC, abstractmethod
 import copy
 import inspect
 import os
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple, Union
 
 import numpy as np
 
@@ -45,11 +46,13 @@ from gym.vector import AsyncVectorEnv, SyncVectorEnv
 from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
 from torch import nn
 
-from neural.data.base import DatasetMetadata, StaticDataFeeder
+from neural.data.base import (DatasetMetadata, RandomEpisodeDataFeeder,
+                               StaticDataFeeder)
 from neural.env.base import TrainMarketEnv
 from neural.meta.agent import Agent
 from neural.meta.pipe import AbstractPipe
 from neural.model.base import AbstractModel, StableBaselinesModel
+from neural.train.evaluate import evaluate_agents
 from neural.utils.io import from_hdf5
 
 
@@ -62,6 +65,7 @@ class AbstractTrainer(ABC):
         - Training on multiple environments
         - Random initializaiton of environments
         - Splitting environments into exclusive temporal groups
+        - Random day-aligned episode windows
     
     Training can happen in parallel with random initialization of
     environment conditions. However for the purpose of saving stats for
@@ -102,6 +106,28 @@ class AbstractTrainer(ABC):
             80), [80, 100) a new environment is created. If False, then
             n_envs copies of the same environment are created, with
             entire time horizon.
+        initial_cash_range (Optional[Tuple[float, float]]):
+            Range of initial cash values. If None, then initial cash is
+            not randomized.
+        initial_asset_quantities_range (Optional[Tuple[float, float]]):
+            Range of initial asset quantities. If None, then initial
+            asset quantities are not randomized.
+        episode_days (Optional[int]):
+            If set, each training episode is a random window of
+            episode_days consecutive days drawn from the training data
+            of the environment, instead of its entire time horizon.
+        episode_assets (Optional[int]):
+            If set, each training and testing episode trades a random
+            subset of episode_assets assets of the dataset, and only
+            the columns of the subset are read. Observation and action
+            spaces of the agent then depend on episode_assets, so
+            testing uses the same value.
+        shared_memory (bool):
+            If True, training and testing data are loaded once into
+            shared memory blocks that environments in subprocesses
+            attach to, instead of each environment reading and caching
+            its own copy of the data. Requires the data to fit in
+            memory.
     
     Attributes:
     ----------
@@ -139,6 +165,16 @@ class AbstractTrainer(ABC):
         initial_asset_quantities_range (Optional[Tuple[float, float]]):
             Range of initial asset quantities. If None, then initial
             asset quantities are not randomized. entire time horizon.
+        episode_days (Optional[int]):
+            If set, each training episode is a random window of
+            episode_days consecutive days drawn from the training data
+            of the environment.
+        episode_assets (Optional[int]):
+            If set, each training and testing episode trades a random
+            subset of episode_assets assets of the dataset.
+        shared_memory (bool):
+            If True, training and testing data are served from shared
+            memory blocks.
         _train_market_env (TrainMarketEnv):
             Training environment.
         _test_market_env (TrainMarketEnv):
@@ -198,6 +234,11 @@ class AbstractTrainer(ABC):
             This method is used to test the agent's performance on the
             testing dataset. if n_warmup > 0 then n_warmup episodes are
             run with random actions before testing.
+        test_agents(agents: List[Agent], n_episodes: int = 1,
+        initial_cash: float = 1e6, seed: Optional[int] = None) ->
+        np.ndarray:
+            Compares several agents on the testing dataset, reading the
+            rows of the testing dataset once per episode for all agents.
         train(*args, **kwargs) -> nn.Module:
             This method is left to be implemented by the child class. It
             should contain the training procedure of the agent. An RL
@@ -227,6 +268,9 @@ class AbstractTrainer(ABC):
         exclusive_async_envs: bool = False,
         initial_cash_range: Optional[Tuple[float, float]] = None,
         initial_asset_quantities_range: Optional[Tuple[float, float]] = None,
+        episode_days: Optional[int] = None,
+        episode_assets: Optional[int] = None,
+        shared_memory: bool = False,
     ) -> None:
 
         self.agent = agent
@@ -239,6 +283,9 @@ class AbstractTrainer(ABC):
         self.exclusive_async_envs = exclusive_async_envs
         self.initial_cash_range = initial_cash_range
         self.initial_assets_range = initial_asset_quantities_range
+        self.episode_days = episode_days
+        self.episode_assets = episode_assets
+        self.shared_memory = shared_memory
 
         if not 0 < train_ratio <= 1:
             raise ValueError("train_ratio must be in (0, 1]")
@@ -296,6 +343,10 @@ class AbstractTrainer(ABC):
         testing. If train ratio is 1 then the entire dataset is used for
         training and no testing is performed.
 
+        If shared_memory is True, rows of each data feeder are loaded
+        into a shared memory block, so that environments in
+        subprocesses do not load their own copy.
+
         Returns:
         --------
             Tuple[StaticDataFeeder, StaticDataFeeder]: 
@@ -321,6 +372,12 @@ class AbstractTrainer(ABC):
         else:
             train_data_feeder, test_data_feeder = data_feeder.split(
                 n=self.train_ratio)
+
+        if self.shared_memory:
+            train_data_feeder = train_data_feeder.to_shared_memory()
+            if test_data_feeder is not None:
+                test_data_feeder = test_data_feeder.to_shared_memory()
+
         return train_data_feeder, test_data_feeder
 
     def _get_market_env(
@@ -382,17 +439,37 @@ class AbstractTrainer(ABC):
                 np.ndarray: 
                     Random initial asset quantities.
             """
-            n_assets = len(self.dataset_metadata.assets)
+            n_assets = (self.episode_assets if self.episode_assets
+                        is not None else len(self.dataset_metadata.assets))
             asset_quantities = np.random.uniform(
-                *self.initial_assets_range, size=len(n_assets, )
+                *self.initial_assets_range, size=(n_assets, )
             ) if self.initial_assets_range is not None else None
             return asset_quantities
 
+        def episode_data_feeder(
+                data_feeder: StaticDataFeeder) -> StaticDataFeeder:
+            """
+            Returns a data feeder that feeds random windows of
+            episode_days days in training. If episode_days is None or
+            caller is test then the data feeder is returned as is.
+
+            Returns:
+            --------
+                StaticDataFeeder:
+                    Data feeder of the environment.
+            """
+            if self.episode_days is None or caller_name == 'test':
+                return data_feeder
+            return RandomEpisodeDataFeeder.from_data_feeder(
+                data_feeder, n_days=self.episode_days)
+
         if self.n_async_envs == 1 or caller_name == 'test':
+            data_feeder = episode_data_feeder(data_feeder)
             market_env = TrainMarketEnv(
                 data_feeder=data_feeder,
                 initial_cash=initial_cash(),
-                initial_asset_quantities=initial_asset_quantities())
+                initial_asset_quantities=initial_asset_quantities(),
+                episode_assets=self.episode_assets)
             market_env = self.pipe(market_env)
             return market_env
 
@@ -400,10 +477,14 @@ class AbstractTrainer(ABC):
             data_feeders = data_feeder.split(n=self.n_async_envs)
         else:
             data_feeders = [data_feeder] * self.n_async_envs
+        data_feeders = [
+            episode_data_feeder(data_feeder) for data_feeder in data_feeders
+        ]
         async_envs = [
             TrainMarketEnv(data_feeder=data_feeder,
                            initial_cash=initial_cash(),
-                           initial_asset_quantities=initial_asset_quantities())
+                           initial_asset_quantities=initial_asset_quantities(),
+                           episode_assets=self.episode_assets)
             for data_feeder in data_feeders
         ]
 
@@ -481,6 +562,63 @@ class AbstractTrainer(ABC):
 
         return None
 
+    def test_agents(self,
+                    agents: List[Agent],
+                    n_episodes: int = 1,
+                    initial_cash: float = 1e6,
+                    seed: Optional[int] = None) -> np.ndarray:
+        """
+        This method is used to compare the performance of several agents,
+        for example checkpoints of the trainer's agent, on the testing
+        dataset. Rows of the testing dataset are read once per episode
+        and fed to all agents, and models sharing an architecture are
+        evaluated with batched inference. See
+        neural.train.evaluate.evaluate_agents.
+
+        Args:
+        -----
+            agents (List[Agent]):
+                Agents to test.
+            n_episodes (int, optional):
+                Number of episodes to test. Defaults to 1.
+            initial_cash (float, optional):
+                Initial cash of each agent's account. Defaults to 1e6.
+            seed (Optional[int], optional):
+                Seed of the asset subsets drawn at each episode, if
+                episode_assets is set. All agents trade the same subset
+                at each episode. Defaults to None.
+
+        Returns:
+        --------
+            np.ndarray:
+                Total reward of each agent at each episode, with shape
+                (n_agents, n_episodes).
+
+        Raises:
+        ------
+            ValueError:
+                If test_data_feeder is None, or if dataset metadata of
+                an agent does not match the dataset of the trainer.
+        """
+        if self.test_data_feeder is None:
+            raise ValueError('Test data feeder is set to None. '
+                             'Ensure train_ratio < 1. '
+                             f'train_ratio = {self.train_ratio}')
+
+        for agent in agents:
+            if (agent.dataset_metadata is not None
+                    and not agent.dataset_metadata == self.dataset_metadata):
+                raise ValueError('Agent dataset metadata does not match '
+                                 f'metadata in path {self.file_path}.')
+
+        rewards = evaluate_agents(agents,
+                                  self.test_data_feeder,
+                                  n_episodes=n_episodes,
+                                  initial_cash=initial_cash,
+                                  episode_assets=self.episode_assets,
+                                  seed=seed)
+        return rewards
+
     @abstractmethod
     def get_async_env(self, *args, **kwargs) -> TrainMarketEnv:
         """
@@ -541,6 +679,22 @@ class StableBaselinesTrainer(AbstractTrainer):
             80), [80, 100) a new environment is created. If False, then
             n_envs copies of the same environment are created, with
             entire time horizon.
+        initial_cash_range (Optional[Tuple[float, float]]):
+            Range of initial cash values. If None, then initial cash is
+            not randomized.
+        initial_assets_range (Optional[Tuple[float, float]]):
+            Range of initial asset quantities. If None, then initial
+            asset quantities are not randomized.
+        episode_days (Optional[int]):
+            If set, each training episode is a random window of
+            episode_days consecutive days.
+        episode_assets (Optional[int]):
+            If set, each training and testing episode trades a random
+            subset of episode_assets assets.
+        shared_memory (bool):
+            If True, training and testing data are loaded once into
+            shared memory blocks that environments in subprocesses
+            attach to.
         *args:
             Additional arguments.
         **kwargs:
@@ -582,6 +736,16 @@ class StableBaselinesTrainer(AbstractTrainer):
         initial_asset_quantities_range (Optional[Tuple[float, float]]):
             Range of initial asset quantities. If None, then initial
             asset quantities are not randomized. entire time horizon.
+        episode_days (Optional[int]):
+            If set, each training episode is a random window of
+            episode_days consecutive days drawn from the training data
+            of the environment.
+        episode_assets (Optional[int]):
+            If set, each training and testing episode trades a random
+            subset of episode_assets assets of the dataset.
+        shared_memory (bool):
+            If True, training and testing data are served from shared
+            memory blocks.
         _train_market_env (TrainMarketEnv):
             Training environment.
         _test_market_env (TrainMarketEnv):
@@ -641,6 +805,11 @@ class StableBaselinesTrainer(AbstractTrainer):
             This method is used to test the agent's performance on the
             testing dataset. if n_warmup > 0 then n_warmup episodes are
             run with random actions before testing.
+        test_agents(agents: List[Agent], n_episodes: int = 1,
+        initial_cash: float = 1e6, seed: Optional[int] = None) ->
+        np.ndarray:
+            Compares several agents on the testing dataset, reading the
+            rows of the testing dataset once per episode for all agents.
         train(algorithm: OnPolicyAlgorithm, steps: int = 1_000_000,
         **kwargs) -> None:
             Trains the agent using the given algorithm for the given
@@ -667,7 +836,10 @@ class StableBaselinesTrainer(AbstractTrainer):
                  async_envs: bool = True,
                  exclusive_envs: True = False,
                  initial_cash_range: Optional[Tuple[float, float]] = None,
-                 initial_assets_range: Optional[Tuple[float, float]] = None
+                 initial_assets_range: Optional[Tuple[float, float]] = None,
+                 episode_days: Optional[int] = None,
+                 episode_assets: Optional[int] = None,
+                 shared_memory: bool = False
                  ) -> None:
 
         super().__init__(agent=agent,
@@ -679,7 +851,10 @@ class StableBaselinesTrainer(AbstractTrainer):
                          async_envs=async_envs,
                          exclusive_async_envs=exclusive_envs,
                          initial_cash_range=initial_cash_range,
-                         initial_asset_quantities_range=initial_assets_range
+                         initial_asset_quantities_range=initial_assets_range,
+                         episode_days=episode_days,
+                         episode_assets=episode_assets,
+                         shared_memory=shared_memory
                          )
 
         return None
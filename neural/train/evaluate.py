@@ -0,0 +1,358 @@
+"""
+evaluate.py
+
+Description:
+------------
+    This module contains a harness for evaluating many agents on the
+    same period. The rows of the period are read once and fanned out to
+    one market environment per agent, so that each agent keeps its own
+    pipe state and account while the cost of reading and joining rows
+    is paid once. Models that share an architecture are evaluated with
+    one batched forward pass per step instead of one call per model.
+    Typical use case is comparing checkpoints of a training run on the
+    testing dataset.
+
+    Batched forward passes use torch.func, which requires torch >= 2.0.
+    torch.func is imported when models are batched, so this module can
+    be imported with older versions of torch, in which case models are
+    evaluated one by one.
+
+License:
+--------
+    MIT License. See LICENSE.md file.
+
+Author(s):
+-------
+    Reza Soleymanifar, Email: Reza@Soleymanifar.com
+
+Functions:
+----------
+    evaluate_agents(agents, data_feeder, n_episodes, initial_cash,
+    initial_asset_quantities, batch_inference, episode_assets, seed)
+    -> np.ndarray:
+        Runs agents on the rows of a data feeder in lockstep and returns
+        the total reward of each agent at each episode.
+"""
+import copy
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from stable_baselines3.common.distributions import DiagGaussianDistribution
+from stable_baselines3.common.policies import ActorCriticPolicy
+import torch
+from torch import nn
+
+from neural.data.base import StaticDataFeeder, TeeDataFeeder
+from neural.env.base import TrainMarketEnv
+from neural.meta.agent import Agent
+from neural.model.base import AbstractModel, StableBaselinesModel
+
+
+def evaluate_agents(agents: List[Agent],
+                    data_feeder: StaticDataFeeder,
+                    n_episodes: int = 1,
+                    initial_cash: float = 1e6,
+                    initial_asset_quantities: Optional[np.ndarray] = None,
+                    batch_inference: bool = True,
+                    episode_assets: Optional[int] = None,
+                    seed: Optional[int] = None) -> np.ndarray:
+    """
+    Runs agents on the rows of a data feeder in lockstep and returns the
+    total reward of each agent at each episode. Each agent gets its own
+    market environment piped with its own pipe, and all environments
+    are fed by a TeeDataFeeder, so rows are read once per episode
+    regardless of the number of agents. Like AbstractTrainer.test, the
+    pipes of agents are used, so their observation normalizer stats are
+    updated by the evaluation.
+
+    If batch_inference is True, models of stable-baselines3 actor-critic
+    policies with continuous actions and identical parameter shapes are
+    grouped, and the actions of a group are computed with a single
+    vectorized forward pass over the stacked parameters of its models.
+    Other models are called one by one. Models of stable-baselines3 take
+    deterministic actions, whether they are batched or not.
+
+    Args:
+    -----
+        agents (List[Agent]):
+            The agents to evaluate. Agents must be trained on datasets
+            with the same metadata as the data feeder.
+        data_feeder (StaticDataFeeder):
+            The data feeder providing the rows of the evaluation
+            period, for example test data feeder of a trainer.
+        n_episodes (int, optional):
+            The number of episodes to run. Defaults to 1.
+        initial_cash (float, optional):
+            The initial amount of cash of each account. Defaults to
+            1e6.
+        initial_asset_quantities (Optional[np.ndarray], optional):
+            The initial quantity of assets of each account. Defaults to
+            None.
+        batch_inference (bool, optional):
+            If True, models that share an architecture are evaluated
+            with batched forward passes. Requires torch >= 2.0, and is
+            ignored with older versions of torch. Defaults to True.
+        episode_assets (Optional[int], optional):
+            If set, each episode trades a random subset of
+            episode_assets assets of the data feeder, like the
+            environments of a trainer with episode_assets. Agents
+            trained with episode_assets must be evaluated with the same
+            value, since their spaces depend on it. All agents trade
+            the same subset at each episode. Defaults to None.
+        seed (Optional[int], optional):
+            Seed of the random number generator used to draw asset
+            subsets. If None, a random seed is used. Defaults to None.
+
+    Returns:
+    --------
+        np.ndarray:
+            The total reward of each agent at each episode, with shape
+            (n_agents, n_episodes).
+
+    Raises:
+    -------
+        ValueError:
+            If no agents are given.
+
+    Example:
+    --------
+        >>> agents = [Agent.load(dir) for dir in checkpoint_dirs]
+        >>> rewards = evaluate_agents(agents, trainer.test_data_feeder)
+        >>> best_agent = agents[rewards.mean(axis=1).argmax()]
+    """
+    if not agents:
+        raise ValueError('At least one agent must be given.')
+
+    if episode_assets is not None:
+        # environments set asset subsets on the data feeder, which must
+        # not leak to the data feeder of the caller. Environments share
+        # a seed, so that they draw the same subset at each episode.
+        data_feeder = copy.copy(data_feeder)
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+
+    tee_data_feeder = TeeDataFeeder(data_feeder, n_branches=len(agents))
+    envs = [
+        agent.pipe(
+            TrainMarketEnv(data_feeder=tee_data_feeder,
+                           initial_cash=initial_cash,
+                           initial_asset_quantities=initial_asset_quantities,
+                           episode_assets=episode_assets,
+                           seed=seed))
+        for agent in agents
+    ]
+    predictors = _get_predictors([agent.model for agent in agents],
+                                 batch_inference=batch_inference)
+
+    rewards = np.zeros((len(agents), n_episodes))
+    for episode in range(n_episodes):
+        observations = [env.reset() for env in envs]
+        done = False
+        while not done:
+            actions = [None] * len(agents)
+            for indices, predict in predictors:
+                for index, action in zip(
+                        indices,
+                        predict([observations[index] for index in indices])):
+                    actions[index] = action
+
+            for index, (env, action) in enumerate(zip(envs, actions)):
+                observations[index], reward, done, info = env.step(action)
+                if reward is not None:
+                    rewards[index, episode] += reward
+
+    return rewards
+
+
+def _get_predictors(
+    models: List[AbstractModel],
+    batch_inference: bool = True
+) -> List[Tuple[List[int], Callable[[List], List[np.ndarray]]]]:
+    """
+    Groups models by architecture and returns the indices of models in
+    each group with a function mapping observations of the group to
+    actions of the group. Models that cannot be batched form groups of
+    their own and are called on their observation.
+
+    Args:
+    -----
+        models (List[AbstractModel]):
+            The models of agents.
+        batch_inference (bool, optional):
+            If False, or if torch.func is not available, every model
+            forms a group of its own. Defaults to True.
+
+    Returns:
+    --------
+        List[Tuple[List[int], Callable[[List], List[np.ndarray]]]]:
+            Indices of models and predict function of each group.
+    """
+    batch_inference = batch_inference and _StackedPolicies.is_available()
+
+    groups: Dict[Tuple, List[int]] = {}
+    predictors = []
+    for index, model in enumerate(models):
+        if batch_inference and _StackedPolicies.is_stackable(model):
+            groups.setdefault(_StackedPolicies.get_architecture(model),
+                              []).append(index)
+        else:
+            predictors.append(
+                ([index], lambda observations, model=model:
+                 [_predict(model, observations[0])]))
+
+    for indices in groups.values():
+        stacked_policies = _StackedPolicies(
+            [models[index].base_model.policy for index in indices])
+        predictors.append((indices, stacked_policies.predict))
+
+    return predictors
+
+
+def _predict(model: AbstractModel, observation) -> np.ndarray:
+    """
+    Returns the action of a model for one observation. Models of
+    stable-baselines3 take deterministic actions, like batched models,
+    and their recurrent state is dropped.
+    """
+    if isinstance(model, StableBaselinesModel):
+        with torch.no_grad():
+            action, _ = model.base_model.predict(observation,
+                                                 deterministic=True)
+        return action
+    return model(observation)
+
+
+class _ActorMean(nn.Module):
+    """
+    Computes the deterministic actions of an actor-critic policy,
+    namely the mean of its action distribution, with a plain forward
+    pass that can be vectorized over stacked parameters.
+    """
+
+    def __init__(self, policy: ActorCriticPolicy) -> None:
+        super().__init__()
+        self.policy = policy
+
+    def forward(self, observations: torch.Tensor) -> torch.Tensor:
+        features = self.policy.extract_features(observations)
+        if isinstance(features, tuple):
+            features = features[0]
+        latent_pi = self.policy.mlp_extractor.forward_actor(features)
+        return self.policy.action_net(latent_pi)
+
+
+class _StackedPolicies:
+    """
+    Actor-critic policies with identical architecture whose parameters
+    are stacked along a leading dimension. Actions of all policies are
+    computed with one forward pass vectorized over the stacked
+    parameters, then unscaled or clipped to the action space of each
+    policy the way ActorCriticPolicy.predict does.
+
+    Attributes:
+    -----------
+        policies (List[ActorCriticPolicy]):
+            The stacked policies.
+        params (Dict[str, torch.Tensor]):
+            The stacked parameters of the policies.
+        buffers (Dict[str, torch.Tensor]):
+            The stacked buffers of the policies.
+    """
+
+    def __init__(self, policies: List[ActorCriticPolicy]) -> None:
+        from torch.func import functional_call, stack_module_state, vmap
+
+        self.policies = policies
+
+        actors = [_ActorMean(policy) for policy in policies]
+        self.params, self.buffers = stack_module_state(actors)
+        base_actor = copy.deepcopy(actors[0]).to('meta')
+
+        def forward(params, buffers, observations):
+            return functional_call(base_actor, (params, buffers),
+                                   (observations, ))
+
+        self._forward = vmap(forward)
+
+        return None
+
+    @staticmethod
+    def is_available() -> bool:
+        """
+        Whether torch.func is available, namely torch >= 2.0.
+        """
+        try:
+            import torch.func
+        except ImportError:
+            return False
+        return True
+
+    @staticmethod
+    def is_stackable(model: AbstractModel) -> bool:
+        """
+        Whether the model is a trained stable-baselines3 actor-critic
+        policy with continuous actions, namely a diagonal Gaussian
+        action distribution whose mean is the output of action_net.
+        This does not depend on whether the action space comes from
+        gym or gymnasium.
+        """
+        return (isinstance(model, StableBaselinesModel)
+                and model.base_model is not None
+                and isinstance(model.base_model.policy, ActorCriticPolicy)
+                and isinstance(model.base_model.policy.action_dist,
+                               DiagGaussianDistribution))
+
+    @staticmethod
+    def get_architecture(model: StableBaselinesModel) -> Tuple:
+        """
+        A hashable key of the policy class, device and parameter shapes
+        of the model. Models with the same key can be stacked.
+        """
+        policy = model.base_model.policy
+        return (type(policy), str(policy.device),
+                tuple((name, tuple(tensor.shape))
+                      for name, tensor in policy.state_dict().items()))
+
+    def predict(self, observations: List) -> List[np.ndarray]:
+        """
+        Computes the deterministic actions of the policies for one
+        observation per policy.
+
+        Args:
+        -----
+            observations (List):
+                The observation of each policy.
+
+        Returns:
+        --------
+            List[np.ndarray]:
+                The action of each policy.
+        """
+        tensors = [
+            policy.obs_to_tensor(observation)[0]
+            for policy, observation in zip(self.policies, observations)
+        ]
+        if isinstance(tensors[0], dict):
+            tensors = {
+                key: torch.stack([tensor[key] for tensor in tensors])
+                for key in tensors[0]
+            }
+        else:
+            tensors = torch.stack(tensors)
+
+        with torch.no_grad():
+            actions = self._forward(self.params, self.buffers,
+                                    tensors).cpu().numpy()
+
+        policy_actions = []
+        for policy, action in zip(self.policies, actions):
+            action = action.reshape((-1, ) + policy.action_space.shape)
+            if policy.squash_output:
+                action = policy.unscale_action(action)
+            else:
+                action = np.clip(action, policy.action_space.low,
+                                 policy.action_space.high)
+            policy_actions.append(action[0])
+
+        return policy_actions
@@ -224,9 +224,9 @@ class RunningStatistics:
                 If the epsilon value is less than or equal to 0.
         """
 
-        if clip_threshold > 0:
+        if clip_threshold <= 0:
             raise AssertionError("clip_threshold must be greater than 0")   
-        if epsilon > 0:
+        if epsilon <= 0:
             raise AssertionError("epsilon value must be greater than 0")    
 
         self.epsilon = epsilon
@@ -284,7 +284,7 @@ class RunningStatistics:
             raise AssertionError(
                 "Must have at least one data point to compute maximum") 
         
-        return self._minimum
+        return self._maximum
 
     @property
     def mean(self) -> float:
@@ -344,8 +344,8 @@ class RunningStatistics:
         self.M2 = np.zeros(self.shape)
         self.count = 0
 
-        self.minimum = np.inf
-        self.maximum = -np.inf
+        self._minimum = np.inf
+        self._maximum = -np.inf
 
         return None
 
@@ -380,8 +380,8 @@ class RunningStatistics:
         delta2 = array - self._mean
         self.M2 += delta * delta2
 
-        self.minimum = np.minimum(self.minimum, array)
-        self.maximum = np.maximum(self.maximum, array)
+        self._minimum = np.minimum(self._minimum, array)
+        self._maximum = np.maximum(self._maximum, array)
 
         return None
 
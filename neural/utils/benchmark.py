@@ -0,0 +1,189 @@
+"""
+benchmark.py
+
+Description:
+------------
+    Benchmarks of storage layouts. Chunk shape and filters of HDF5
+    datasets trade file size against read throughput, and the best
+    settings depend on the number of columns, the resolution and the
+    disk. This module rewrites an existing dataset with a number of
+    layouts and measures the size of each file and sequential row
+    throughput through StaticDataFeeder, the way training environments
+    read the data.
+
+License:
+--------
+    MIT License. See LICENSE.md file.
+
+Author(s):
+-------
+    Reza Soleymanifar, Email: Reza@Soleymanifar.com
+
+Constants:
+----------
+    DEFAULT_HDF5_LAYOUTS (List[Dict]):
+        The layouts benchmarked by default. Each layout is a dictionary
+        of keyword arguments of HDF5Writer, namely chunk_rows,
+        compression and shuffle.
+
+Functions:
+----------
+    benchmark_hdf5_layouts(file_path, layouts, dir_path, n_chunks,
+    block_size, n_repeats) -> pd.DataFrame:
+        Rewrites the datasets of an HDF5 file with each layout and
+        measures file size, write time and read throughput.
+"""
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import h5py as h5
+import pandas as pd
+
+from neural.common.constants import CHECKPOINT_FILE_EXTENSION
+from neural.data.base import StaticDataFeeder
+from neural.utils.base import validate_path
+from neural.utils.io import (HDF5Writer, _get_hdf5_dataset_names,
+                             extract_hdf5_dataset, from_hdf5)
+
+DEFAULT_HDF5_LAYOUTS = [
+    {},
+    {'chunk_rows': 4096},
+    {'compression': 'lzf'},
+    {'compression': 'lzf', 'shuffle': True},
+    {'compression': 'gzip', 'shuffle': True},
+]
+
+
+def benchmark_hdf5_layouts(file_path: str | os.PathLike,
+                           layouts: Optional[List[Dict]] = None,
+                           dir_path: Optional[str | os.PathLike] = None,
+                           n_chunks: int = 10,
+                           block_size: int = 1024,
+                           n_repeats: int = 3) -> pd.DataFrame:
+    """
+    Rewrites the datasets of an HDF5 file with each layout and measures
+    file size, write time and sequential read throughput. Datasets are
+    written in the same order as in the source file, so the rewritten
+    files load to the same joined dataset. Reading goes through
+    StaticDataFeeder.get_feature_blocks, so the measured throughput
+    includes chunk decompression and joining of datasets, but not the
+    per-row overhead of the feature generator.
+
+    Args:
+    -------
+        file_path (str | os.PathLike):
+            The path to the HDF5 file to benchmark.
+        layouts (Optional[List[Dict]]):
+            The layouts to benchmark, as dictionaries of keyword
+            arguments of HDF5Writer. Default is DEFAULT_HDF5_LAYOUTS.
+        dir_path (Optional[str | os.PathLike]):
+            The directory rewritten files are written to. Should be on
+            the same disk as the training data. If None, a temporary
+            directory is used and removed afterwards.
+        n_chunks (int):
+            The number of chunks the data feeder loads the dataset in.
+            Default is 10.
+        block_size (int):
+            The number of rows in blocks yielded by the data feeder.
+            Default is 1024.
+        n_repeats (int):
+            The number of times the dataset is read with each layout.
+            The fastest read is reported. Default is 3.
+
+    Returns:
+    --------
+        pd.DataFrame:
+            A DataFrame with one row per layout and columns layout,
+            size_mb, write_seconds, read_seconds and rows_per_second.
+
+    Notes:
+    ------
+        Each dataset is loaded in memory once to be rewritten. Repeated
+        reads are served from the page cache of the operating system
+        once the file fits in memory, which measures decompression and
+        copying rather than disk reads. Use a file larger than memory,
+        or n_repeats = 1 after dropping caches, to measure cold reads.
+
+    Example:
+    --------
+        >>> results = benchmark_hdf5_layouts('dataset.h5')
+        >>> results.sort_values('rows_per_second', ascending=False)
+    """
+    validate_path(file_path=file_path)
+    layouts = layouts if layouts is not None else DEFAULT_HDF5_LAYOUTS
+
+    with tempfile.TemporaryDirectory() as temporary_dir_path:
+        dir_path = dir_path if dir_path is not None else temporary_dir_path
+
+        results = list()
+        for index, layout in enumerate(layouts):
+            layout_path = os.path.join(dir_path, f'layout_{index}.h5')
+
+            start_time = time.perf_counter()
+            _rewrite_hdf5_file(file_path=file_path,
+                               layout_path=layout_path,
+                               layout=layout)
+            write_seconds = time.perf_counter() - start_time
+
+            read_seconds = min(
+                _read_hdf5_file(file_path=layout_path,
+                                n_chunks=n_chunks,
+                                block_size=block_size)
+                for _ in range(n_repeats))
+
+            dataset_metadata, datasets = from_hdf5(layout_path)
+            results.append({
+                'layout': layout,
+                'size_mb': os.path.getsize(layout_path) / 1e6,
+                'write_seconds': write_seconds,
+                'read_seconds': read_seconds,
+                'rows_per_second': dataset_metadata.n_rows / read_seconds
+            })
+            datasets[0].file.close()
+            os.remove(layout_path)
+            checkpoint_path = layout_path + CHECKPOINT_FILE_EXTENSION
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+
+    return pd.DataFrame(results)
+
+
+def _rewrite_hdf5_file(file_path: str | os.PathLike,
+                       layout_path: str | os.PathLike, layout: Dict) -> None:
+    """
+    Rewrites all datasets of an HDF5 file to a new file with a layout.
+    """
+    with h5.File(file_path, 'r') as hdf5_file:
+        for dataset_name in _get_hdf5_dataset_names(hdf5_file):
+            dataset_metadata, dataset = extract_hdf5_dataset(
+                hdf5_file=hdf5_file, dataset_name=dataset_name)
+
+            with HDF5Writer(file_path=layout_path,
+                            dataset_name=dataset_name,
+                            **layout) as writer:
+                writer.append(numpy_array=dataset[:],
+                              dataset_metadata=dataset_metadata)
+
+    return None
+
+
+def _read_hdf5_file(file_path: str | os.PathLike, n_chunks: int,
+                    block_size: int) -> float:
+    """
+    Reads all rows of an HDF5 file through a data feeder and returns
+    the elapsed time in seconds.
+    """
+    dataset_metadata, datasets = from_hdf5(file_path)
+    data_feeder = StaticDataFeeder(metadata=dataset_metadata,
+                                   datasets=datasets,
+                                   n_chunks=n_chunks)
+
+    start_time = time.perf_counter()
+    for _ in data_feeder.get_feature_blocks(block_size=block_size):
+        pass
+    read_seconds = time.perf_counter() - start_time
+
+    datasets[0].file.close()
+    return read_seconds
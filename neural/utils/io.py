@@ -1,31 +1,61 @@
 """
 io.py
 """
+from __future__ import annotations
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from dataclasses import fields, replace
+from datetime import datetime, timezone
+from enum import Enum
+import hashlib
+import importlib
 import io
 from functools import reduce
+import json
+import pickle
+import sys
 import tarfile
-from typing import List, Optional, Tuple
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
 import os
+import zipfile
+import zlib
 
 import numpy as np
 import dill
 import h5py as h5
+import pandas as pd
 
-from neural.common.constants import (HDF5_DEFAULT_MAX_ROWS, GLOBAL_DATA_TYPE)
+from neural.common.constants import (
+    CHECKPOINT_FILE_EXTENSION, DOWNLOAD_CACHE_DEFAULT_MAX_SIZE,
+    HDF5_ACCEPTED_COMPRESSIONS, HDF5_DEFAULT_CHUNK_SIZE,
+    HDF5_DEFAULT_EXTENT_ROWS,
+    HDF5_DEFAULT_MAX_ROWS, GLOBAL_DATA_TYPE,
+    MEMMAP_DATA_FILE_EXTENSION, MEMMAP_METADATA_FILE_EXTENSION,
+    METADATA_VERSION)
 from neural.common.exceptions import CorruptDataError
-from neural.data.base import DatasetMetadata
+from neural.common.log import logger
+from neural.data.base import (AbstractAsset, AbstractDataType,
+                              DatasetMetadata, DataSchema)
+from neural.data.enums import CalendarType
 from neural.utils.base import validate_path
+from neural.utils.time import Resolution
 
 
-def to_hdf5(file_path: str | os.PathLike, numpy_array: np.ndarray,
-            dataset_metadata: DatasetMetadata, dataset_name: str):
+def to_hdf5(file_path: str | os.PathLike,
+            numpy_array: np.ndarray,
+            dataset_metadata: DatasetMetadata,
+            dataset_name: str,
+            chunk_rows: Optional[int] = None,
+            compression: Optional[str] = None,
+            shuffle: bool = False) -> DatasetMetadata:
     """
     Saves a numpy array to an HDF5 file. If the file does not exist, new
     file will be created. If file exists and dataset already exists, the
     new data will be appended to the existing dataset. If the file
-    exists but the dataset does not, a new dataset will be created.
+    exists but the dataset does not, a new dataset will be created. For
+    appending many consecutive market days use HDF5Writer directly, to
+    keep the file open and commit metadata once.
     
     Args:
     -------
@@ -38,6 +68,22 @@ def to_hdf5(file_path: str | os.PathLike, numpy_array: np.ndarray,
             The metadata object for the dataset.
         dataset_name (str):
             The name of the dataset to save.
+        chunk_rows (Optional[int]):
+            The number of rows in a chunk of a new dataset. See
+            HDF5Writer. Default is None.
+        compression (Optional[str]):
+            The compression filter of a new dataset. See HDF5Writer.
+            Default is None.
+        shuffle (bool):
+            Whether to apply the shuffle filter to a new dataset. See
+            HDF5Writer. Default is False.
+
+    Returns:
+    --------
+        dataset_metadata (DatasetMetadata):
+            The metadata of the whole dataset after saving, namely the
+            appended metadata if the dataset already existed.
+
     Raises:
     -------
         ValueError: 
@@ -45,43 +91,427 @@ def to_hdf5(file_path: str | os.PathLike, numpy_array: np.ndarray,
             number of rows in the metadata object.
     """
 
-    validate_path(file_path=file_path)
+    writer = HDF5Writer(file_path=file_path,
+                        dataset_name=dataset_name,
+                        chunk_rows=chunk_rows,
+                        compression=compression,
+                        shuffle=shuffle)
+    with writer:
+        writer.append(numpy_array=numpy_array,
+                      dataset_metadata=dataset_metadata)
 
-    if len(numpy_array) != dataset_metadata.n_rows:
-        raise ValueError(
-            f'Number of rows in numpy array: {len(numpy_array)}.'
-            f'Number of rows in metadata: {dataset_metadata.n_rows}')
+    return writer.dataset_metadata
+
+
+class HDF5Writer:
+    """
+    Appends consecutive market days to a dataset in an HDF5 file within
+    a single session. Appending with to_hdf5 opens the file, loads and
+    joins stored metadata and resizes the dataset for every market day,
+    which makes long downloads quadratic in the number of days. The
+    writer instead keeps the file open, grows the dataset in extents of
+    many rows and keeps metadata in memory. Each append only validates
+    the new day against the last appended day. Metadata is written
+    once at commit, which happens when the writer is closed and
+    optionally every checkpoint_interval appends. Unused rows of the
+    last extent are trimmed when the writer is closed.
+
+    Attributes:
+    -----------
+        file_path (str | os.PathLike):
+            The path to the HDF5 file.
+        dataset_name (str):
+            The name of the dataset to append to.
+        extent_rows (int):
+            The number of rows the dataset is grown by when appended
+            rows do not fit in its current size.
+        checkpoint_interval (Optional[int]):
+            The number of appends between commits. If None, metadata is
+            only committed when the writer is closed.
+        checkpoint (bool):
+            Whether to record the state of the dataset in the checkpoint
+            file of the HDF5 file after each commit.
+        chunk_rows (Optional[int]):
+            The number of rows in a chunk of a new dataset. Chunks
+            always span all columns, since rows are read whole. If
+            None, a chunk holds as many whole days as fit in
+            HDF5_DEFAULT_CHUNK_SIZE bytes. If a day does not fit, a
+            chunk holds an equal part of a day that fits.
+        compression (Optional[str]):
+            The compression filter of a new dataset, one of
+            HDF5_ACCEPTED_COMPRESSIONS, or None for no compression.
+        shuffle (bool):
+            Whether to apply the shuffle filter to a new dataset before
+            compression.
+        _hdf5_file (Optional[h5.File]):
+            The open HDF5 file, None if the writer is closed.
+        _dataset (Optional[h5.Dataset]):
+            The dataset being appended to.
+        _committed_metadata (Optional[DatasetMetadata]):
+            The metadata of the dataset as of the last commit.
+        _first_metadata (Optional[DatasetMetadata]):
+            The metadata of the first day of the dataset, or of the
+            committed dataset. Appended days are validated against its
+            data schema, resolution and calendar type.
+        _last_metadata (Optional[DatasetMetadata]):
+            The metadata of the last appended day.
+        _n_rows (int):
+            The number of rows written to the dataset, committed or
+            not.
+        _n_uncommitted (int):
+            The number of appends since the last commit.
+
+    Properties:
+    -----------
+        dataset_metadata (Optional[DatasetMetadata]):
+            The metadata of the whole dataset including uncommitted
+            appends.
+
+    Methods:
+    --------
+        open() -> None:
+            Opens the file and the dataset if it exists.
+        append(numpy_array, dataset_metadata) -> None:
+            Appends rows of a market day to the dataset.
+        commit() -> None:
+            Writes metadata and optionally checkpoint of the dataset.
+        close() -> None:
+            Commits uncommitted appends, trims unused rows and closes
+            the file.
+
+    Example:
+    --------
+        >>> with HDF5Writer(file_path, 'BARS') as writer:
+        ...     for numpy_array, dataset_metadata in days:
+        ...         writer.append(numpy_array, dataset_metadata)
+
+    Notes:
+    ------
+        Chunk shape and filters are fixed when a dataset is created, so
+        they are ignored when appending to an existing dataset. Rows are
+        read sequentially by data feeders, so chunks of whole rows
+        aligned to market days are read without touching neighbouring
+        days. lzf compression is fast to decompress and shrinks market
+        data several times, gzip shrinks it further at a higher read
+        cost. The shuffle filter groups bytes of float values and
+        usually improves both. Use neural.utils.benchmark to compare
+        layouts on a dataset.
+
+        Rows are always written before metadata. Between commits and
+        until the writer is closed, the dataset has more rows than
+        recorded in its metadata, so its extent is not regrown after
+        every commit. If the process is interrupted, repair_hdf5_dataset
+        truncates these rows to the last commit. The writer is also
+        closed when an exception is raised inside a with block, so days
+        appended before the exception are committed.
+    """
+
+    def __init__(self,
+                 file_path: str | os.PathLike,
+                 dataset_name: str,
+                 extent_rows: int = HDF5_DEFAULT_EXTENT_ROWS,
+                 checkpoint_interval: Optional[int] = None,
+                 checkpoint: bool = False,
+                 chunk_rows: Optional[int] = None,
+                 compression: Optional[str] = None,
+                 shuffle: bool = False) -> None:
+        """
+        Initializes the HDF5Writer class.
+
+        Args:
+        -------
+            file_path (str | os.PathLike):
+                The path to the HDF5 file. Created if it does not exist.
+            dataset_name (str):
+                The name of the dataset to append to. Created if it does
+                not exist.
+            extent_rows (int):
+                The number of rows the dataset is grown by. Default is
+                HDF5_DEFAULT_EXTENT_ROWS.
+            checkpoint_interval (Optional[int]):
+                The number of appends between commits. Default is None,
+                namely metadata is committed only when the writer is
+                closed.
+            checkpoint (bool):
+                Whether to write a checkpoint with to_checkpoint after
+                each commit. Default is False.
+            chunk_rows (Optional[int]):
+                The number of rows in a chunk of a new dataset. Default
+                is None, namely whole days, or equal parts of a day, of
+                at most HDF5_DEFAULT_CHUNK_SIZE bytes.
+            compression (Optional[str]):
+                The compression filter of a new dataset. Accepted values
+                are HDF5_ACCEPTED_COMPRESSIONS. Default is None.
+            shuffle (bool):
+                Whether to apply the shuffle filter to a new dataset.
+                Default is False.
+
+        Raises:
+        -------
+            ValueError:
+                If extent_rows, checkpoint_interval or chunk_rows is not
+                positive.
+            ValueError:
+                If compression is not accepted.
+        """
+        validate_path(file_path=file_path)
+
+        if extent_rows <= 0:
+            raise ValueError(f'extent_rows = {extent_rows} must be positive.')
+        if checkpoint_interval is not None and checkpoint_interval <= 0:
+            raise ValueError(f'checkpoint_interval = {checkpoint_interval} '
+                             'must be positive.')
+        if chunk_rows is not None and chunk_rows <= 0:
+            raise ValueError(f'chunk_rows = {chunk_rows} must be positive.')
+        if (compression is not None
+                and compression not in HDF5_ACCEPTED_COMPRESSIONS):
+            raise ValueError(
+                f'compression = {compression} is not accepted. Accepted '
+                f'values: {HDF5_ACCEPTED_COMPRESSIONS}')
 
-    with h5.File(file_path, 'a') as hdf5:
+        self.file_path = file_path
+        self.dataset_name = dataset_name
+        self.extent_rows = extent_rows
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint = checkpoint
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+        self.shuffle = shuffle
 
-        if dataset_name not in hdf5:
-            dataset = hdf5.create_dataset(name=dataset_name,
-                                          data=numpy_array,
-                                          dtype=GLOBAL_DATA_TYPE,
-                                          maxshape=(HDF5_DEFAULT_MAX_ROWS,
-                                                    numpy_array.shape[1]),
-                                          chunks=True)
+        self._hdf5_file = None
+        self._dataset = None
+        self._committed_metadata = None
+        self._first_metadata = None
+        self._last_metadata = None
+        self._n_rows = 0
+        self._n_uncommitted = 0
 
-            serialized_dataset_metadata = dill.dumps(dataset_metadata,
-                                                     protocol=0)
-            dataset.attrs['metadata'] = serialized_dataset_metadata
+        return None
 
+    @property
+    def dataset_metadata(self) -> Optional[DatasetMetadata]:
+        """
+        The metadata of the whole dataset including uncommitted appends.
+        Computed from the first and last days, so accessing it has the
+        cost of creating one metadata object.
+
+        Returns:
+        --------
+            Optional[DatasetMetadata]:
+                The metadata of the dataset. None if the dataset is
+                empty.
+        """
+        if self._n_uncommitted == 0:
+            return self._committed_metadata
+
+        dataset_metadata = replace(self._first_metadata,
+                                   end=self._last_metadata.end)
+        return dataset_metadata
+
+    def open(self) -> None:
+        """
+        Opens the file and the dataset if it exists. Rows of an existing
+        dataset beyond the rows recorded in its metadata are uncommitted
+        and are overwritten by appends.
+
+        Raises:
+        -------
+            CorruptDataError:
+                If the existing dataset has fewer rows or a different
+                number of columns than recorded in its metadata.
+        """
+        self._hdf5_file = h5.File(self.file_path, 'a')
+
+        if self.dataset_name in self._hdf5_file:
+            dataset = self._hdf5_file[self.dataset_name]
+            dataset_metadata = _read_hdf5_metadata(dataset)
+
+            if (len(dataset) < dataset_metadata.n_rows
+                    or dataset.shape[1] != dataset_metadata.n_features):
+                self._hdf5_file.close()
+                raise CorruptDataError(
+                    f'Dataset {self.dataset_name} with shape {dataset.shape} '
+                    f'does not match metadata with {dataset_metadata.n_rows} '
+                    f'rows and {dataset_metadata.n_features} columns.')
+
+            self._dataset = dataset
+            self._committed_metadata = dataset_metadata
+            self._first_metadata = dataset_metadata
+            self._last_metadata = dataset_metadata
+            self._n_rows = dataset_metadata.n_rows
+
+        return None
+
+    def append(self, numpy_array: np.ndarray,
+               dataset_metadata: DatasetMetadata) -> None:
+        """
+        Appends rows of a market day to the dataset. The day must have
+        the same data schema, resolution and calendar type as the
+        dataset, and must be the market day right after the last
+        appended day. The dataset is grown by extent_rows if the rows do
+        not fit in its current size.
+
+        Args:
+        -------
+            numpy_array (np.ndarray):
+                The rows to append.
+            dataset_metadata (DatasetMetadata):
+                The metadata of the rows to append.
+
+        Raises:
+        -------
+            ValueError:
+                If the number of rows in the numpy array does not match
+                the number of rows in the metadata object.
+            ValueError:
+                If data schema, resolution or calendar type of the
+                metadata do not match the dataset.
+            ValueError:
+                If the metadata does not start on the market day after
+                the end of the dataset.
+        """
+        if len(numpy_array) != dataset_metadata.n_rows:
+            raise ValueError(
+                f'Number of rows in numpy array: {len(numpy_array)}.'
+                f'Number of rows in metadata: {dataset_metadata.n_rows}')
+
+        if self._last_metadata is None:
+            chunk_rows = (self.chunk_rows
+                          if self.chunk_rows is not None else
+                          self._get_day_aligned_chunk_rows(
+                              numpy_array, dataset_metadata))
+            self._dataset = self._hdf5_file.create_dataset(
+                name=self.dataset_name,
+                shape=(0, numpy_array.shape[1]),
+                dtype=GLOBAL_DATA_TYPE,
+                maxshape=(HDF5_DEFAULT_MAX_ROWS, numpy_array.shape[1]),
+                chunks=(chunk_rows, numpy_array.shape[1]),
+                compression=self.compression,
+                shuffle=self.shuffle)
+            self._first_metadata = dataset_metadata
         else:
-            dataset_metadata_, dataset = extract_hdf5_dataset(
-                hdf5_file=hdf5, dataset_name=dataset_name)
+            self._validate_metadata(dataset_metadata)
 
-            new_dataset_metadata = dataset_metadata_ + dataset_metadata
-            dataset.resize(
-                (new_dataset_metadata.n_rows, new_dataset_metadata.n_features))
+        n_rows = self._n_rows + len(numpy_array)
+        if n_rows > len(self._dataset):
+            capacity = max(n_rows, len(self._dataset) + self.extent_rows)
+            capacity = max(min(capacity, HDF5_DEFAULT_MAX_ROWS), n_rows)
+            self._dataset.resize((capacity, self._dataset.shape[1]))
 
-            dataset[dataset_metadata_.n_rows:new_dataset_metadata.
-                    n_rows, :] = numpy_array
-            serialized_new_dataset_metadata = dill.dumps(new_dataset_metadata,
-                                                         protocol=0)
+        self._dataset[self._n_rows:n_rows, :] = numpy_array
+        self._n_rows = n_rows
+        self._last_metadata = dataset_metadata
+        self._n_uncommitted += 1
 
-            dataset.attrs['metadata'] = serialized_new_dataset_metadata
+        if (self.checkpoint_interval is not None
+                and self._n_uncommitted >= self.checkpoint_interval):
+            self.commit()
 
-    return None
+        return None
+
+    def commit(self) -> None:
+        """
+        Commits appends since the last commit. Metadata of the whole
+        dataset is written to the dataset attributes and file buffers
+        are flushed to disk. Unused rows of the last extent are kept, so
+        that following appends do not grow the dataset again. If
+        checkpoint is True, a checkpoint of the dataset is written
+        afterwards with to_checkpoint.
+
+        Raises:
+        -------
+            CorruptDataError:
+                If the number of rows written does not match the number
+                of rows in the metadata of the dataset.
+        """
+        if self._n_uncommitted == 0:
+            return None
+
+        dataset_metadata = self.dataset_metadata
+        if dataset_metadata.n_rows != self._n_rows:
+            raise CorruptDataError(
+                f'Rows written to {self.dataset_name}: {self._n_rows}. '
+                f'Rows in metadata: {dataset_metadata.n_rows}')
+
+        _write_hdf5_metadata(dataset=self._dataset,
+                             dataset_metadata=dataset_metadata)
+        self._hdf5_file.flush()
+
+        self._committed_metadata = dataset_metadata
+        self._first_metadata = dataset_metadata
+        self._n_uncommitted = 0
+
+        if self.checkpoint:
+            to_checkpoint(file_path=self.file_path,
+                          dataset_name=self.dataset_name,
+                          dataset_metadata=dataset_metadata)
+
+        return None
+
+    def close(self) -> None:
+        """
+        Commits uncommitted appends, trims unused rows of the last
+        extent and closes the file. If the commit fails, rows are not
+        trimmed and are truncated to the last commit by
+        repair_hdf5_dataset.
+        """
+        if self._hdf5_file is None:
+            return None
+
+        try:
+            self.commit()
+            if self._dataset is not None and len(
+                    self._dataset) > self._n_rows:
+                self._dataset.resize((self._n_rows, self._dataset.shape[1]))
+        finally:
+            self._hdf5_file.close()
+            self._hdf5_file = None
+            self._dataset = None
+
+        return None
+
+    def _get_day_aligned_chunk_rows(
+            self, numpy_array: np.ndarray,
+            dataset_metadata: DatasetMetadata) -> int:
+        """
+        Returns the number of rows of as many days as fit in a chunk of
+        HDF5_DEFAULT_CHUNK_SIZE bytes. If a day does not fit, returns
+        the largest divisor of the rows of a day that fits, so chunks
+        still tile days and fit in the chunk cache, or one row if a
+        single row does not fit. Days are assumed to have as many rows
+        as the first appended day, so chunks align with day boundaries
+        except around days with shortened trading hours.
+        """
+        day_rows = int(dataset_metadata.cumulative_daily_rows[0])
+        row_size = numpy_array.shape[1] * np.dtype(GLOBAL_DATA_TYPE).itemsize
+        max_chunk_rows = HDF5_DEFAULT_CHUNK_SIZE // row_size
+
+        if day_rows <= max_chunk_rows:
+            chunk_rows = day_rows * (max_chunk_rows // day_rows)
+        else:
+            chunk_rows = max([
+                rows for rows in range(1, max_chunk_rows + 1)
+                if day_rows % rows == 0
+            ] or [1])
+        return chunk_rows
+
+    def _validate_metadata(self, dataset_metadata: DatasetMetadata) -> None:
+        """
+        Validates that the metadata of a market day can be appended to
+        the dataset, with the checks of DatasetMetadata.__add__. The day
+        is appended to the last appended day only, so validation does
+        not depend on the size of the dataset.
+        """
+        self._last_metadata + dataset_metadata
+        return None
+
+    def __enter__(self) -> HDF5Writer:
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+        return None
 
 
 def from_hdf5(
@@ -147,28 +577,15 @@ def from_hdf5(
     dataset_list = list()
     dataset_metadata_list = list()
 
-    sorted_hdf5_file = sorted(
-        hdf5_file, key=lambda dataset: hdf5_file[dataset].id.get_offset())
-    for dataset_name in sorted_hdf5_file:
+    for dataset_name in _get_hdf5_dataset_names(hdf5_file=hdf5_file):
         dataset_metadata, dataset = extract_hdf5_dataset(
             hdf5_file=hdf5_file, dataset_name=dataset_name)
 
         dataset_list.append(dataset)
         dataset_metadata_list.append(dataset_metadata)
 
-    datasets_by_dataset_type_dict = defaultdict(list)
-    for dataset, dataset_metadata in zip(dataset_list, dataset_metadata_list):
-        dataset_type = (
-            dataset_metadata.data_schema.data_type_assets_map.popitem()[0])
-        datasets_by_dataset_type_dict[dataset_type].append(dataset)
-
-    joined_metadata = reduce(lambda x, y: x | y, dataset_metadata_list)
-    ordered_dataset_types = (
-        joined_metadata.data_schema.data_type_assets_map.keys())
-    ordered_dataset_list = [
-        dataset for dataset_type in ordered_dataset_types
-        for dataset in datasets_by_dataset_type_dict[dataset_type]
-    ]
+    joined_metadata, ordered_dataset_list = join_datasets(
+        dataset_metadata_list=dataset_metadata_list, dataset_list=dataset_list)
     return joined_metadata, ordered_dataset_list
 
 
@@ -200,20 +617,1146 @@ def extract_hdf5_dataset(
         raise ValueError(
             f'Dataset {dataset_name} does not exist in file.') from key_error
 
-    serialized_dataset_metadata = dataset.attrs['metadata']
-    dataset_metadata = dill.loads(serialized_dataset_metadata.encode())
+    dataset_metadata = _read_hdf5_metadata(dataset)
 
     if dataset_metadata.n_rows != len(dataset):
         raise CorruptDataError(f'Rows in {dataset_name}: {len(dataset)}.'
                                f'Rows in metadata: {dataset_metadata.n_rows}')
-    if dataset_metadata.n_columns != dataset.shape[1]:
+    if dataset_metadata.n_features != dataset.shape[1]:
         raise CorruptDataError(
             f'Columns in {dataset_name}: {dataset.shape[1]}.'
-            f'Columns in metadata: {dataset_metadata.n_columns}')
+            f'Columns in metadata: {dataset_metadata.n_features}')
+
+    return dataset_metadata, dataset
+
+
+def repair_hdf5_dataset(file_path: str | os.PathLike,
+                        dataset_name: str) -> Optional[DatasetMetadata]:
+    """
+    Repairs a dataset in an HDF5 file that was left in an inconsistent
+    state by an interrupted append, and returns its metadata. Appending
+    resizes the dataset and writes the new rows before the updated
+    metadata, so metadata is only updated once rows are in place. If an
+    append is interrupted in between, the dataset has more rows than
+    recorded in its metadata. These uncommitted rows are truncated, so
+    that the dataset matches its metadata again and can be resumed.
+
+    Args:
+    -------
+        file_path (str | os.PathLike):
+            The path to the HDF5 file.
+        dataset_name (str):
+            The name of the dataset to repair.
+
+    Returns:
+    --------
+        dataset_metadata (Optional[DatasetMetadata]):
+            The metadata of the repaired dataset. None if the file or
+            the dataset does not exist.
+
+    Raises:
+    -------
+        CorruptDataError:
+            If the dataset has fewer rows or a different number of
+            columns than recorded in its metadata. This cannot be caused
+            by an interrupted append and cannot be repaired.
+    """
+    if not os.path.exists(file_path):
+        return None
+
+    with h5.File(file_path, 'a') as hdf5_file:
+        if dataset_name not in hdf5_file:
+            return None
+
+        dataset = hdf5_file[dataset_name]
+        dataset_metadata = _read_hdf5_metadata(dataset)
+
+        if (len(dataset) < dataset_metadata.n_rows
+                or dataset.shape[1] != dataset_metadata.n_features):
+            raise CorruptDataError(
+                f'Dataset {dataset_name} with shape {dataset.shape} does not '
+                f'match metadata with {dataset_metadata.n_rows} rows and '
+                f'{dataset_metadata.n_features} columns.')
+
+        if len(dataset) > dataset_metadata.n_rows:
+            logger.warning(
+                f'Truncating {len(dataset) - dataset_metadata.n_rows} '
+                f'uncommitted rows from dataset {dataset_name}.')
+            dataset.resize(
+                (dataset_metadata.n_rows, dataset_metadata.n_features))
+
+    return dataset_metadata
+
+
+def to_checkpoint(file_path: str | os.PathLike, dataset_name: str,
+                  dataset_metadata: DatasetMetadata) -> None:
+    """
+    Records the committed state of a dataset in the checkpoint file
+    that accompanies an HDF5 file. The checkpoint file is a JSON file
+    named <file_path><CHECKPOINT_FILE_EXTENSION> that maps dataset
+    names to a record of number of rows, number of days, start and end
+    of the dataset and the time of update. The checkpoint is written
+    atomically, so it always reflects a committed append, even if the
+    process is interrupted while writing it. This is useful for
+    monitoring long running downloads and for scheduled jobs that
+    extend a dataset with new market days.
+
+    Args:
+    -------
+        file_path (str | os.PathLike):
+            The path to the HDF5 file the checkpoint belongs to.
+        dataset_name (str):
+            The name of the dataset to record.
+        dataset_metadata (DatasetMetadata):
+            The metadata of the dataset after the committed append.
+    """
+    checkpoint = from_checkpoint(file_path=file_path)
+    checkpoint[dataset_name] = {
+        'n_rows': int(dataset_metadata.n_rows),
+        'days': int(dataset_metadata.days),
+        'start': dataset_metadata.start.isoformat(),
+        'end': dataset_metadata.end.isoformat(),
+        'updated': datetime.now(timezone.utc).isoformat()
+    }
+    checkpoint_path = str(file_path) + CHECKPOINT_FILE_EXTENSION
+    _write_atomically(file_path=checkpoint_path,
+                      content=json.dumps(checkpoint, indent=4).encode())
+
+    return None
+
+
+def from_checkpoint(file_path: str | os.PathLike) -> Dict[str, dict]:
+    """
+    Reads the checkpoint file that accompanies an HDF5 file.
+
+    Args:
+    -------
+        file_path (str | os.PathLike):
+            The path to the HDF5 file the checkpoint belongs to.
+
+    Returns:
+    --------
+        checkpoint (Dict[str, dict]):
+            A dictionary that maps dataset names to the record of their
+            last committed append. Empty if there is no checkpoint.
+    """
+    checkpoint_path = str(file_path) + CHECKPOINT_FILE_EXTENSION
+    if not os.path.exists(checkpoint_path):
+        return dict()
+
+    with open(checkpoint_path, 'r') as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+
+    return checkpoint
+
+
+def serialize_metadata(dataset_metadata: DatasetMetadata) -> str:
+    """
+    Serializes dataset metadata to a versioned JSON document. Data types
+    and enum values are stored by class path and name, assets by class
+    path and field values, and cumulative daily rows as an array of
+    integers. Column indices of each feature type, number of rows and
+    number of columns are also stored, so that the document can be read
+    with the json module alone, without importing this library or
+    unpickling code. Unlike dill pickles the document does not depend
+    on the implementation of the metadata classes, and its size does
+    not depend on cached attributes such as the schedule.
+
+    Args:
+    -------
+        dataset_metadata (DatasetMetadata):
+            The metadata to serialize.
+
+    Returns:
+    --------
+        serialized_metadata (str):
+            The JSON document of the metadata.
+
+    Example:
+    --------
+        >>> serialized_metadata = serialize_metadata(dataset_metadata)
+        >>> metadata = json.loads(serialized_metadata)
+        >>> metadata['feature_schema']['ASSET_CLOSE_PRICE']
+        [3, 8, 13]
+    """
+    metadata = _encode_metadata(dataset_metadata)
+    serialized_metadata = json.dumps(metadata, separators=(',', ':'))
+    return serialized_metadata
+
+
+def deserialize_metadata(serialized_metadata: str | bytes,
+                         legacy: bool = False) -> DatasetMetadata:
+    """
+    Deserializes dataset metadata written by serialize_metadata.
+    Metadata written by earlier versions of the library as a dill
+    pickle is only loaded if legacy is True, since unpickling can run
+    arbitrary code. Readers of HDF5 files and memory-mapped stores
+    never load legacy metadata. Files written by earlier versions are
+    converted once by migrate_hdf5_metadata or migrate_memmap_metadata.
+    Deserializing does not generate the schedule of the dataset, since
+    cumulative daily rows are stored in the document.
+
+    Args:
+    -------
+        serialized_metadata (str | bytes):
+            The JSON document or dill pickle of the metadata.
+        legacy (bool):
+            Whether the metadata is a dill pickle written by earlier
+            versions of the library. Only set for trusted metadata.
+            Default is False.
+
+    Returns:
+    --------
+        dataset_metadata (DatasetMetadata):
+            The deserialized metadata.
+
+    Raises:
+    -------
+        CorruptDataError:
+            If legacy is False and the metadata is not a JSON document.
+        CorruptDataError:
+            If the document has a metadata version that is not
+            supported, or refers to classes that are not data types,
+            assets or enums.
+    """
+    if isinstance(serialized_metadata, str):
+        serialized_metadata = serialized_metadata.encode(
+            errors='surrogateescape')
+
+    if legacy:
+        dataset_metadata = dill.loads(serialized_metadata)
+        return dataset_metadata
+
+    try:
+        metadata = json.loads(serialized_metadata)
+    except ValueError as value_error:
+        raise CorruptDataError(
+            'Metadata is not a JSON document written by '
+            'serialize_metadata.') from value_error
+
+    dataset_metadata = _decode_metadata(metadata)
+    return dataset_metadata
+
+
+def migrate_hdf5_metadata(file_path: str | os.PathLike) -> None:
+    """
+    Converts dill pickled metadata of datasets in an HDF5 file written
+    by earlier versions of the library to JSON documents written by
+    serialize_metadata. Datasets that already have a metadata_version
+    attribute are left untouched. Readers of HDF5 files raise a
+    CorruptDataError on legacy metadata, so this must be run once on
+    files written by earlier versions before they are read.
+
+    Args:
+    -------
+        file_path (str | os.PathLike):
+            The path to the HDF5 file to migrate.
+
+    Notes:
+    ------
+        Legacy metadata is unpickled, which can run arbitrary code.
+        Only migrate files from trusted sources.
+    """
+    validate_path(file_path=file_path)
+
+    with h5.File(file_path, 'a') as hdf5_file:
+        for dataset_name in _get_hdf5_dataset_names(hdf5_file=hdf5_file):
+            dataset = hdf5_file[dataset_name]
+            if 'metadata_version' in dataset.attrs:
+                continue
+
+            dataset_metadata = deserialize_metadata(dataset.attrs['metadata'],
+                                                    legacy=True)
+            _write_hdf5_metadata(dataset=dataset,
+                                 dataset_metadata=dataset_metadata)
+            logger.info(f'Migrated metadata of {dataset_name} in '
+                        f'{file_path}.')
+
+    return None
+
+
+def migrate_memmap_metadata(dir_path: str | os.PathLike) -> None:
+    """
+    Converts dill pickled sidecar metadata files of a memory-mapped flat
+    feature store written by earlier versions of the library to JSON
+    documents. Legacy sidecars are pickles of protocol 2 or higher,
+    which start with the PROTO opcode. Other sidecars are left
+    untouched. Readers of the store raise a CorruptDataError on legacy
+    sidecars, so this must be run once on stores written by earlier
+    versions before they are read.
+
+    Args:
+    -------
+        dir_path (str | os.PathLike):
+            The path to the directory of the store.
+
+    Notes:
+    ------
+        Legacy sidecars are unpickled, which can run arbitrary code.
+        Only migrate stores from trusted sources.
+    """
+    for dataset_name in _get_memmap_dataset_names(dir_path=dir_path):
+        _, metadata_path = _get_memmap_paths(dir_path=dir_path,
+                                             dataset_name=dataset_name)
+        with open(metadata_path, 'rb') as metadata_file:
+            content = metadata_file.read()
+        if not content.startswith(pickle.PROTO):
+            continue
+
+        header = dill.loads(content)
+        _write_memmap_header(metadata_path=metadata_path, header=header)
+        logger.info(f'Migrated metadata of {dataset_name} in {dir_path}.')
+
+    return None
+
+
+def join_datasets(
+    dataset_metadata_list: List[DatasetMetadata], dataset_list: List
+) -> Tuple[DatasetMetadata, List[h5.Dataset | np.ndarray]]:
+    """
+    Joins the metadata of chronologically ordered datasets and orders
+    the datasets to match the order of data types in the joined data
+    schema. This is shared between storage backends so that HDF5 and
+    memory-mapped datasets are joined identically.
+
+    Args:
+    -------
+        dataset_metadata_list (List[DatasetMetadata]):
+            The metadata of the datasets, in the order in which the
+            datasets were added to the storage.
+        dataset_list (List[h5.Dataset | np.ndarray]):
+            The datasets corresponding to the metadata objects.
+    Returns:
+    --------
+        joined_metadata (DatasetMetadata):
+            The joined metadata of the datasets.
+        ordered_dataset_list (List[h5.Dataset | np.ndarray]):
+            The datasets ordered to match the joined data schema.
+    """
+
+    datasets_by_dataset_type_dict = defaultdict(list)
+    for dataset, dataset_metadata in zip(dataset_list, dataset_metadata_list):
+        dataset_type = next(
+            iter(dataset_metadata.data_schema.data_type_assets_map))
+        datasets_by_dataset_type_dict[dataset_type].append(dataset)
+
+    joined_metadata = reduce(lambda x, y: x | y, dataset_metadata_list)
+    ordered_dataset_types = (
+        joined_metadata.data_schema.data_type_assets_map.keys())
+    ordered_dataset_list = [
+        dataset for dataset_type in ordered_dataset_types
+        for dataset in datasets_by_dataset_type_dict[dataset_type]
+    ]
+    return joined_metadata, ordered_dataset_list
+
+
+def to_memmap(dir_path: str | os.PathLike, numpy_array: np.ndarray,
+              dataset_metadata: DatasetMetadata, dataset_name: str):
+    """
+    Saves a numpy array to a memory-mapped flat feature store. The store
+    is a directory where each dataset is a raw row-major file of
+    GLOBAL_DATA_TYPE values plus a sidecar metadata file holding the
+    dataset metadata, shape and data type. If the directory does not
+    exist, it will be created. If the dataset already exists, the new
+    data will be appended to the end of its data file. If the dataset
+    does not exist, a new dataset will be created. This is an
+    alternative to HDF5 storage where loaded datasets are np.memmap
+    views and reading rows does not go through a decompression or
+    chunk cache layer.
+    
+    Args:
+    -------
+        dir_path (str | os.PathLike):
+            The path to the directory of the store.
+        numpy_array (np.ndarray):
+            The numpy array to save. The number of rows must match the
+            number of rows in the metadata object.
+        dataset_metadata (DatasetMetadata):
+            The metadata object for the dataset.
+        dataset_name (str):
+            The name of the dataset to save.
+    Raises:
+    -------
+        ValueError:
+            If the number of rows in the numpy array does not match the
+            number of rows in the metadata object.
+        ValueError:
+            If the number of columns in the numpy array does not match
+            the number of columns of the existing dataset.
+        CorruptDataError:
+            If a data file exists without its sidecar metadata file.
+
+    Notes:
+    ------
+        The sidecar metadata file is replaced atomically after the data
+        is written. If writing is interrupted, the sidecar still
+        describes the last complete append and the trailing bytes of
+        the data file are overwritten by the next append.
+    """
+
+    if len(numpy_array) != dataset_metadata.n_rows:
+        raise ValueError(
+            f'Number of rows in numpy array: {len(numpy_array)}.'
+            f'Number of rows in metadata: {dataset_metadata.n_rows}')
+
+    os.makedirs(dir_path, exist_ok=True)
+    data_path, metadata_path = _get_memmap_paths(dir_path=dir_path,
+                                                 dataset_name=dataset_name)
+    numpy_array = np.ascontiguousarray(numpy_array, dtype=GLOBAL_DATA_TYPE)
+
+    if not os.path.exists(metadata_path):
+        if os.path.exists(data_path):
+            raise CorruptDataError(
+                f'Data file {data_path} exists without metadata file.')
+
+        order = len(_get_memmap_dataset_names(dir_path=dir_path))
+        with open(data_path, 'wb') as data_file:
+            data_file.write(numpy_array.tobytes())
+        new_dataset_metadata = dataset_metadata
+
+    else:
+        header = _read_memmap_header(metadata_path=metadata_path)
+        dataset_metadata_ = header['metadata']
+        order = header['order']
+
+        if numpy_array.shape[1] != header['shape'][1]:
+            raise ValueError(
+                f'Columns in numpy array: {numpy_array.shape[1]}.'
+                f'Columns in {dataset_name}: {header["shape"][1]}')
+
+        new_dataset_metadata = dataset_metadata_ + dataset_metadata
+        offset = dataset_metadata_.n_rows * numpy_array.shape[1] * (
+            numpy_array.itemsize)
+        with open(data_path, 'r+b') as data_file:
+            data_file.seek(offset)
+            data_file.write(numpy_array.tobytes())
+            data_file.truncate()
+
+    header = {
+        'metadata': new_dataset_metadata,
+        'shape': (new_dataset_metadata.n_rows, numpy_array.shape[1]),
+        'dtype': np.dtype(GLOBAL_DATA_TYPE).str,
+        'order': order
+    }
+    _write_memmap_header(metadata_path=metadata_path, header=header)
+
+    return None
+
+
+def from_memmap(
+    dir_path: str | os.PathLike,
+    dataset_name: Optional[str] = None
+) -> Tuple[DatasetMetadata, List[np.memmap]]:
+    """
+    Loads a dataset from a memory-mapped flat feature store. Mirrors
+    from_hdf5: if dataset_name is not specified, all datasets in the
+    store will be loaded, joined in the order in which they were added
+    to the store and ordered to match the joined data schema. If
+    dataset_name is specified, only that dataset will be loaded. The
+    returned datasets are read-only np.memmap views, so slicing rows
+    does not copy data until the rows are used.
+
+    Args:
+    -------
+        dir_path (str | os.PathLike):
+            The path to the directory of the store.
+        dataset_name (Optional[str]):
+            The name of the dataset to load. If None, all datasets in
+            the store are loaded.
+    Returns:
+    --------
+        dataset_metadata (DatasetMetadata):
+            The metadata of the dataset(s).
+        dataset_list (List[np.memmap]):
+            The dataset(s) loaded from the store.
+    Raises:
+    -------
+        ValueError:
+            If the path is not a directory or holds no datasets.
+    """
+
+    if not os.path.isdir(dir_path):
+        raise ValueError(f'Path {dir_path} is not a directory.')
+
+    if dataset_name is not None:
+        dataset_metadata, dataset = extract_memmap_dataset(
+            dir_path=dir_path, dataset_name=dataset_name)
+
+        return dataset_metadata, [dataset]
+
+    dataset_names = _get_memmap_dataset_names(dir_path=dir_path)
+    if not dataset_names:
+        raise ValueError(f'No datasets found in {dir_path}.')
+
+    headers = {
+        dataset_name:
+        _read_memmap_header(metadata_path=_get_memmap_paths(
+            dir_path=dir_path, dataset_name=dataset_name)[1])
+        for dataset_name in dataset_names
+    }
+    sorted_dataset_names = sorted(
+        dataset_names, key=lambda dataset_name: headers[dataset_name]['order'])
+
+    dataset_list = list()
+    dataset_metadata_list = list()
+
+    for dataset_name in sorted_dataset_names:
+        dataset_metadata, dataset = extract_memmap_dataset(
+            dir_path=dir_path,
+            dataset_name=dataset_name,
+            header=headers[dataset_name])
+
+        dataset_list.append(dataset)
+        dataset_metadata_list.append(dataset_metadata)
+
+    joined_metadata, ordered_dataset_list = join_datasets(
+        dataset_metadata_list=dataset_metadata_list, dataset_list=dataset_list)
+    return joined_metadata, ordered_dataset_list
+
+
+def extract_memmap_dataset(
+        dir_path: str | os.PathLike,
+        dataset_name: str,
+        header: Optional[dict] = None) -> Tuple[DatasetMetadata, np.memmap]:
+    """
+    Extracts a dataset from a memory-mapped flat feature store and
+    returns the dataset as a read-only np.memmap and its metadata.
+
+    Args:
+    -------
+        dir_path (str | os.PathLike):
+            The path to the directory of the store.
+        dataset_name (str):
+            The name of the dataset to extract.
+        header (Optional[dict]):
+            The already parsed sidecar of the dataset. If None, the
+            sidecar is read from disk.
+    Raises:
+    -------
+        ValueError:
+            If the dataset does not exist in the store.
+        CorruptDataError:
+            If the size of the data file or the number of columns does
+            not match the metadata.
+    """
+
+    data_path, metadata_path = _get_memmap_paths(dir_path=dir_path,
+                                                 dataset_name=dataset_name)
+
+    if not os.path.exists(metadata_path) or not os.path.exists(data_path):
+        raise ValueError(f'Dataset {dataset_name} does not exist in store.')
+
+    if header is None:
+        header = _read_memmap_header(metadata_path=metadata_path)
+
+    dataset_metadata = header['metadata']
+    shape = tuple(header['shape'])
+    dtype = np.dtype(header['dtype'])
+
+    if dataset_metadata.n_rows != shape[0]:
+        raise CorruptDataError(f'Rows in {dataset_name}: {shape[0]}.'
+                               f'Rows in metadata: {dataset_metadata.n_rows}')
+    if dataset_metadata.n_features != shape[1]:
+        raise CorruptDataError(
+            f'Columns in {dataset_name}: {shape[1]}.'
+            f'Columns in metadata: {dataset_metadata.n_features}')
+
+    n_bytes = shape[0] * shape[1] * dtype.itemsize
+    if os.path.getsize(data_path) < n_bytes:
+        raise CorruptDataError(
+            f'Size of {data_path}: {os.path.getsize(data_path)} bytes.'
+            f'Size in metadata: {n_bytes} bytes')
+
+    dataset = np.memmap(data_path, dtype=dtype, mode='r', shape=shape)
 
     return dataset_metadata, dataset
 
 
+def hdf5_to_memmap(file_path: str | os.PathLike,
+                   dir_path: str | os.PathLike,
+                   n_rows_per_copy: int = 100_000) -> None:
+    """
+    Converts all datasets of an HDF5 file to a memory-mapped flat
+    feature store. Datasets are copied in blocks of rows so that the
+    conversion does not need to load a full dataset in memory, and are
+    added to the store in the same order as in the HDF5 file so that
+    joined datasets are ordered identically by from_memmap.
+
+    Args:
+    -------
+        file_path (str | os.PathLike):
+            The path to the HDF5 file to convert.
+        dir_path (str | os.PathLike):
+            The path to the directory of the store.
+        n_rows_per_copy (int):
+            The number of rows copied at a time. Default is 100_000.
+    Raises:
+    -------
+        ValueError:
+            If a dataset of the HDF5 file already exists in the store.
+    """
+
+    validate_path(file_path=file_path)
+    os.makedirs(dir_path, exist_ok=True)
+
+    with h5.File(file_path, 'r') as hdf5_file:
+        order = len(_get_memmap_dataset_names(dir_path=dir_path))
+
+        for dataset_name in _get_hdf5_dataset_names(hdf5_file=hdf5_file):
+            dataset_metadata, dataset = extract_hdf5_dataset(
+                hdf5_file=hdf5_file, dataset_name=dataset_name)
+            data_path, metadata_path = _get_memmap_paths(
+                dir_path=dir_path, dataset_name=dataset_name)
+
+            if os.path.exists(metadata_path) or os.path.exists(data_path):
+                raise ValueError(
+                    f'Dataset {dataset_name} already exists in {dir_path}.')
+
+            memmap = np.memmap(data_path,
+                               dtype=GLOBAL_DATA_TYPE,
+                               mode='w+',
+                               shape=dataset.shape)
+            for start in range(0, len(dataset), n_rows_per_copy):
+                end = min(start + n_rows_per_copy, len(dataset))
+                memmap[start:end] = dataset[start:end]
+            memmap.flush()
+            del memmap
+
+            header = {
+                'metadata': dataset_metadata,
+                'shape': dataset.shape,
+                'dtype': np.dtype(GLOBAL_DATA_TYPE).str,
+                'order': order
+            }
+            _write_memmap_header(metadata_path=metadata_path, header=header)
+            order += 1
+
+    return None
+
+
+def _get_hdf5_dataset_names(hdf5_file: h5.File) -> List[str]:
+    """
+    Returns the names of the datasets in an HDF5 file in the order in
+    which they were added to the file. Groups iterate datasets by name,
+    and chunked datasets, such as the datasets written by HDF5Writer,
+    have no contiguous storage offset. Object headers are allocated as
+    datasets are created, so datasets are ordered by the address of
+    their object header.
+    """
+    dataset_names = sorted(
+        hdf5_file,
+        key=lambda dataset_name: h5.h5o.get_info(hdf5_file[dataset_name].id
+                                                 ).addr)
+    return dataset_names
+
+
+def _get_memmap_paths(dir_path: str | os.PathLike,
+                      dataset_name: str) -> Tuple[str, str]:
+    """
+    Returns the paths to the data file and sidecar metadata file of a
+    dataset in a memory-mapped flat feature store.
+    """
+    data_path = os.path.join(dir_path,
+                             dataset_name + MEMMAP_DATA_FILE_EXTENSION)
+    metadata_path = os.path.join(dir_path,
+                                 dataset_name + MEMMAP_METADATA_FILE_EXTENSION)
+    return data_path, metadata_path
+
+
+def _get_memmap_dataset_names(dir_path: str | os.PathLike) -> List[str]:
+    """
+    Returns the names of the datasets in a memory-mapped flat feature
+    store, namely the names of files with a sidecar metadata extension.
+    """
+    dataset_names = [
+        file_name[:-len(MEMMAP_METADATA_FILE_EXTENSION)]
+        for file_name in os.listdir(dir_path)
+        if file_name.endswith(MEMMAP_METADATA_FILE_EXTENSION)
+    ]
+    return dataset_names
+
+
+def _read_memmap_header(metadata_path: str | os.PathLike) -> dict:
+    """
+    Reads the sidecar metadata file of a memory-mapped dataset. The
+    sidecar must be a JSON document. Sidecars written by earlier
+    versions of the library are dill pickles and are never unpickled
+    here, since unpickling can run arbitrary code.
+    """
+    with open(metadata_path, 'rb') as metadata_file:
+        content = metadata_file.read()
+
+    if content.startswith(pickle.PROTO):
+        raise CorruptDataError(
+            f'Sidecar {metadata_path} is a dill pickle written by an '
+            'earlier version of the library. Convert trusted stores with '
+            'migrate_memmap_metadata.')
+
+    try:
+        header = json.loads(content)
+    except ValueError as value_error:
+        raise CorruptDataError(
+            f'Sidecar {metadata_path} is not a JSON document.'
+        ) from value_error
+
+    header['metadata'] = _decode_metadata(header['metadata'])
+    return header
+
+
+def _write_memmap_header(metadata_path: str | os.PathLike,
+                         header: dict) -> None:
+    """
+    Atomically writes the sidecar metadata file of a memory-mapped
+    dataset. The header is written as a JSON document with the metadata
+    serialized by serialize_metadata. The header is written to a
+    temporary file that replaces the sidecar, so readers never observe a
+    partially written sidecar.
+    """
+    header = {
+        **header, 'metadata': _encode_metadata(header['metadata']),
+        'shape': [int(size) for size in header['shape']]
+    }
+    _write_atomically(file_path=metadata_path,
+                      content=json.dumps(header).encode())
+    return None
+
+
+def _encode_metadata(dataset_metadata: DatasetMetadata) -> dict:
+    """
+    Encodes dataset metadata to a JSON compatible dictionary. Used by
+    serialize_metadata and by sidecar files of memory-mapped datasets.
+    """
+    data_schema = dataset_metadata.data_schema
+    feature_schema = {
+        feature_type.name: np.flatnonzero(mask).tolist()
+        for feature_type, mask in data_schema.feature_schema.items()
+    }
+    data_schema_ = [{
+        'data_type': _encode_value(data_type),
+        'assets': [_encode_asset(asset) for asset in assets]
+    } for data_type, assets in data_schema.data_type_assets_map.items()]
+
+    metadata = {
+        'metadata_version': METADATA_VERSION,
+        'data_schema': data_schema_,
+        'feature_schema': feature_schema,
+        'resolution': {
+            'quantity': dataset_metadata.resolution.quantity,
+            'unit': dataset_metadata.resolution.unit.name
+        },
+        'calendar_type': dataset_metadata.calendar_type.name,
+        'start': dataset_metadata.start.isoformat(),
+        'end': dataset_metadata.end.isoformat(),
+        'n_rows': int(dataset_metadata.n_rows),
+        'n_features': int(dataset_metadata.n_features),
+        'cumulative_daily_rows': np.asarray(
+            dataset_metadata.cumulative_daily_rows).tolist()
+    }
+    return metadata
+
+
+def _decode_metadata(metadata: dict) -> DatasetMetadata:
+    """
+    Decodes dataset metadata encoded by _encode_metadata.
+    """
+    if metadata.get('metadata_version') != METADATA_VERSION:
+        raise CorruptDataError(
+            f'Metadata version {metadata.get("metadata_version")} is not '
+            f'supported. Supported version: {METADATA_VERSION}')
+
+    data_schema = None
+    for data_schema_ in metadata['data_schema']:
+        data_type = _decode_value(data_schema_['data_type'],
+                                  base_class=AbstractDataType)
+        assets = [_decode_asset(asset) for asset in data_schema_['assets']]
+        data_schema_ = DataSchema(data_type=data_type, assets=assets)
+        data_schema = (data_schema_
+                       if data_schema is None else data_schema + data_schema_)
+
+    resolution = Resolution(
+        quantity=metadata['resolution']['quantity'],
+        unit=Resolution.Unit[metadata['resolution']['unit']])
+
+    dataset_metadata = DatasetMetadata.from_cumulative_daily_rows(
+        cumulative_daily_rows=metadata['cumulative_daily_rows'],
+        data_schema=data_schema,
+        resolution=resolution,
+        calendar_type=CalendarType[metadata['calendar_type']],
+        start=pd.Timestamp(metadata['start']),
+        end=pd.Timestamp(metadata['end']))
+
+    return dataset_metadata
+
+
+def _read_hdf5_metadata(dataset: h5.Dataset) -> DatasetMetadata:
+    """
+    Reads the metadata of an HDF5 dataset from its attributes. Datasets
+    without a metadata_version attribute were written by earlier
+    versions of the library and have dill pickled metadata, which is
+    never unpickled here, since unpickling can run arbitrary code.
+    """
+    if 'metadata_version' not in dataset.attrs:
+        raise CorruptDataError(
+            f'Dataset {dataset.name} has dill pickled metadata written by '
+            'an earlier version of the library. Convert trusted files '
+            'with migrate_hdf5_metadata.')
+
+    dataset_metadata = deserialize_metadata(dataset.attrs['metadata'])
+    return dataset_metadata
+
+
+def _write_hdf5_metadata(dataset: h5.Dataset,
+                         dataset_metadata: DatasetMetadata) -> None:
+    """
+    Writes the metadata of an HDF5 dataset to its attributes. The
+    metadata version is also written as a separate attribute, so that
+    readers can check the format without parsing the metadata.
+    """
+    dataset.attrs['metadata'] = serialize_metadata(dataset_metadata)
+    dataset.attrs['metadata_version'] = METADATA_VERSION
+    return None
+
+
+def _encode_value(value: object) -> object:
+    """
+    Encodes a field value of an asset or a data type to a JSON
+    compatible value. Enum members are encoded by their class path and
+    name, other values are expected to be JSON compatible.
+    """
+    if isinstance(value, Enum):
+        value = {'class': _get_class_path(type(value)), 'name': value.name}
+    return value
+
+
+def _decode_value(value: object, base_class: type = Enum) -> object:
+    """
+    Decodes a value encoded by _encode_value. Encoded enum members must
+    be members of a subclass of base_class.
+    """
+    if isinstance(value, dict):
+        enum_class = _import_class(value['class'], base_class=base_class)
+        value = enum_class[value['name']]
+    return value
+
+
+def _encode_asset(asset: AbstractAsset) -> dict:
+    """
+    Encodes an asset by its class path and values of its fields.
+    """
+    fields_ = {
+        field.name: _encode_value(getattr(asset, field.name))
+        for field in fields(asset)
+    }
+    encoded_asset = {'class': _get_class_path(type(asset)), 'fields': fields_}
+    return encoded_asset
+
+
+def _decode_asset(encoded_asset: dict) -> AbstractAsset:
+    """
+    Decodes an asset encoded by _encode_asset.
+    """
+    asset_class = _import_class(encoded_asset['class'],
+                                base_class=AbstractAsset)
+    fields_ = {
+        name: _decode_value(value)
+        for name, value in encoded_asset['fields'].items()
+    }
+    asset = asset_class(**fields_)
+    return asset
+
+
+def _get_class_path(class_: type) -> str:
+    """
+    Returns the path of a class in the form <module>:<qualified name>.
+    """
+    class_path = f'{class_.__module__}:{class_.__qualname__}'
+    return class_path
+
+
+def _import_class(class_path: str, base_class: type) -> type:
+    """
+    Imports a class from its path returned by _get_class_path. Only
+    modules of this library are imported. Classes defined elsewhere,
+    such as custom assets, are looked up in modules that are already
+    imported, so that serialized metadata cannot trigger imports of
+    arbitrary modules. Only subclasses of base_class are returned, so
+    that serialized metadata cannot refer to arbitrary objects.
+    """
+    module_name, qualified_name = class_path.split(':')
+    if module_name == 'neural' or module_name.startswith('neural.'):
+        class_ = importlib.import_module(module_name)
+    elif module_name in sys.modules:
+        class_ = sys.modules[module_name]
+    else:
+        raise CorruptDataError(
+            f'Module of {class_path} is not imported. Import the module '
+            'that defines the class before loading the dataset.')
+
+    for name in qualified_name.split('.'):
+        class_ = getattr(class_, name)
+
+    if not (isinstance(class_, type) and issubclass(class_, base_class)):
+        raise CorruptDataError(
+            f'{class_path} is not a subclass of {base_class.__name__}.')
+
+    return class_
+
+
+def _write_atomically(file_path: str | os.PathLike, content: bytes) -> None:
+    """
+    Atomically writes content to a file. Content is written to a
+    temporary file that is flushed to disk and then replaces the
+    target file, so readers never observe a partially written file.
+    """
+    temporary_path = str(file_path) + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, file_path)
+    return None
+
+
+def _remove_if_exists(file_path: str | os.PathLike) -> None:
+    """
+    Removes a file, unless it was already removed, for example by
+    another process sharing a download cache.
+    """
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    return None
+
+
+class DownloadCache:
+    """
+    An on-disk cache of raw datasets downloaded from data sources.
+    Entries are raw dataframes of a single symbol, such as the bars of
+    one symbol in one market day, keyed by a tuple that identifies the
+    request, for example (dataset type, symbol, resolution, session).
+    Entries are content addressed, namely stored in files named by the
+    SHA-256 digest of their key, and saved in a compact columnar format:
+    one compressed numpy array per column, with timestamps stored as
+    datetime64 values. Total size of the cache is bounded and least
+    recently used entries are evicted first. Recency of entries is
+    recorded in modification times of their files, so it survives
+    across processes.
+
+    Attributes:
+    -----------
+        dir_path (str | os.PathLike):
+            The directory where entries are stored.
+        max_size (int):
+            The maximum total size of entries in bytes.
+        _entries (OrderedDict[str, int]):
+            Sizes of entries keyed by their file paths, ordered from
+            least to most recently used.
+        _size (int):
+            The total size of entries in bytes.
+        _lock (threading.Lock):
+            Serializes access to entries, since downloads can run on
+            multiple threads.
+
+    Methods:
+    --------
+        get(key) -> Optional[pd.DataFrame]:
+            Returns the cached dataframe of the key, or None if the key
+            is not cached.
+        put(key, dataset) -> None:
+            Caches the dataframe of the key, evicting least recently
+            used entries if the cache exceeds its maximum size.
+        clear() -> None:
+            Removes all entries from the cache.
+
+    Example:
+    --------
+        >>> cache = DownloadCache(dir_path='cache')
+        >>> downloader = AlpacaDataDownloader(data_client, cache=cache)
+
+    Notes:
+    ------
+        Dataframes are expected to have a (symbol, timestamp) index
+        with tz-aware timestamps and numerical columns, as returned by
+        Alpaca API. Empty dataframes are cached as well, to record that
+        a request returned no data.
+    """
+
+    def __init__(self,
+                 dir_path: str | os.PathLike,
+                 max_size: int = DOWNLOAD_CACHE_DEFAULT_MAX_SIZE) -> None:
+        """
+        Initializes a DownloadCache object. Existing entries in the
+        directory are indexed in order of their modification times.
+
+        Args:
+        ------
+            dir_path (str | os.PathLike):
+                The directory where entries are stored. Created if it
+                does not exist.
+            max_size (int):
+                The maximum total size of entries in bytes. Default is
+                DOWNLOAD_CACHE_DEFAULT_MAX_SIZE.
+
+        Raises:
+        -------
+            ValueError:
+                If max_size is not positive.
+        """
+        if max_size <= 0:
+            raise ValueError(f'max_size = {max_size} must be positive.')
+
+        self.dir_path = dir_path
+        self.max_size = max_size
+        os.makedirs(dir_path, exist_ok=True)
+
+        entries = list()
+        for directory, _, file_names in os.walk(dir_path):
+            for file_name in file_names:
+                if not file_name.endswith('.npz'):
+                    continue
+                file_path = os.path.join(directory, file_name)
+                stat = os.stat(file_path)
+                entries.append((stat.st_mtime, file_path, stat.st_size))
+        entries.sort()
+
+        self._entries = OrderedDict(
+            (file_path, size) for _, file_path, size in entries)
+        self._size = sum(self._entries.values())
+        self._lock = threading.Lock()
+        return None
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[pd.DataFrame]:
+        """
+        Returns the cached dataframe of the key and marks it as most
+        recently used.
+
+        Args:
+        ------
+            key (Tuple[Hashable, ...]):
+                The key of the entry. Elements are converted to strings
+                to compute the file name of the entry.
+
+        Returns:
+        --------
+            Optional[pd.DataFrame]:
+                The cached dataframe, or None if the key is not cached,
+                the entry was evicted by another thread or process, or
+                the entry cannot be read.
+
+        Notes:
+        ------
+            Other processes sharing the directory can evict an entry
+            after it is looked up. Such entries are removed from the
+            index of this cache. Entries that cannot be read, for
+            example if they are truncated, are misses and are replaced
+            by the next put of the key.
+        """
+        file_path = self._get_file_path(key)
+        with self._lock:
+            if file_path not in self._entries:
+                return None
+            try:
+                os.utime(file_path)
+            except FileNotFoundError:
+                self._size -= self._entries.pop(file_path)
+                return None
+            self._entries.move_to_end(file_path)
+
+        try:
+            with np.load(file_path, allow_pickle=False) as entry:
+                arrays = {name: entry[name] for name in entry.files}
+            symbol = str(arrays.pop('__symbol__'))
+            timestamps = arrays.pop('__timestamp__')
+        except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile,
+                zlib.error):
+            return None
+
+        timestamps = pd.DatetimeIndex(timestamps).tz_localize('UTC')
+        index = pd.MultiIndex.from_arrays(
+            [np.full(len(timestamps), symbol, dtype=object), timestamps],
+            names=['symbol', 'timestamp'])
+        dataset = pd.DataFrame(arrays, index=index)
+
+        return dataset
+
+    def put(self, key: Tuple[Hashable, ...], dataset: pd.DataFrame) -> None:
+        """
+        Caches the dataframe of the key. The entry is written atomically
+        and least recently used entries are evicted afterwards, until
+        the cache fits in its maximum size. The entry just written is
+        never evicted.
+
+        Args:
+        ------
+            key (Tuple[Hashable, ...]):
+                The key of the entry.
+            dataset (pd.DataFrame):
+                The dataframe of a single symbol to cache.
+
+        Raises:
+        -------
+            ValueError:
+                If the dataframe has rows of more than one symbol.
+        """
+        symbols = dataset.index.get_level_values('symbol').unique()
+        if len(symbols) > 1:
+            raise ValueError(
+                f'Cache entries hold a single symbol, got {list(symbols)}.')
+
+        timestamps = dataset.index.get_level_values('timestamp')
+        arrays = {
+            '__symbol__': np.array(symbols[0] if len(symbols) else ''),
+            '__timestamp__': np.asarray(
+                timestamps.tz_convert('UTC').tz_localize(None),
+                dtype='datetime64[ns]')
+        }
+        for column in dataset.columns:
+            arrays[column] = dataset[column].to_numpy()
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        file_path = self._get_file_path(key)
+
+        with self._lock:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            _write_atomically(file_path=file_path, content=buffer.getvalue())
+
+            self._size -= self._entries.pop(file_path, 0)
+            self._entries[file_path] = buffer.getbuffer().nbytes
+            self._size += self._entries[file_path]
+
+            while self._size > self.max_size and len(self._entries) > 1:
+                evicted_path, evicted_size = self._entries.popitem(last=False)
+                _remove_if_exists(evicted_path)
+                self._size -= evicted_size
+
+        return None
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache.
+        """
+        with self._lock:
+            for file_path in self._entries:
+                _remove_if_exists(file_path)
+            self._entries.clear()
+            self._size = 0
+
+        return None
+
+    def _get_file_path(self, key: Tuple[Hashable, ...]) -> str:
+        """
+        Returns the path of the file storing the entry of the key.
+        Entries are sharded into subdirectories by the first two
+        characters of their digest, to keep directories small.
+        """
+        digest = hashlib.sha256(
+            '\x1f'.join(str(element) for element in key).encode()).hexdigest()
+        file_path = os.path.join(self.dir_path, digest[:2], digest + '.npz')
+        return file_path
+
+
 def get_file_like(object: object,
                   file_name: str) -> Tuple[tarfile.TarInfo, io.BytesIO]:
     """
@@ -25,7 +25,7 @@ import pandas as pd
 
 from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
 
-from neural.data.base import Resolution
+from neural.utils.time import Resolution
 
 def objects_list_to_dataframe(
     objects_list: List[object]
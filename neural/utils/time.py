@@ -5,14 +5,20 @@ A module for working with time and dates. This module contains a class
 for creating trading calendars for different asset classes. The trading
 calendars are based on pandas_market_calendars. The module also contains
 a class for creating custom calendars that are not supported by
-pandas_market_calendars.
+pandas_market_calendars, and a cache for schedules generated by
+calendars.
 """
 from __future__ import annotations
 
 from abc import abstractmethod, ABC
+from collections import OrderedDict
 from enum import Enum
-from typing import Any, TYPE_CHECKING
+import os
+import re
+import threading
+from typing import Any, Callable, List, Optional, Tuple, TYPE_CHECKING
 
+import numpy as np
 import pandas as pd
 import pandas_market_calendars as market_calendars
 
@@ -70,6 +76,301 @@ class AbstractCalendar(ABC):
         raise NotImplementedError
 
 
+class ScheduleCache:
+    """
+    A cache for schedules generated by calendars. Generating schedules
+    through calendar libraries is slow for multi-year ranges and the
+    same schedules are requested repeatedly, for example by dataset
+    metadata, when joining metadata and when downloading datasets. The
+    cache memoizes schedules by calendar type and date range. For each
+    calendar type it also keeps the sessions of the date ranges
+    generated so far, and queries within a covered range are answered
+    by slicing the sessions instead of calling the calendar. A query
+    that is not covered is merged with covered ranges that overlap it or
+    are at most max_gap_days away, so that neighbouring queries share
+    sessions while distant queries, such as one in 2005 and one in 2023,
+    are cached as separate ranges instead of generating every year in
+    between. If a directory is provided, sessions are also stored on
+    disk and loaded by other processes, so workers do not regenerate
+    schedules at startup. The cache is shared by threads, for example
+    the download threads of a downloader, so lookups and updates are
+    serialized by a lock.
+
+    Attributes:
+    -----------
+        dir_path (Optional[str | os.PathLike]):
+            The directory where sessions are stored. If None, sessions
+            are only kept in memory.
+        max_memoized (int):
+            The maximum number of memoized date ranges. Least recently
+            used ranges are evicted first.
+        max_gap_days (int):
+            The maximum number of days between a query and a covered
+            range for the two to be merged into one range.
+        _memo (OrderedDict):
+            Memoized schedules keyed by calendar type value, start date
+            and end date.
+        _sessions (Dict[str, List[Tuple[pd.Timestamp, pd.Timestamp,
+        pd.DataFrame]]]):
+            The disjoint ranges of dates covered and their sessions,
+            sorted by start date and keyed by calendar type value.
+        _lock (threading.Lock):
+            The lock serializing access to the memo and sessions.
+
+    Methods:
+    --------
+        get(calendar_type, start_date, end_date, generate) ->
+        pd.DataFrame:
+            Returns the schedule of the calendar type between start and
+            end dates, generating it only if it is not cached.
+        clear() -> None:
+            Clears the schedules cached in memory.
+
+    Example:
+    --------
+        >>> from neural.utils.time import Calendar, ScheduleCache
+        >>> Calendar.schedule_cache = ScheduleCache(dir_path='schedules')
+
+    Notes:
+    ------
+        Schedules returned by the cache are shared between callers and
+        must not be modified in place.
+    """
+
+    def __init__(self,
+                 dir_path: Optional[str | os.PathLike] = None,
+                 max_memoized: int = 1024,
+                 max_gap_days: int = 366) -> None:
+        """
+        Initializes a ScheduleCache object.
+
+        Args:
+        ------
+            dir_path (Optional[str | os.PathLike]):
+                The directory where sessions are stored. If None,
+                sessions are only kept in memory. Default is None.
+            max_memoized (int):
+                The maximum number of memoized date ranges. Default is
+                1024.
+            max_gap_days (int):
+                The maximum number of days between a query and a covered
+                range for the two to be merged into one range. Default
+                is 366.
+        """
+        self.dir_path = dir_path
+        self.max_memoized = max_memoized
+        self.max_gap_days = max_gap_days
+
+        self._memo = OrderedDict()
+        self._sessions = dict()
+        self._lock = threading.Lock()
+        return None
+
+    def get(
+        self, calendar_type: CalendarType, start_date: Any, end_date: Any,
+        generate: Callable[[CalendarType, Any, Any], pd.DataFrame]
+    ) -> pd.DataFrame:
+        """
+        Returns the schedule of the calendar type between start and end
+        dates. Memoized ranges are returned directly. Ranges within a
+        covered range of the calendar type are sliced from its sessions.
+        Otherwise the requested range is merged with covered ranges that
+        overlap it or are at most max_gap_days away, and the schedule of
+        the merged range is generated once.
+
+        Args:
+        ------
+            calendar_type (CalendarType):
+                The type of calendar to use.
+            start_date (Any):
+                The start date for the trading schedule. Anything that
+                can be read by pandas to_datetime.
+            end_date (Any):
+                The end date for the trading schedule. Anything that can
+                be read by pandas to_datetime.
+            generate (Callable[[CalendarType, Any, Any], pd.DataFrame]):
+                The function that generates a schedule if it is not
+                cached.
+        Returns:
+        --------
+            pd.DataFrame:
+                A dataframe with trading dates and times.
+        """
+        start_date = self._to_date(start_date)
+        end_date = self._to_date(end_date)
+        key = (calendar_type.value, start_date, end_date)
+
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+
+            sessions = self._sessions.get(calendar_type.value)
+            if sessions is None and self.dir_path is not None:
+                sessions = self._load(calendar_type)
+            if sessions is None:
+                sessions = list()
+
+            for covered_start_date, covered_end_date, schedule in sessions:
+                if (covered_start_date <= start_date
+                        and end_date <= covered_end_date):
+                    break
+            else:
+                schedule = self._extend_sessions(calendar_type, sessions,
+                                                 start_date, end_date,
+                                                 generate)
+
+            schedule = schedule[(schedule.index >= start_date)
+                                & (schedule.index <= end_date)]
+
+            self._memo[key] = schedule
+            if len(self._memo) > self.max_memoized:
+                self._memo.popitem(last=False)
+
+        return schedule
+
+    def clear(self) -> None:
+        """
+        Clears the schedules cached in memory. Sessions stored on disk
+        are kept.
+        """
+        with self._lock:
+            self._memo.clear()
+            self._sessions.clear()
+        return None
+
+    def _extend_sessions(
+        self, calendar_type: CalendarType,
+        sessions: List[Tuple[pd.Timestamp, pd.Timestamp, pd.DataFrame]],
+        start_date: pd.Timestamp, end_date: pd.Timestamp,
+        generate: Callable[[CalendarType, Any, Any], pd.DataFrame]
+    ) -> pd.DataFrame:
+        """
+        Merges a date range that is not covered with the covered ranges
+        of a calendar type that overlap it or are at most max_gap_days
+        away, generates the schedule of the merged range and replaces
+        the merged ranges with it. Returns the schedule of the merged
+        range.
+        """
+        max_gap = pd.Timedelta(days=self.max_gap_days)
+        merged = [
+            session[0] - max_gap <= end_date
+            and start_date <= session[1] + max_gap for session in sessions
+        ]
+        merged_sessions = [
+            session for session, is_merged in zip(sessions, merged)
+            if is_merged
+        ]
+        covered_start_date = min([start_date] +
+                                 [session[0] for session in merged_sessions])
+        covered_end_date = max([end_date] +
+                               [session[1] for session in merged_sessions])
+
+        schedule = generate(calendar_type, covered_start_date,
+                            covered_end_date)
+        sessions = [
+            session for session, is_merged in zip(sessions, merged)
+            if not is_merged
+        ]
+        sessions.append((covered_start_date, covered_end_date, schedule))
+        sessions.sort(key=lambda session: session[0])
+
+        self._sessions[calendar_type.value] = sessions
+        if self.dir_path is not None:
+            self._save(calendar_type)
+
+        return schedule
+
+    @staticmethod
+    def _to_date(date: Any) -> pd.Timestamp:
+        """
+        Converts a date to a time zone naive timestamp at midnight, the
+        format of dates in the index of schedules.
+        """
+        timestamp = pd.Timestamp(date)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+        return timestamp.normalize()
+
+    def _get_file_path(self, calendar_type: CalendarType) -> str:
+        """
+        Returns the path to the file storing sessions of a calendar
+        type. Characters that are not valid in file names are replaced.
+        """
+        file_name = re.sub(r'[^A-Za-z0-9_-]', '_', calendar_type.value)
+        file_path = os.path.join(self.dir_path, file_name + '.npz')
+        return file_path
+
+    def _load(
+        self, calendar_type: CalendarType
+    ) -> Optional[List[Tuple[pd.Timestamp, pd.Timestamp, pd.DataFrame]]]:
+        """
+        Loads sessions of a calendar type from disk. Sessions of all
+        covered ranges are stored as one schedule and split by the
+        covered dates. Returns None if sessions of the calendar type are
+        not stored.
+        """
+        file_path = self._get_file_path(calendar_type)
+        if not os.path.exists(file_path):
+            return None
+
+        with np.load(file_path) as arrays:
+            index = pd.DatetimeIndex(arrays['index'])
+            columns = {
+                column: pd.DatetimeIndex(arrays[column])
+                for column in ('start', 'end')
+            }
+            time_zone = str(arrays['time_zone'])
+            covered = pd.DatetimeIndex(arrays['covered'].reshape(-1))
+
+        if time_zone:
+            columns = {
+                column: values.tz_localize('UTC').tz_convert(time_zone)
+                for column, values in columns.items()
+            }
+        schedule = pd.DataFrame(columns, index=index)
+
+        sessions = [(covered_start_date, covered_end_date,
+                     schedule[(schedule.index >= covered_start_date)
+                              & (schedule.index <= covered_end_date)])
+                    for covered_start_date, covered_end_date in zip(
+                        covered[::2], covered[1::2])]
+        self._sessions[calendar_type.value] = sessions
+        return sessions
+
+    def _save(self, calendar_type: CalendarType) -> None:
+        """
+        Atomically stores sessions of a calendar type on disk. Dates are
+        stored as numpy datetime64 arrays, in UTC for time zone aware
+        columns. Sessions of covered ranges are concatenated, along with
+        the start and end dates of each range.
+        """
+        sessions = self._sessions[calendar_type.value]
+        schedule = pd.concat([session[2] for session in sessions])
+
+        time_zone = schedule['start'].dt.tz
+        arrays = {
+            'index': schedule.index.values.astype('datetime64[ns]'),
+            'time_zone': np.array(str(time_zone) if time_zone else ''),
+            'covered': np.array([session[:2] for session in sessions],
+                                dtype='datetime64[ns]')
+        }
+        for column in ('start', 'end'):
+            values = pd.DatetimeIndex(schedule[column])
+            if values.tz is not None:
+                values = values.tz_convert('UTC').tz_localize(None)
+            arrays[column] = values.values.astype('datetime64[ns]')
+
+        os.makedirs(self.dir_path, exist_ok=True)
+        file_path = self._get_file_path(calendar_type)
+        temporary_file_path = file_path + '.tmp'
+        with open(temporary_file_path, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temporary_file_path, file_path)
+
+        return None
+
+
 class Calendar:
     """
     This is a class for creating trading calendars for different exchanges. The
@@ -81,11 +382,21 @@ class Calendar:
     ---------
         calendar_names: list
             A list of supported calendar names.
+        schedule_cache: ScheduleCache
+            The cache of generated schedules. Replace with a cache that
+            has a directory to store schedules on disk.
 
     Methods:
     ---------
         schedule(calendar_type, start_date, end_date) -> pd.DataFrame:
             Returns a schedule dataframe with trading dates and times.
+        generate_schedule(calendar_type, start_date, end_date) ->
+        pd.DataFrame:
+            Generates a schedule dataframe without using the cache.
+        generate_continuous_schedule(start_date, end_date,
+        weekdays_only) -> pd.DataFrame:
+            Generates a schedule dataframe for calendars that trade
+            around the clock, without using calendar libraries.
 
     Example:
     ---------
@@ -119,6 +430,8 @@ class Calendar:
         ... start_date='2022-01-01',
         ... end_date='2022-01-10')
     """
+    schedule_cache = ScheduleCache()
+    continuous_calendar_weekdays_only = {'24/7': False, '24/5': True}
 
     @property
     def calendar_names(self) -> list:
@@ -137,7 +450,9 @@ class Calendar:
                  end_date: Any) -> pd.DataFrame:
         """
         Returns a schedule dataframe with core trading open and close
-        times per day.
+        times per day. Schedules are memoized and sliced from cached
+        sessions by Calendar.schedule_cache, and only generated if not
+        cached.
 
         Args:
         ---------
@@ -147,10 +462,49 @@ class Calendar:
                 The start date for the trading schedule. The date
                 can be anything that can be read by pandas to_datetime.
                 examples include pd.Timestamp, datetime.datetime, str.
+            end_date (Any):
+                The end date for the trading schedule.
+        Returns:
+        ---------
+            pd.DataFrame: A dataframe with trading dates and times.
+        """
+        schedule_dataframe = Calendar.schedule_cache.get(
+            calendar_type=calendar_type,
+            start_date=start_date,
+            end_date=end_date,
+            generate=Calendar.generate_schedule)
+
+        return schedule_dataframe
+
+    @staticmethod
+    def generate_schedule(calendar_type: CalendarType, start_date: Any,
+                          end_date: Any) -> pd.DataFrame:
+        """
+        Generates a schedule dataframe with core trading open and close
+        times per day, without using the cache. Schedules of calendars
+        that trade around the clock, namely 24/7 and 24/5, are generated
+        natively, otherwise pandas_market_calendars is used.
+
+        Args:
+        ---------
+            calendar_type (CalendarType):
+                The type of calendar to use.
+            start_date (Any):
+                The start date for the trading schedule.
+            end_date (Any):
+                The end date for the trading schedule.
         Returns:
         ---------
             pd.DataFrame: A dataframe with trading dates and times.
         """
+        if calendar_type.value in Calendar.continuous_calendar_weekdays_only:
+            weekdays_only = Calendar.continuous_calendar_weekdays_only[
+                calendar_type.value]
+            schedule_dataframe = Calendar.generate_continuous_schedule(
+                start_date=start_date,
+                end_date=end_date,
+                weekdays_only=weekdays_only)
+            return schedule_dataframe
 
         calendar = market_calendars.get_calendar(calendar_type.value)
 
@@ -164,6 +518,45 @@ class Calendar:
         
         return schedule_dataframe
 
+    @staticmethod
+    def generate_continuous_schedule(start_date: Any,
+                                     end_date: Any,
+                                     weekdays_only: bool = False
+                                     ) -> pd.DataFrame:
+        """
+        Generates a schedule dataframe for calendars that trade around
+        the clock, in a single array operation. Each day starts at
+        midnight UTC and ends at midnight UTC of the next day. This
+        matches the 24/7 and 24/5 calendars of pandas_market_calendars,
+        where 24/5 trades on weekdays only.
+
+        Args:
+        ---------
+            start_date (Any):
+                The start date for the trading schedule.
+            end_date (Any):
+                The end date for the trading schedule.
+            weekdays_only (bool):
+                If True, weekends are excluded from the schedule, as in
+                24/5 calendars. Default is False.
+        Returns:
+        ---------
+            pd.DataFrame: A dataframe with trading dates and times.
+        """
+        first_day = np.datetime64(pd.Timestamp(start_date).date(), 'D')
+        last_day = np.datetime64(pd.Timestamp(end_date).date(), 'D')
+        days = np.arange(first_day, last_day + 1)
+        if weekdays_only:
+            days = days[np.is_busday(days)]
+
+        dates = pd.DatetimeIndex(days)
+        start = dates.tz_localize('UTC')
+        end = start + pd.Timedelta(days=1)
+        schedule_dataframe = pd.DataFrame({'start': start, 'end': end},
+                                          index=dates)
+
+        return schedule_dataframe
+
 
 class Resolution:
     """
@@ -266,6 +659,13 @@ class Resolution:
             return self.quantity == other.quantity and self.unit == other.unit
         return False
 
+    def __hash__(self):
+        """
+        Returns the hash of the resolution. Consistent with __eq__, so
+        that resolutions can be used in sets and as dictionary keys.
+        """
+        return hash((self.quantity, self.unit))
+
     def validate_resolution(self, quantity: int, unit: Unit):
         """
         Validates the resolution.
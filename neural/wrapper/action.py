@@ -400,7 +400,7 @@ class IntegerAssetQuantityActionWrapper(ActionWrapper):
 
 
 @action
-class PositionCloseActionWrapper:
+class PositionCloseActionWrapper(ActionWrapper):
     """
     Transition from long to short position and vice versa is a two step
     process. Close the current long/short position, and then open a new
@@ -0,0 +1,181 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from neural.data.alpaca import AlpacaDataType
+from neural.data.base import DataSchema, DatasetMetadata, StaticDataFeeder
+from neural.data.enums import AssetType, CalendarType
+from neural.env.base import TrainMarketEnv
+from neural.utils.time import Resolution
+
+from test_downloader import FakeAsset
+
+try:
+    from stable_baselines3 import PPO
+    from neural.env.batched import BatchedTrainMarketEnv
+except ImportError as exception:
+    raise unittest.SkipTest(
+        f'Batched environments require stable-baselines3: {exception}')
+
+
+class TestBatchedTrainMarketEnv(unittest.TestCase):
+
+    def setUp(self):
+        assets = [
+            FakeAsset(symbol, AssetType.STOCK, True, True)
+            for symbol in ('AAPL', 'MSFT', 'TSLA')
+        ]
+        self.metadata = DatasetMetadata(
+            data_schema=DataSchema(AlpacaDataType.BAR, assets),
+            resolution=Resolution(1, Resolution.Unit.HOUR),
+            calendar_type=CalendarType.TWENTY_FOUR_SEVEN,
+            start=pd.Timestamp('2023-01-02', tz='UTC'),
+            end=pd.Timestamp('2023-01-07', tz='UTC'))
+        self.array = np.random.default_rng(0).uniform(
+            1, 2, size=(self.metadata.n_rows,
+                        self.metadata.n_features)).astype(np.float32)
+        self.random_state = np.random.default_rng(1)
+
+    def get_data_feeder(self):
+        return StaticDataFeeder(metadata=self.metadata,
+                                datasets=[self.array],
+                                n_chunks=3)
+
+    def get_actions(self, n_envs):
+        actions = self.random_state.uniform(-100, 100, size=(n_envs, 3))
+        actions[self.random_state.uniform(size=actions.shape) < 0.5] = 0
+        return actions.astype(np.float32)
+
+    def get_equity(self, observation, market_env):
+        return observation['cash'][0] + np.dot(observation['asset_quantities'],
+                                               market_env.asset_prices)
+
+    def assert_observation(self, observation, reference_observation):
+        for key, value in reference_observation.items():
+            np.testing.assert_allclose(observation[key],
+                                       np.reshape(value, np.shape(
+                                           observation[key])),
+                                       rtol=1e-5,
+                                       atol=1e-5)
+
+    def assert_matches_envs(self, batched_env, market_envs, n_steps):
+        observations = batched_env.reset()
+        reference_observations = [
+            {key: np.array(value) for key, value in market_env.reset().items()}
+            for market_env in market_envs
+        ]
+        equities = [
+            self.get_equity(observation, market_env) for observation,
+            market_env in zip(reference_observations, market_envs)
+        ]
+        n_dones = 0
+
+        for _ in range(n_steps):
+            for index, reference_observation in enumerate(
+                    reference_observations):
+                self.assert_observation(
+                    {key: value[index]
+                     for key, value in observations.items()},
+                    reference_observation)
+
+            actions = self.get_actions(len(market_envs))
+            observations, rewards, dones, infos = batched_env.step(actions)
+
+            for index, market_env in enumerate(market_envs):
+                observation, _, done, _ = market_env.step(actions[index])
+                observation = {
+                    key: np.array(value)
+                    for key, value in observation.items()
+                }
+                equity = self.get_equity(observation, market_env)
+                self.assertEqual(dones[index], done)
+                self.assertAlmostEqual(rewards[index],
+                                       equity - equities[index],
+                                       delta=1e-2)
+
+                if done:
+                    n_dones += 1
+                    self.assert_observation(
+                        infos[index]['terminal_observation'], observation)
+                    observation = {
+                        key: np.array(value)
+                        for key, value in market_env.reset().items()
+                    }
+                    equity = self.get_equity(observation, market_env)
+
+                reference_observations[index] = observation
+                equities[index] = equity
+
+        return n_dones
+
+    def test_gathered_rows_match_envs(self):
+        data_feeders = self.get_data_feeder().split(n=4)
+        self.assertGreater(len({data_feeder.n_rows
+                                for data_feeder in data_feeders}), 1)
+        batched_env = BatchedTrainMarketEnv(data_feeders + data_feeders[:1],
+                                            block_size=5)
+        market_envs = [
+            TrainMarketEnv(data_feeder=data_feeder)
+            for data_feeder in (self.get_data_feeder().split(n=4) +
+                                self.get_data_feeder().split(n=4)[:1])
+        ]
+
+        n_dones = self.assert_matches_envs(batched_env, market_envs, 150)
+        self.assertGreater(n_dones, len(market_envs) * 2)
+
+    def test_shared_rows_match_envs(self):
+        batched_env = BatchedTrainMarketEnv([self.get_data_feeder()] * 3)
+        market_envs = [
+            TrainMarketEnv(data_feeder=self.get_data_feeder())
+            for _ in range(3)
+        ]
+
+        n_dones = self.assert_matches_envs(batched_env, market_envs, 200)
+        self.assertEqual(n_dones, 3)
+
+    def test_untraded_prices_are_not_used(self):
+        batched_env = BatchedTrainMarketEnv(self.get_data_feeder().split(n=2))
+        observations = batched_env.reset()
+        batched_env.asset_prices[:, 0] = np.nan
+
+        actions = np.array([[0, 100, -100], [0, 0, 50]])
+        batched_env.place_orders(actions)
+        np.testing.assert_array_equal(batched_env.asset_quantities[:, 0],
+                                      observations['asset_quantities'][:, 0])
+        self.assertTrue(np.isfinite(batched_env.asset_quantities).all())
+
+    def test_actions_are_clipped(self):
+        batched_env = BatchedTrainMarketEnv(self.get_data_feeder().split(n=2),
+                                            action_bound=10)
+        batched_env.reset()
+        np.testing.assert_array_equal(batched_env.action_space.high,
+                                      [10, 10, 10])
+
+        batched_env.place_orders(np.array([[100, -100, 5], [0, 0, -5]]))
+        np.testing.assert_allclose(batched_env.cash, [1e6 - 5, 1e6 + 5])
+
+        with self.assertRaises(ValueError):
+            BatchedTrainMarketEnv(self.get_data_feeder().split(n=2),
+                                  action_bound=np.inf)
+
+    def test_ppo_learns(self):
+        batched_env = BatchedTrainMarketEnv(self.get_data_feeder().split(n=4),
+                                            action_bound=100)
+        model = PPO('MultiInputPolicy',
+                    batched_env,
+                    n_steps=16,
+                    batch_size=32,
+                    n_epochs=1,
+                    seed=0)
+        model.learn(total_timesteps=128)
+        self.assertGreaterEqual(model.num_timesteps, 128)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,683 @@
+from copy import copy
+from dataclasses import dataclass
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+import h5py as h5
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from neural.data.alpaca import AlpacaAsset, AlpacaDataType
+from neural.data.base import (AbstractAsset, DataSchema, DatasetMetadata,
+                              RandomEpisodeDataFeeder, SharedMemoryDataset,
+                              StaticDataFeeder, TeeDataFeeder)
+from neural.data.enums import AssetType, CalendarType, FeatureType
+from neural.env.backtest import backtest
+from neural.env.base import TrainMarketEnv
+from neural.utils.time import Resolution
+
+from test_downloader import FakeAsset
+
+
+def sum_rows(data_feeder):
+    return sum(row.sum() for row in data_feeder.get_features_generator())
+
+
+@dataclass(frozen=True)
+class MarginFakeAsset(FakeAsset):
+
+    def get_maintenance_margins(self, prices, short):
+        return np.where(short, 1.5, 0.5) * np.ones_like(prices)
+
+
+class StaticDataFeederTest(unittest.TestCase):
+    asset_class = FakeAsset
+
+    def setUp(self):
+        assets = [
+            self.asset_class(symbol, AssetType.STOCK, True, True)
+            for symbol in ('AAPL', 'MSFT')
+        ]
+        self.metadata = DatasetMetadata(
+            data_schema=DataSchema(AlpacaDataType.BAR, assets),
+            resolution=Resolution(1, Resolution.Unit.HOUR),
+            calendar_type=CalendarType.TWENTY_FOUR_SEVEN,
+            start=pd.Timestamp('2023-01-02', tz='UTC'),
+            end=pd.Timestamp('2023-01-07', tz='UTC'))
+        self.array = np.arange(self.metadata.n_rows *
+                               self.metadata.n_features,
+                               dtype=np.float32).reshape(
+                                   self.metadata.n_rows, -1)
+        self.data_feeder = StaticDataFeeder(metadata=self.metadata,
+                                            datasets=[self.array],
+                                            n_chunks=3)
+
+
+class TestIndexToDates(StaticDataFeederTest):
+
+    def get_metadata(self, calendar_type, start, end):
+        return DatasetMetadata(data_schema=self.metadata.data_schema,
+                               resolution=Resolution(30,
+                                                     Resolution.Unit.MINUTE),
+                               calendar_type=calendar_type,
+                               start=pd.Timestamp(start),
+                               end=pd.Timestamp(end))
+
+    def linear_index_to_date(self, metadata, index):
+        day_index = (index < metadata.cumulative_daily_rows).argmax()
+        return metadata.schedule['start'].iloc[day_index]
+
+    def test_matches_linear_lookup(self):
+        stock_metadata = self.get_metadata(
+            CalendarType.NEW_YORK_STOCK_EXCHANGE, '2023-11-20 14:30Z',
+            '2023-11-29 21:00Z')
+        weekday_metadata = self.get_metadata(CalendarType.TWENTY_FOUR_FIVE,
+                                             '2023-01-05 00:00Z',
+                                             '2023-01-12 00:00Z')
+        for metadata in (self.metadata, stock_metadata, weekday_metadata):
+            indices = np.arange(metadata.n_rows)
+            dates = metadata.index_to_dates(indices)
+
+            expected_dates = [
+                self.linear_index_to_date(metadata, index)
+                for index in indices
+            ]
+            self.assertEqual(list(dates), expected_dates)
+            self.assertEqual(
+                [metadata.index_to_date(index) for index in indices],
+                expected_dates)
+
+        # Thanksgiving is skipped and the half day after it has 7 rows.
+        self.assertEqual(
+            list(np.diff(stock_metadata.cumulative_daily_rows, prepend=0)),
+            [13, 13, 13, 7, 13, 13, 13])
+        self.assertEqual(
+            list(np.diff(weekday_metadata.cumulative_daily_rows,
+                         prepend=0)), [48] * 6)
+        self.assertEqual(weekday_metadata.index_to_date(96),
+                         pd.Timestamp('2023-01-09', tz='UTC'))
+
+
+class TestPrefetching(StaticDataFeederTest):
+
+    def setUp(self):
+        super().setUp()
+        self.hdf5_file = h5.File('prefetch.h5',
+                                 'w',
+                                 driver='core',
+                                 backing_store=False)
+        self.hdf5_file.create_dataset('BARS', data=self.array[:, 7:])
+        self.datasets = [self.array[:, :7], self.hdf5_file['BARS']]
+
+    def tearDown(self):
+        self.hdf5_file.close()
+
+    def get_data_feeder(self, n_chunks=12, prefetch_depth=2):
+        return StaticDataFeeder(metadata=self.metadata,
+                                datasets=self.datasets,
+                                n_chunks=n_chunks,
+                                prefetch_depth=prefetch_depth)
+
+    def get_loader_threads(self, threads):
+        return [
+            thread for thread in threading.enumerate()
+            if thread not in threads
+        ]
+
+    def test_prefetched_rows_are_in_order(self):
+        for prefetch_depth in (1, 2, 5):
+            data_feeder = self.get_data_feeder(prefetch_depth=prefetch_depth)
+            rows = np.stack(
+                [row.copy() for row in data_feeder.get_features_generator()])
+            np.testing.assert_array_equal(rows, self.array)
+
+    def test_loader_exception_is_raised(self):
+        data_feeder = self.get_data_feeder()
+        load_chunk = data_feeder._load_chunk
+
+        def failing_load_chunk(start, end, buffer):
+            if start >= 48:
+                raise OSError('Unreadable chunk.')
+            return load_chunk(start, end, buffer)
+
+        data_feeder._load_chunk = failing_load_chunk
+        rows = list()
+        with self.assertRaises(OSError):
+            for row in data_feeder.get_features_generator():
+                rows.append(row.copy())
+
+        np.testing.assert_array_equal(np.stack(rows), self.array[:48])
+
+    def test_loader_thread_stops_on_close(self):
+        threads = threading.enumerate()
+        data_feeder = self.get_data_feeder(prefetch_depth=1)
+        features_generator = data_feeder.get_features_generator()
+        next(features_generator)
+        self.assertEqual(len(self.get_loader_threads(threads)), 1)
+
+        features_generator.close()
+        deadline = time.monotonic() + 5
+        while (self.get_loader_threads(threads)
+               and time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(self.get_loader_threads(threads), [])
+
+
+class TestChunkBuffers(StaticDataFeederTest):
+
+    def get_data_feeder(self, prefetch_depth):
+        return StaticDataFeeder(
+            metadata=self.metadata,
+            datasets=[self.array[:, :7], self.array[:, 7:]],
+            n_chunks=12,
+            prefetch_depth=prefetch_depth)
+
+    def test_buffer_counts(self):
+        chunk_edge_indices = np.arange(0, 145, 12)
+        for prefetch_depth, n_buffers in ((0, 2), (1, 4), (3, 6), (20, 12)):
+            data_feeder = self.get_data_feeder(prefetch_depth)
+            self.assertEqual(
+                len(data_feeder._get_chunk_buffers(chunk_edge_indices)),
+                n_buffers)
+
+        self.assertEqual(
+            self.data_feeder._get_chunk_buffers(chunk_edge_indices), [])
+
+    def test_previous_chunk_stays_valid(self):
+        for prefetch_depth in (0, 1, 3):
+            data_feeder = self.get_data_feeder(prefetch_depth)
+            previous_rows, rows = list(), list()
+
+            for index, row in enumerate(
+                    data_feeder.get_features_generator()):
+                if index and index % 12 == 0:
+                    previous_rows, rows = rows, list()
+                    # gives the loader time to fill all free buffers.
+                    time.sleep(0.05)
+                rows.append(row)
+                if previous_rows:
+                    np.testing.assert_array_equal(
+                        np.stack(previous_rows),
+                        self.array[index // 12 * 12 - 12:index // 12 * 12])
+                np.testing.assert_array_equal(
+                    np.stack(rows), self.array[index // 12 * 12:index + 1])
+
+
+class TestFeatureBlocks(StaticDataFeederTest):
+
+    def test_blocks_are_cut_at_chunk_edges(self):
+        blocks = [
+            block.copy()
+            for block in self.data_feeder.get_feature_blocks(block_size=10)
+        ]
+
+        self.assertEqual([len(block) for block in blocks],
+                         [10, 10, 10, 10, 8] * 3)
+        np.testing.assert_array_equal(np.concatenate(blocks), self.array)
+        self.assertEqual(self.data_feeder.index, 143)
+
+        with self.assertRaises(ValueError):
+            next(self.data_feeder.get_feature_blocks(block_size=0))
+
+    def test_block_env_matches_row_env(self):
+        market_envs = [
+            TrainMarketEnv(data_feeder=StaticDataFeeder(
+                metadata=self.metadata, datasets=[self.array], n_chunks=3),
+                           block_size=block_size) for block_size in (None, 10)
+        ]
+        random_state = np.random.RandomState(0)
+
+        for _ in range(2):
+            row_observation, block_observation = (
+                market_env.reset() for market_env in market_envs)
+            n_steps = 0
+            while True:
+                for key in row_observation:
+                    np.testing.assert_array_equal(block_observation[key],
+                                                  row_observation[key])
+                self.assertEqual(market_envs[1].index, market_envs[0].index)
+                self.assertEqual(market_envs[1].done, market_envs[0].done)
+                if market_envs[0].done:
+                    break
+
+                actions = random_state.uniform(-100, 100, 2)
+                (row_observation, _, _, _), (block_observation, _, _, _) = (
+                    market_env.step(actions) for market_env in market_envs)
+                n_steps += 1
+
+            self.assertEqual(n_steps, 143)
+
+
+class TestRandomEpisodes(StaticDataFeederTest):
+
+    def setUp(self):
+        super().setUp()
+        self.day_edge_indices = np.concatenate(
+            [[0], self.metadata.cumulative_daily_rows]).tolist()
+
+    def get_windows(self, data_feeder, n_windows=30):
+        windows = list()
+        for _ in range(n_windows):
+            rows = np.stack(
+                [row.copy() for row in data_feeder.get_features_generator()])
+            start_index = data_feeder.start_index
+            end_index = data_feeder.end_index
+            np.testing.assert_array_equal(rows,
+                                          self.array[start_index:end_index])
+            windows.append((start_index, end_index))
+        return windows
+
+    def assert_day_aligned(self, windows, n_days, start_index, end_index):
+        for window_start, window_end in windows:
+            self.assertIn(window_start, self.day_edge_indices)
+            self.assertIn(window_end, self.day_edge_indices)
+            self.assertEqual(
+                self.day_edge_indices.index(window_end) -
+                self.day_edge_indices.index(window_start), n_days)
+            self.assertGreaterEqual(window_start, start_index)
+            self.assertLessEqual(window_end, end_index)
+
+    def test_windows_are_day_aligned(self):
+        data_feeder = RandomEpisodeDataFeeder.from_data_feeder(
+            self.data_feeder, n_days=2, seed=0)
+        windows = self.get_windows(data_feeder)
+
+        self.assert_day_aligned(windows, 2, 0, 144)
+        self.assertEqual(len(set(windows)), 5)
+
+        with self.assertRaises(ValueError):
+            RandomEpisodeDataFeeder.from_data_feeder(self.data_feeder,
+                                                     n_days=7)
+
+    def test_windows_are_reproducible(self):
+        windows = [
+            self.get_windows(
+                RandomEpisodeDataFeeder.from_data_feeder(self.data_feeder,
+                                                         n_days=1,
+                                                         seed=seed))
+            for seed in (0, 0, 1)
+        ]
+
+        self.assertEqual(windows[0], windows[1])
+        self.assertNotEqual(windows[0], windows[2])
+
+    def test_split_windows_stay_in_ranges(self):
+        split_windows = [[
+            self.get_windows(data_feeder) for data_feeder in
+            RandomEpisodeDataFeeder.from_data_feeder(
+                self.data_feeder, n_days=2, seed=0).split(n=2)
+        ] for _ in range(2)]
+
+        self.assertEqual(split_windows[0], split_windows[1])
+        for windows, (start_index, end_index) in zip(split_windows[0],
+                                                     [(0, 72), (72, 144)]):
+            self.assert_day_aligned(windows, 2, start_index, end_index)
+            self.assertEqual(len(set(windows)), 2)
+
+
+class TestSharedMemoryDataFeeder(StaticDataFeederTest):
+
+    def test_shared_rows_match_dataset(self):
+        _, test_data_feeder = self.data_feeder.split(n=0.5)
+        shared_data_feeder = test_data_feeder.to_shared_memory()
+
+        rows = np.stack(list(shared_data_feeder.get_features_generator()))
+        np.testing.assert_array_equal(
+            rows, self.array[test_data_feeder.start_index:])
+
+    def test_unpickled_dataset_attaches_to_block(self):
+        shared_data_feeder = self.data_feeder.to_shared_memory()
+        shared_dataset = shared_data_feeder.datasets[0]
+        attached_dataset = pickle.loads(pickle.dumps(shared_dataset))
+
+        self.assertIsInstance(attached_dataset, SharedMemoryDataset)
+        self.assertEqual(attached_dataset.name, shared_dataset.name)
+        shared_dataset[0:1][0, 0] = -1
+        self.assertEqual(attached_dataset[0:1][0, 0], -1)
+
+    def test_attached_block_is_not_tracked(self):
+        with mock.patch('neural.data.base.resource_tracker.unregister'
+                        ) as unregister:
+            shared_data_feeder = self.data_feeder.to_shared_memory()
+            shared_dataset = shared_data_feeder.datasets[0]
+            unregister.assert_not_called()
+
+            pickle.loads(pickle.dumps(shared_dataset))
+        unregister.assert_called_once_with(
+            shared_dataset._shared_memory._name, 'shared_memory')
+
+    def test_subprocesses_read_shared_rows(self):
+        shared_data_feeder = self.data_feeder.to_shared_memory()
+        data_feeders = shared_data_feeder.split(n=2)
+
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(2) as pool:
+            sums = pool.map(sum_rows, data_feeders)
+
+        self.assertEqual(sum(sums), self.array.sum())
+
+
+class TestColumnProjection(StaticDataFeederTest):
+
+    def test_projected_rows_match_dataset(self):
+        columns = [1, 3, 8, 9, 10]
+        datasets = [self.array[:, :7], self.array[:, 7:]]
+        data_feeder = StaticDataFeeder(metadata=self.metadata,
+                                       datasets=datasets,
+                                       n_chunks=3,
+                                       columns=columns)
+
+        rows = np.stack(
+            [row.copy() for row in data_feeder.get_features_generator()])
+        np.testing.assert_array_equal(rows, self.array[:, columns])
+
+        shared_data_feeder = data_feeder.to_shared_memory()
+        rows = np.stack(list(shared_data_feeder.get_features_generator()))
+        np.testing.assert_array_equal(rows, self.array[:, columns])
+
+    def test_env_prices_are_remapped(self):
+        data_schema = self.metadata.data_schema
+        msft = data_schema.assets[1]
+        columns = np.logical_and(
+            data_schema.get_assets_mask([msft]),
+            np.logical_or(
+                data_schema.get_features_mask(FeatureType.ASSET_CLOSE_PRICE),
+                data_schema.get_features_mask(FeatureType.ASSET_HIGH_PRICE)))
+        data_feeder = StaticDataFeeder(metadata=self.metadata,
+                                       datasets=[self.array],
+                                       columns=columns)
+
+        market_env = TrainMarketEnv(data_feeder=data_feeder)
+        market_env.reset()
+
+        self.assertEqual(market_env.n_features, 2)
+        self.assertEqual(market_env.assets, [msft])
+        close_column = np.flatnonzero(
+            np.logical_and(columns, data_schema.asset_prices_mask))
+        np.testing.assert_array_equal(market_env.asset_prices,
+                                      self.array[0, close_column])
+
+
+class TestAssetSubsets(StaticDataFeederTest):
+
+    def test_subset_rows_match_dataset(self):
+        msft = self.metadata.assets[1]
+        self.data_feeder.set_assets([msft])
+
+        rows = np.stack(
+            [row.copy() for row in self.data_feeder.get_features_generator()])
+        np.testing.assert_array_equal(rows, self.array[:, 7:])
+        self.assertEqual(self.data_feeder.assets, [msft])
+
+        self.data_feeder.set_assets(None)
+        self.assertEqual(self.data_feeder.n_features, 14)
+
+    def test_env_draws_subsets(self):
+        market_env = TrainMarketEnv(data_feeder=self.data_feeder,
+                                    episode_assets=1,
+                                    seed=0)
+        assets = market_env.assets
+        close_columns = np.flatnonzero(self.metadata.asset_prices_mask)
+
+        symbols = set()
+        for _ in range(10):
+            market_env.reset()
+            index = self.metadata.assets.index(market_env.assets[0])
+            self.assertIs(market_env.assets, assets)
+            self.assertEqual(market_env.n_features, 7)
+            np.testing.assert_array_equal(
+                market_env.asset_prices,
+                self.array[0, [close_columns[index]]])
+            symbols.add(market_env.assets[0].symbol)
+
+        self.assertEqual(symbols, {'AAPL', 'MSFT'})
+        self.assertEqual(self.data_feeder.n_features, 14)
+
+
+class TestPreallocatedObservation(StaticDataFeederTest):
+
+    def test_observation_does_not_alias_state(self):
+        market_env = TrainMarketEnv(data_feeder=self.data_feeder,
+                                    preallocate_observation=True)
+        observation = market_env.reset()
+        observation['cash'] /= 2
+
+        self.assertEqual(market_env.cash[0], market_env.initial_cash)
+        np.testing.assert_array_equal(observation['features'], self.array[0])
+
+    def test_copied_observations_stay_valid(self):
+        market_env = TrainMarketEnv(data_feeder=self.data_feeder,
+                                    preallocate_observation=True,
+                                    copy_observation=True)
+        actions = np.zeros(market_env.n_assets)
+        observations = [market_env.reset()]
+        observations += [market_env.step(actions)[0] for _ in range(3)]
+
+        features = np.stack(
+            [observation['features'] for observation in observations])
+        np.testing.assert_array_equal(features, self.array[:4])
+
+
+class TestPlaceOrders(StaticDataFeederTest):
+
+    def loop_place_orders(self, market_env, actions):
+        cash = market_env.cash.copy()
+        asset_quantities = market_env.asset_quantities.copy()
+        holds = market_env.holds.copy()
+        for asset, action in enumerate(actions):
+            if action == 0:
+                continue
+            asset_quantities[asset] += action / market_env.asset_prices[asset]
+            cash -= action
+            holds[asset] = 0
+        return cash, asset_quantities, holds
+
+    def test_orders_match_loop(self):
+        market_env = TrainMarketEnv(data_feeder=self.data_feeder)
+        market_env.reset()
+        random_state = np.random.RandomState(0)
+        for _ in range(50):
+            actions = (random_state.randint(-1, 2, 2) *
+                       random_state.rand(2) * 100).astype(np.float32)
+            cash, asset_quantities, holds = self.loop_place_orders(
+                market_env, actions)
+
+            market_env.place_orders(actions)
+            np.testing.assert_allclose(market_env.cash, cash, rtol=1e-6)
+            np.testing.assert_array_equal(market_env.asset_quantities,
+                                          asset_quantities)
+            np.testing.assert_array_equal(market_env.holds, holds)
+            market_env.update()
+
+    def test_zero_actions_leave_account_untouched(self):
+        market_env = TrainMarketEnv(data_feeder=self.data_feeder)
+        market_env.reset()
+        for _ in range(3):
+            market_env.step(np.array([100, -50], dtype=np.float32))
+        cash = market_env.cash.copy()
+        asset_quantities = market_env.asset_quantities.copy()
+        holds = market_env.holds.copy()
+
+        market_env.place_orders(np.zeros(2))
+        np.testing.assert_array_equal(market_env.cash, cash)
+        np.testing.assert_array_equal(market_env.asset_quantities,
+                                      asset_quantities)
+        np.testing.assert_array_equal(market_env.holds, holds)
+        self.assertTrue((holds > 0).all())
+
+    def test_untraded_prices_are_not_used(self):
+        market_env = TrainMarketEnv(data_feeder=self.data_feeder)
+        market_env.reset()
+        market_env.asset_prices[0] = np.nan
+
+        market_env.place_orders(np.array([0, 100], dtype=np.float32))
+        self.assertEqual(market_env.asset_quantities[0], 0)
+        self.assertTrue(np.isfinite(market_env.asset_quantities).all())
+        self.assertTrue(np.isfinite(market_env.cash).all())
+
+
+class TestMaintenanceMargins(unittest.TestCase):
+
+    def test_margins_match_scalar(self):
+        prices = np.array([0.5, 2.49, 2.5, 2.51, 4.99, 5, 5.01, 10, 100])
+        short = np.array([False, True])
+        for marginable in (True, False):
+            for maintenance_margin in (None, 0.2, 0.6, 1.2, 2.0):
+                asset = AlpacaAsset('AAPL', AssetType.STOCK, True, marginable,
+                                    maintenance_margin, True, True)
+                margins = [[
+                    asset.get_maintenance_margin(price, position_short)
+                    for price in prices
+                ] for position_short in short]
+
+                np.testing.assert_allclose(
+                    asset.get_maintenance_margins(prices, short[:, None]),
+                    margins)
+                np.testing.assert_allclose(
+                    AbstractAsset.get_maintenance_margins(
+                        asset, prices, short[:, None]), margins)
+
+    def test_nonmarginable_assets_cannot_be_shorted(self):
+        asset = AlpacaAsset('BTC/USD', AssetType.CRYPTOCURRENCY, True, False,
+                            shortable=True, easy_to_borrow=True)
+        self.assertFalse(asset.shortable)
+        self.assertFalse(asset.easy_to_borrow)
+
+        asset = AlpacaAsset('AAPL', AssetType.STOCK, True, True, 0.3,
+                            shortable=True, easy_to_borrow=False)
+        self.assertTrue(asset.shortable)
+        self.assertFalse(asset.easy_to_borrow)
+
+
+class TestBacktest(StaticDataFeederTest):
+    asset_class = MarginFakeAsset
+
+    def setUp(self):
+        super().setUp()
+        random_state = np.random.RandomState(0)
+        self.actions = (random_state.randint(-1, 2, (60, 2)) *
+                        random_state.rand(60, 2) * 100).astype(np.float32)
+        self.actions[10:20] = 0
+
+    def test_history_matches_env(self):
+        market_env = TrainMarketEnv(data_feeder=self.data_feeder)
+        market_env.reset()
+        states = [(market_env.cash.copy(),
+                   market_env.asset_quantities.copy(),
+                   market_env.holds.copy())]
+        for actions in self.actions:
+            market_env.step(actions)
+            states.append((market_env.cash.copy(),
+                           market_env.asset_quantities.copy(),
+                           market_env.holds.copy()))
+        cash, asset_quantities, holds = map(np.stack, zip(*states))
+
+        history = backtest(self.data_feeder, self.actions)
+
+        np.testing.assert_array_equal(history['cash'], cash[:, 0])
+        np.testing.assert_array_equal(history['asset_quantities'],
+                                      asset_quantities)
+        np.testing.assert_array_equal(history['holds'], holds)
+        np.testing.assert_allclose(
+            history['equity'],
+            cash[:, 0] + (asset_quantities * history['asset_prices']).sum(1),
+            rtol=1e-6)
+
+    def test_policies_are_evaluated_together(self):
+        actions = np.stack([self.actions, -self.actions])
+        history = backtest(self.data_feeder, actions)
+
+        self.assertEqual(history['holds'].shape, (2, 61, 2))
+        self.assertEqual(history['sharpe'].shape, (2, ))
+        for index in range(2):
+            np.testing.assert_array_equal(
+                history['excess_margin'][index],
+                backtest(self.data_feeder, actions[index])['excess_margin'])
+
+
+class TestTeeDataFeeder(StaticDataFeederTest):
+
+    def test_envs_share_one_pass(self):
+        passes = []
+        get_features_generator = self.data_feeder.get_features_generator
+
+        def counted_features_generator():
+            passes.append(None)
+            return get_features_generator()
+
+        self.data_feeder.get_features_generator = counted_features_generator
+        tee_data_feeder = TeeDataFeeder(self.data_feeder, n_branches=2)
+        market_envs = [
+            TrainMarketEnv(data_feeder=tee_data_feeder) for _ in range(2)
+        ]
+        actions = np.zeros(2)
+
+        for _ in range(2):
+            observations = [market_env.reset() for market_env in market_envs]
+            features = [[observation['features'].copy()]
+                        for observation in observations]
+            while not tee_data_feeder.done:
+                for market_env, env_features in zip(market_envs, features):
+                    observation, _, _, _ = market_env.step(actions)
+                    env_features.append(observation['features'].copy())
+
+            for env_features in features:
+                np.testing.assert_array_equal(np.stack(env_features),
+                                              self.array)
+
+        self.assertEqual(len(passes), 2)
+
+    def test_envs_share_asset_subsets(self):
+        tee_data_feeder = TeeDataFeeder(copy(self.data_feeder), n_branches=2)
+        market_envs = [
+            TrainMarketEnv(data_feeder=tee_data_feeder,
+                           episode_assets=1,
+                           seed=0) for _ in range(2)
+        ]
+        actions = np.zeros(1)
+
+        symbols = set()
+        for _ in range(6):
+            observations = [market_env.reset() for market_env in market_envs]
+            self.assertEqual(market_envs[0].assets, market_envs[1].assets)
+            features = [[observation['features'].copy()]
+                        for observation in observations]
+            while not tee_data_feeder.done:
+                for market_env, env_features in zip(market_envs, features):
+                    observation, _, _, _ = market_env.step(actions)
+                    env_features.append(observation['features'].copy())
+
+            index = self.metadata.assets.index(market_envs[0].assets[0])
+            for env_features in features:
+                np.testing.assert_array_equal(
+                    np.stack(env_features),
+                    self.array[:, 7 * index:7 * (index + 1)])
+            symbols.add(market_envs[0].assets[0].symbol)
+
+        self.assertEqual(symbols, {'AAPL', 'MSFT'})
+        self.assertEqual(self.data_feeder.n_features, 14)
+
+    def test_pass_assets_cannot_change(self):
+        aapl, msft = self.metadata.assets
+        tee_data_feeder = TeeDataFeeder(self.data_feeder, n_branches=2)
+        tee_data_feeder.set_assets([aapl])
+        tee_data_feeder.get_features_generator()
+
+        tee_data_feeder.set_assets([aapl])
+        with self.assertRaises(ValueError):
+            tee_data_feeder.set_assets([msft])
+        tee_data_feeder.get_features_generator()
+        tee_data_feeder.set_assets([msft])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,847 @@
+from dataclasses import dataclass, replace
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+import unittest
+from unittest import mock
+
+import dill
+import h5py as h5
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from neural.data.alpaca import (AlpacaDataDownloader, AlpacaDataProcessor,
+                                AlpacaDataType)
+from neural.common.exceptions import CorruptDataError
+from neural.data.base import AbstractAsset, DataSchema
+from neural.data.enums import AssetType
+from neural.utils.io import (DownloadCache, HDF5Writer, deserialize_metadata,
+                             from_checkpoint, from_hdf5, from_memmap,
+                             hdf5_to_memmap, migrate_hdf5_metadata,
+                             migrate_memmap_metadata, serialize_metadata,
+                             to_hdf5, to_memmap)
+from neural.utils.benchmark import _rewrite_hdf5_file, benchmark_hdf5_layouts
+from neural.utils.time import Resolution
+
+
+@dataclass(frozen=True)
+class FakeAsset(AbstractAsset):
+    marginable: bool
+
+
+class FakeDataClient:
+    """
+    Stands in for AlpacaDataClient. Only resolves symbols to assets,
+    since downloads are served by FakeDataDownloader.
+    """
+
+    def symbols_to_assets(self, symbols):
+        return [
+            FakeAsset(symbol=symbol,
+                      asset_type=AssetType.STOCK,
+                      fractionable=True,
+                      marginable=False) for symbol in symbols
+        ]
+
+
+class StubDataClient(FakeDataClient):
+    """
+    Stands in for AlpacaDataClient when downloads go through
+    AlpacaDataDownloader.download_dataset. Serves synthetic bars for
+    every interval in the requested range, including hours between
+    market days, and counts the requests made.
+    """
+
+    def __init__(self):
+        self.n_calls = 0
+        self.requested_symbols = list()
+        self.returned_rows = list()
+
+    def get_downloader_and_request(self, data_type, asset_type):
+
+        def request(symbol_or_symbols, timeframe, start, end):
+            return SimpleNamespace(symbols=symbol_or_symbols,
+                                   start=start,
+                                   end=end)
+
+        def downloader(request):
+            self.n_calls += 1
+            self.requested_symbols.append(request.symbols)
+            timestamps = pd.date_range(start=request.start,
+                                       end=request.end,
+                                       freq='30min')
+            index = pd.MultiIndex.from_product([request.symbols, timestamps],
+                                               names=['symbol', 'timestamp'])
+            columns = AlpacaDataType.BAR.column_schema.keys()
+            minutes = index.get_level_values('timestamp').asi8 // (60 * 10**9)
+            values = np.add.outer(minutes % 100_000, np.arange(len(columns)))
+            dataset = pd.DataFrame(values.astype(np.float64),
+                                   index=index,
+                                   columns=columns)
+            self.returned_rows.append(len(dataset))
+            return SimpleNamespace(df=dataset)
+
+        return downloader, request
+
+
+class FakeDataDownloader(AlpacaDataDownloader):
+    """
+    Serves deterministic synthetic bars for each day instead of calling
+    the Alpaca API. Each request sleeps for a random duration so that
+    concurrent requests complete out of calendar order.
+    """
+
+    def __init__(self, data_client, fail_on=None, sparse_on=None):
+        super().__init__(data_client=data_client)
+        self.fail_on = fail_on
+        self.sparse_on = sparse_on
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def download_dataset(self, dataset_type, asset_type, symbols, resolution,
+                         start, end):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            seed = pd.Timestamp(start).value // 10**9
+            random_state = np.random.RandomState(seed % 2**32)
+            time.sleep(random_state.uniform(0, 0.02))
+            if self.fail_on is not None and pd.Timestamp(
+                    start).date() == pd.Timestamp(self.fail_on).date():
+                raise KeyError(f'No data in requested range {start}-{end}')
+
+            timestamps = pd.date_range(start=start,
+                                       end=end,
+                                       freq=resolution.pandas_timedelta,
+                                       inclusive='left')
+            if self.sparse_on is not None and pd.Timestamp(
+                    start).date() == pd.Timestamp(self.sparse_on).date():
+                timestamps = timestamps[::2]
+            index = pd.MultiIndex.from_product([symbols, timestamps],
+                                               names=['symbol', 'timestamp'])
+            columns = AlpacaDataType.BAR.column_schema.keys()
+            values = random_state.uniform(1, 100, (len(index), len(columns)))
+            dataset = pd.DataFrame(values, index=index, columns=columns)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        return dataset
+
+
+class TestConcurrentDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.symbols = ['AAPL', 'MSFT', 'GOOG']
+        self.resolution = Resolution(30, Resolution.Unit.MINUTE)
+        self.start_date = '2023-01-03'
+        self.end_date = '2023-01-31'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def download(self, file_name, n_workers, **kwargs):
+        file_path = os.path.join(self.directory.name, file_name)
+        downloader = FakeDataDownloader(data_client=FakeDataClient(),
+                                        **kwargs)
+        downloader.download_to_hdf5(file_path=file_path,
+                                    dataset_name='BARS',
+                                    dataset_type=AlpacaDataType.BAR,
+                                    symbols=self.symbols,
+                                    resolution=self.resolution,
+                                    start_date=self.start_date,
+                                    end_date=self.end_date,
+                                    n_workers=n_workers,
+                                    row_budget=1)
+        return downloader, file_path
+
+    def test_concurrent_matches_sequential(self):
+        _, sequential_path = self.download('sequential.h5', n_workers=1)
+        downloader, concurrent_path = self.download('concurrent.h5',
+                                                    n_workers=4)
+
+        self.assertGreater(downloader.max_in_flight, 1)
+        self.assertLessEqual(downloader.max_in_flight, 4)
+
+        sequential_metadata, sequential_datasets = from_hdf5(
+            sequential_path, 'BARS')
+        concurrent_metadata, concurrent_datasets = from_hdf5(
+            concurrent_path, 'BARS')
+
+        self.assertEqual(concurrent_metadata.start,
+                         sequential_metadata.start)
+        self.assertEqual(concurrent_metadata.end, sequential_metadata.end)
+        self.assertEqual(concurrent_metadata.n_rows,
+                         sequential_metadata.n_rows)
+        np.testing.assert_array_equal(concurrent_datasets[0][:],
+                                      sequential_datasets[0][:])
+
+    def test_failed_day_keeps_preceding_days(self):
+        with self.assertRaises(KeyError):
+            self.download('failed.h5', n_workers=4, fail_on='2023-01-10')
+
+        file_path = os.path.join(self.directory.name, 'failed.h5')
+        dataset_metadata, _ = from_hdf5(file_path, 'BARS')
+        self.assertEqual(
+            pd.Timestamp(dataset_metadata.end).date(),
+            pd.Timestamp('2023-01-09').date())
+
+    def test_processing_statistics_are_per_day(self):
+        descriptions = list()
+        progress_bar = mock.MagicMock()
+        progress_bar.set_description.side_effect = descriptions.append
+        with mock.patch('neural.data.alpaca.progress_bar',
+                        return_value=progress_bar):
+            self.download('sparse.h5', n_workers=4, sparse_on='2023-01-10')
+
+        dense_description = 'low:100%/high:100%/mean:100%'
+        self.assertEqual(len(descriptions), 20)
+        self.assertEqual(descriptions[:5], [dense_description] * 5)
+        self.assertNotEqual(descriptions[5], dense_description)
+        self.assertEqual(descriptions[6:], [dense_description] * 14)
+
+    def test_invalid_n_workers(self):
+        with self.assertRaises(ValueError):
+            self.download('invalid.h5', n_workers=0)
+
+
+class TestReindexAndForwardFill(unittest.TestCase):
+
+    def setUp(self):
+        self.symbols = ['AAPL', 'GOOG', 'MSFT']
+        self.resolution = Resolution(30, Resolution.Unit.MINUTE)
+        self.open = pd.Timestamp('2023-01-03 14:30', tz='UTC')
+        self.close = pd.Timestamp('2023-01-03 21:00', tz='UTC')
+
+        timestamps = pd.date_range(start=self.open - pd.Timedelta(hours=1),
+                                   end=self.close + pd.Timedelta(hours=1),
+                                   freq='15min')
+        index = pd.MultiIndex.from_product([self.symbols, timestamps],
+                                           names=['symbol', 'timestamp'])
+        columns = list(AlpacaDataType.BAR.column_schema.keys())
+        values = np.random.RandomState(0).uniform(1, 100,
+                                                  (len(index), len(columns)))
+        dataset = pd.DataFrame(values, index=index, columns=columns)
+        dataset['exchange'] = 'NASDAQ'
+
+        # leading gap of AAPL, inner gaps of GOOG, missing values of MSFT
+        times = dataset.index.get_level_values('timestamp')
+        symbols = dataset.index.get_level_values('symbol')
+        dropped = (((symbols == 'AAPL') & (times < self.open +
+                                           pd.Timedelta(hours=2))) |
+                   ((symbols == 'GOOG') & (times.hour % 2 == 1)))
+        dataset = dataset[~dropped]
+        dataset.loc[('MSFT', self.open), 'close'] = np.nan
+        dataset.loc[('MSFT', self.open + pd.Timedelta(hours=1)),
+                    ['open', 'high']] = np.nan
+        self.dataset = dataset
+
+    def reindex_per_symbol(self, dataset, data_processor):
+        dataset = dataset.reindex(index=pd.MultiIndex.from_product(
+            [self.symbols, dataset.index.levels[1]]))
+        dataset = dataset.reset_index(level=0, names='symbol')
+
+        symbol_groups = list()
+        for symbol, group in dataset.groupby('symbol'):
+            group = group.select_dtypes(include=np.number)
+            symbol_groups.append(
+                data_processor.reindex_and_forward_fill(
+                    dataset=group,
+                    open=self.open,
+                    close=self.close,
+                    resolution=self.resolution))
+        return pd.concat(symbol_groups, axis=1)
+
+    def test_matches_per_symbol_processing(self):
+        data_processor = AlpacaDataProcessor()
+        processed = data_processor.reindex_and_forward_fill_symbols(
+            dataset=self.dataset,
+            symbols=self.symbols,
+            open=self.open,
+            close=self.close,
+            resolution=self.resolution)
+        per_symbol_data_processor = AlpacaDataProcessor()
+        expected = self.reindex_per_symbol(self.dataset,
+                                           per_symbol_data_processor)
+
+        self.assertEqual(processed.shape, (13, 21))
+        self.assertFalse(processed.isna().any().any())
+        np.testing.assert_array_equal(processed.index, expected.index)
+        np.testing.assert_array_equal(processed.to_numpy(),
+                                      expected.to_numpy())
+        leading_rows = processed['AAPL'].iloc[:5].to_numpy()
+        np.testing.assert_array_equal(leading_rows,
+                                      leading_rows[[4, 4, 4, 4, 4]])
+
+        # densities are computed over numerical columns of each symbol
+        statistics = data_processor.processing_statistics
+        expected_statistics = per_symbol_data_processor.processing_statistics
+        self.assertEqual(statistics.count, 3)
+        self.assertAlmostEqual(statistics.minimum,
+                               expected_statistics.minimum)
+        self.assertAlmostEqual(statistics.maximum,
+                               expected_statistics.maximum)
+        self.assertAlmostEqual(statistics.mean, expected_statistics.mean)
+        self.assertAlmostEqual(statistics.minimum, 7 / 13)
+
+
+class StubDownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.symbols = ['AAPL', 'MSFT', 'GOOG']
+        self.resolution = Resolution(30, Resolution.Unit.MINUTE)
+        self.start_date = '2023-01-03'
+        self.end_date = '2023-01-31'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def download(self,
+                 file_name,
+                 row_budget,
+                 end_date=None,
+                 cache=None,
+                 symbols=None,
+                 data_client=None):
+        file_path = os.path.join(self.directory.name, file_name)
+        data_client = data_client or StubDataClient()
+        downloader = AlpacaDataDownloader(data_client=data_client,
+                                          cache=cache)
+        downloader.download_to_hdf5(file_path=file_path,
+                                    dataset_name='BARS',
+                                    dataset_type=AlpacaDataType.BAR,
+                                    symbols=symbols or self.symbols,
+                                    resolution=self.resolution,
+                                    start_date=self.start_date,
+                                    end_date=end_date or self.end_date,
+                                    row_budget=row_budget)
+        return data_client, file_path
+
+    def get_day(self, day):
+        schedule = self.metadata.schedule
+        rows = np.concatenate([[0], self.metadata.cumulative_daily_rows])
+        dataset_metadata = replace(self.metadata,
+                                   start=schedule['start'].iloc[day],
+                                   end=schedule['end'].iloc[day])
+        return self.array[rows[day]:rows[day + 1]], dataset_metadata
+
+
+class TestWindowedDownload(StubDownloadTest):
+
+    def test_windows_match_daily_requests(self):
+        daily_client, daily_path = self.download('daily.h5', row_budget=1)
+        # 3 weekdays span 54.5 hours, i.e. 110 bars per symbol. Windows
+        # do not span weekends, since Friday to Monday spans 78.5 hours.
+        windowed_client, windowed_path = self.download('windowed.h5',
+                                                       row_budget=330)
+
+        self.assertEqual(daily_client.n_calls, 20)
+        self.assertEqual(windowed_client.n_calls, 9)
+        self.assertLessEqual(max(windowed_client.returned_rows), 330)
+
+        daily_metadata, daily_datasets = from_hdf5(daily_path, 'BARS')
+        windowed_metadata, windowed_datasets = from_hdf5(
+            windowed_path, 'BARS')
+
+        self.assertEqual(windowed_metadata.start, daily_metadata.start)
+        self.assertEqual(windowed_metadata.end, daily_metadata.end)
+        self.assertEqual(windowed_metadata.n_rows, daily_metadata.n_rows)
+        np.testing.assert_array_equal(windowed_datasets[0][:],
+                                      daily_datasets[0][:])
+
+    def test_windows_respect_row_budget(self):
+        downloader = AlpacaDataDownloader(data_client=StubDataClient())
+        schedule = pd.DataFrame({
+            'start':
+            pd.date_range('2023-01-02 14:30', periods=10, freq='D', tz='UTC'),
+            'end':
+            pd.date_range('2023-01-02 21:00', periods=10, freq='D', tz='UTC')
+        })
+        windows = downloader._get_download_windows(
+            schedule=schedule,
+            dataset_type=AlpacaDataType.BAR,
+            n_symbols=3,
+            resolution=self.resolution,
+            row_budget=200)
+
+        # two days span 30.5 hours, i.e. 62 bars per symbol.
+        self.assertEqual([len(window) for window in windows], [2, 2, 2, 2, 2])
+        self.assertTrue(
+            pd.concat(windows)['start'].equals(schedule['start']))
+
+
+class TestResumableDownload(StubDownloadTest):
+
+    def test_resume_downloads_missing_days(self):
+        _, full_path = self.download('full.h5', row_budget=1)
+        self.download('resumed.h5', row_budget=1, end_date='2023-01-13')
+        data_client, resumed_path = self.download('resumed.h5', row_budget=1)
+
+        self.assertEqual(data_client.n_calls, 11)
+        full_metadata, full_datasets = from_hdf5(full_path, 'BARS')
+        resumed_metadata, resumed_datasets = from_hdf5(resumed_path, 'BARS')
+        self.assertEqual(resumed_metadata.n_rows, full_metadata.n_rows)
+        np.testing.assert_array_equal(resumed_datasets[0][:],
+                                      full_datasets[0][:])
+
+        checkpoint = from_checkpoint(resumed_path)['BARS']
+        self.assertEqual(checkpoint['n_rows'], full_metadata.n_rows)
+        self.assertEqual(checkpoint['days'], 20)
+
+    def test_resume_truncates_uncommitted_rows(self):
+        _, full_path = self.download('full.h5', row_budget=1)
+        _, resumed_path = self.download('resumed.h5',
+                                        row_budget=1,
+                                        end_date='2023-01-13')
+        with h5.File(resumed_path, 'a') as hdf5_file:
+            dataset = hdf5_file['BARS']
+            dataset.resize((len(dataset) + 5, dataset.shape[1]))
+            dataset[-5:] = -1
+
+        self.download('resumed.h5', row_budget=1)
+        _, full_datasets = from_hdf5(full_path, 'BARS')
+        _, resumed_datasets = from_hdf5(resumed_path, 'BARS')
+        np.testing.assert_array_equal(resumed_datasets[0][:],
+                                      full_datasets[0][:])
+
+    def test_up_to_date_dataset_is_not_downloaded(self):
+        self.download('full.h5', row_budget=1)
+        data_client, _ = self.download('full.h5', row_budget=1)
+        self.assertEqual(data_client.n_calls, 0)
+
+    def test_resume_from_later_start(self):
+        _, full_path = self.download('full.h5', row_budget=1)
+        self.download('resumed.h5', row_budget=1, end_date='2023-01-13')
+        self.start_date = '2023-01-17'
+        data_client, resumed_path = self.download('resumed.h5', row_budget=1)
+
+        self.assertEqual(data_client.n_calls, 11)
+        _, full_datasets = from_hdf5(full_path, 'BARS')
+        _, resumed_datasets = from_hdf5(resumed_path, 'BARS')
+        np.testing.assert_array_equal(resumed_datasets[0][:],
+                                      full_datasets[0][:])
+
+    def test_mismatched_request_is_not_downloaded(self):
+        self.download('resumed.h5', row_budget=1, end_date='2023-01-13')
+        data_client = StubDataClient()
+        requests = [
+            dict(symbols=['AAPL', 'MSFT']),
+            dict(symbols=['MSFT', 'AAPL', 'GOOG']),
+            dict(resolution=Resolution(15, Resolution.Unit.MINUTE)),
+            dict(start_date='2022-12-01', end_date='2022-12-30'),
+            dict(start_date='2022-12-30', end_date='2023-01-31'),
+            dict(start_date='2023-01-18', end_date='2023-01-31')
+        ]
+        for request in requests:
+            resolution = request.pop('resolution', self.resolution)
+            start_date = request.pop('start_date', self.start_date)
+            with mock.patch.multiple(self,
+                                     resolution=resolution,
+                                     start_date=start_date):
+                with self.assertRaises(ValueError):
+                    self.download('resumed.h5',
+                                  row_budget=1,
+                                  data_client=data_client,
+                                  **request)
+        self.assertEqual(data_client.n_calls, 0)
+
+    def test_lost_days_are_detected(self):
+        _, full_path = self.download('full.h5', row_budget=1)
+        _, resumed_path = self.download('resumed.h5',
+                                        row_budget=1,
+                                        end_date='2023-01-13')
+        shutil.copy(full_path + '.checkpoint', resumed_path + '.checkpoint')
+
+        with self.assertRaises(CorruptDataError):
+            self.download('resumed.h5', row_budget=1)
+
+
+class TestHDF5Writer(StubDownloadTest):
+
+    def setUp(self):
+        super().setUp()
+        _, file_path = self.download('full.h5', row_budget=200)
+        self.metadata, datasets = from_hdf5(file_path, 'BARS')
+        self.array = datasets[0][:]
+        self.file_path = os.path.join(self.directory.name, 'written.h5')
+
+    def test_appended_days_match_dataset(self):
+        with HDF5Writer(self.file_path,
+                        'BARS',
+                        extent_rows=7,
+                        checkpoint_interval=3) as writer:
+            for day in range(self.metadata.days):
+                numpy_array, dataset_metadata = self.get_day(day)
+                writer.append(numpy_array, dataset_metadata)
+
+        metadata, datasets = from_hdf5(self.file_path, 'BARS')
+        self.assertEqual(metadata.n_rows, self.metadata.n_rows)
+        self.assertEqual(len(datasets[0]), self.metadata.n_rows)
+        np.testing.assert_array_equal(datasets[0][:], self.array)
+        self.assertFalse(os.path.exists(self.file_path + '.checkpoint'))
+
+    def test_commits_keep_extent(self):
+        sizes = list()
+        with HDF5Writer(self.file_path,
+                        'BARS',
+                        extent_rows=100,
+                        checkpoint_interval=2,
+                        checkpoint=True) as writer:
+            for day in range(6):
+                writer.append(*self.get_day(day))
+                sizes.append(len(writer._dataset))
+
+        self.assertEqual(sizes, [100] * 6)
+        metadata, datasets = from_hdf5(self.file_path, 'BARS')
+        self.assertEqual(len(datasets[0]), 78)
+        self.assertEqual(from_checkpoint(self.file_path)['BARS']['days'], 6)
+
+    def test_to_hdf5_checkpoint_is_opt_in(self):
+        to_hdf5(self.file_path, *self.get_day(0), 'BARS')
+        self.assertFalse(os.path.exists(self.file_path + '.checkpoint'))
+        self.assertEqual(from_hdf5(self.file_path, 'BARS')[0].days, 1)
+
+    def test_mismatched_day_is_rejected(self):
+        numpy_array, dataset_metadata = self.get_day(1)
+        mismatched_metadata = [
+            replace(dataset_metadata,
+                    resolution=Resolution(15, Resolution.Unit.MINUTE)),
+            replace(dataset_metadata,
+                    data_schema=DataSchema(
+                        AlpacaDataType.BAR,
+                        FakeDataClient().symbols_to_assets(['AAPL', 'MSFT'])))
+        ]
+        for metadata in mismatched_metadata:
+            with self.assertRaises(ValueError):
+                with HDF5Writer(self.file_path, 'BARS') as writer:
+                    writer.append(*self.get_day(0))
+                    writer.append(numpy_array, metadata)
+            os.remove(self.file_path)
+
+    def test_compressed_layout_matches_dataset(self):
+        with HDF5Writer(self.file_path,
+                        'BARS',
+                        chunk_rows=26,
+                        compression='lzf',
+                        shuffle=True) as writer:
+            writer.append(self.array, self.metadata)
+
+        with h5.File(self.file_path, 'r') as hdf5_file:
+            dataset = hdf5_file['BARS']
+            self.assertEqual(dataset.chunks, (26, self.array.shape[1]))
+            self.assertEqual(dataset.compression, 'lzf')
+            self.assertTrue(dataset.shuffle)
+            np.testing.assert_array_equal(dataset[:], self.array)
+
+    def test_invalid_compression(self):
+        with self.assertRaises(ValueError):
+            HDF5Writer(self.file_path, 'BARS', compression='zstd')
+
+    def test_non_consecutive_day_keeps_preceding_days(self):
+        with self.assertRaises(ValueError):
+            with HDF5Writer(self.file_path, 'BARS',
+                            checkpoint=True) as writer:
+                writer.append(*self.get_day(0))
+                writer.append(*self.get_day(2))
+
+        metadata, datasets = from_hdf5(self.file_path, 'BARS')
+        self.assertEqual(metadata.days, 1)
+        self.assertEqual(len(datasets[0]), metadata.n_rows)
+        self.assertEqual(from_checkpoint(self.file_path)['BARS']['days'], 1)
+
+
+class TestMemmapStore(StubDownloadTest):
+
+    def setUp(self):
+        super().setUp()
+        _, file_path = self.download('full.h5',
+                                     row_budget=200,
+                                     symbols=['AAPL', 'MSFT'])
+        self.metadata, datasets = from_hdf5(file_path, 'BARS')
+        self.array = datasets[0][:]
+        _, file_path = self.download('other.h5',
+                                     row_budget=200,
+                                     symbols=['GOOG'])
+        self.other_metadata, datasets = from_hdf5(file_path, 'BARS')
+        self.other_array = datasets[0][:]
+        self.dir_path = os.path.join(self.directory.name, 'store')
+
+    def assert_metadata_equal(self, metadata, expected_metadata):
+        self.assertEqual(metadata, expected_metadata)
+        self.assertEqual(metadata.start, expected_metadata.start)
+        self.assertEqual(metadata.end, expected_metadata.end)
+        self.assertEqual(metadata.n_rows, expected_metadata.n_rows)
+
+    def test_appended_days_match_dataset(self):
+        for day in range(self.metadata.days):
+            to_memmap(self.dir_path, *self.get_day(day), 'BARS')
+
+        metadata, datasets = from_memmap(self.dir_path, 'BARS')
+        self.assert_metadata_equal(metadata, self.metadata)
+        self.assertIsInstance(datasets[0], np.memmap)
+        np.testing.assert_array_equal(datasets[0], self.array)
+
+    def test_joined_datasets_match_hdf5(self):
+        file_path = os.path.join(self.directory.name, 'joined.h5')
+        to_hdf5(file_path, self.array, self.metadata, 'TECH')
+        to_hdf5(file_path, self.other_array, self.other_metadata, 'GOOG')
+        hdf5_to_memmap(file_path, self.dir_path, n_rows_per_copy=100)
+
+        hdf5_metadata, hdf5_datasets = from_hdf5(file_path)
+        metadata, datasets = from_memmap(self.dir_path)
+
+        self.assert_metadata_equal(metadata, hdf5_metadata)
+        self.assert_metadata_equal(metadata,
+                                   self.metadata | self.other_metadata)
+        self.assertEqual(len(datasets), 2)
+        for dataset, hdf5_dataset in zip(datasets, hdf5_datasets):
+            np.testing.assert_array_equal(dataset, hdf5_dataset[:])
+
+        with self.assertRaises(ValueError):
+            hdf5_to_memmap(file_path, self.dir_path)
+
+    def test_mismatched_columns(self):
+        to_memmap(self.dir_path, *self.get_day(0), 'BARS')
+        numpy_array, dataset_metadata = self.get_day(1)
+        with self.assertRaises(ValueError):
+            to_memmap(self.dir_path, numpy_array[:, :-1], dataset_metadata,
+                      'BARS')
+
+
+class TestLayoutBenchmark(StubDownloadTest):
+
+    def setUp(self):
+        super().setUp()
+        self.file_path = os.path.join(self.directory.name, 'joined.h5')
+        for dataset_name, symbols in (('TECH', ['AAPL', 'MSFT']),
+                                      ('GOOG', ['GOOG'])):
+            _, file_path = self.download(f'{dataset_name}.h5',
+                                         row_budget=200,
+                                         symbols=symbols)
+            metadata, datasets = from_hdf5(file_path, 'BARS')
+            to_hdf5(self.file_path, datasets[0][:], metadata, dataset_name)
+            datasets[0].file.close()
+
+    def test_rewritten_layout_matches_dataset(self):
+        layout_path = os.path.join(self.directory.name, 'layout.h5')
+        _rewrite_hdf5_file(self.file_path, layout_path, {
+            'chunk_rows': 26,
+            'compression': 'lzf'
+        })
+
+        metadata, datasets = from_hdf5(self.file_path)
+        layout_metadata, layout_datasets = from_hdf5(layout_path)
+        self.assertEqual(layout_metadata, metadata)
+        self.assertEqual(layout_metadata.n_rows, metadata.n_rows)
+        for dataset, layout_dataset in zip(datasets, layout_datasets):
+            self.assertEqual(layout_dataset.chunks, (26, dataset.shape[1]))
+            np.testing.assert_array_equal(layout_dataset[:], dataset[:])
+
+    def test_benchmark_removes_rewritten_files(self):
+        dir_path = os.path.join(self.directory.name, 'layouts')
+        os.makedirs(dir_path)
+        results = benchmark_hdf5_layouts(self.file_path,
+                                         layouts=[{}, {
+                                             'compression': 'lzf',
+                                             'checkpoint': True
+                                         }],
+                                         dir_path=dir_path,
+                                         n_chunks=3,
+                                         n_repeats=1)
+
+        self.assertEqual(list(results.columns), [
+            'layout', 'size_mb', 'write_seconds', 'read_seconds',
+            'rows_per_second'
+        ])
+        self.assertEqual(len(results), 2)
+        self.assertTrue((results['rows_per_second'] > 0).all())
+        self.assertEqual(os.listdir(dir_path), [])
+
+    def test_chunks_fit_chunk_size(self):
+        writer = HDF5Writer(self.file_path, 'BARS')
+        metadata = SimpleNamespace(cumulative_daily_rows=[390])
+        for n_columns, chunk_rows in ((10, 390 * 64), (1000, 195),
+                                      (300_000, 1)):
+            self.assertEqual(
+                writer._get_day_aligned_chunk_rows(
+                    np.empty((0, n_columns)), metadata), chunk_rows)
+
+
+class TestMetadataSerialization(StubDownloadTest):
+
+    def setUp(self):
+        super().setUp()
+        _, self.file_path = self.download('full.h5', row_budget=200)
+        with h5.File(self.file_path, 'r') as hdf5_file:
+            self.attrs = dict(hdf5_file['BARS'].attrs)
+        self.metadata, _ = from_hdf5(self.file_path, 'BARS')
+
+    def test_metadata_is_readable_without_library(self):
+        metadata = json.loads(self.attrs['metadata'])
+        self.assertEqual(self.attrs['metadata_version'], 1)
+        self.assertEqual(metadata['n_rows'], self.metadata.n_rows)
+        prices_mask = self.metadata.asset_prices_mask
+        self.assertEqual(metadata['feature_schema']['ASSET_CLOSE_PRICE'],
+                         np.flatnonzero(prices_mask).tolist())
+        self.assertEqual(metadata['cumulative_daily_rows'][-1],
+                         self.metadata.n_rows)
+
+    def test_round_trip_matches_legacy_metadata(self):
+        metadata = deserialize_metadata(serialize_metadata(self.metadata))
+        legacy_metadata = deserialize_metadata(dill.dumps(self.metadata,
+                                                          protocol=0),
+                                               legacy=True)
+
+        for metadata_ in (metadata, legacy_metadata):
+            self.assertEqual(metadata_, self.metadata)
+            self.assertEqual(metadata_.start, self.metadata.start)
+            self.assertEqual(metadata_.end, self.metadata.end)
+            np.testing.assert_array_equal(
+                metadata_.cumulative_daily_rows,
+                self.metadata.cumulative_daily_rows)
+            self.assertEqual(metadata_.index_to_date(100),
+                             self.metadata.index_to_date(100))
+
+    def test_legacy_format_needs_migration(self):
+        with h5.File(self.file_path, 'a') as hdf5_file:
+            attrs = hdf5_file['BARS'].attrs
+            del attrs['metadata_version']
+            attrs['metadata'] = dill.dumps(self.metadata, protocol=0)
+        with self.assertRaisesRegex(CorruptDataError,
+                                    'migrate_hdf5_metadata'):
+            from_hdf5(self.file_path, 'BARS')
+
+        migrate_hdf5_metadata(self.file_path)
+        self.assertEqual(from_hdf5(self.file_path, 'BARS')[0], self.metadata)
+        with h5.File(self.file_path, 'r') as hdf5_file:
+            self.assertEqual(hdf5_file['BARS'].attrs['metadata_version'], 1)
+
+        with h5.File(self.file_path, 'a') as hdf5_file:
+            hdf5_file['BARS'].attrs['metadata'] = dill.dumps(self.metadata,
+                                                             protocol=0)
+        with self.assertRaises(CorruptDataError):
+            from_hdf5(self.file_path, 'BARS')
+        with self.assertRaises(CorruptDataError):
+            deserialize_metadata(dill.dumps(self.metadata))
+
+    def test_legacy_sidecar_needs_migration(self):
+        dir_path = os.path.join(self.directory.name, 'store')
+        hdf5_to_memmap(self.file_path, dir_path)
+        metadata_path = os.path.join(dir_path, 'BARS.meta')
+        with open(metadata_path) as metadata_file:
+            header = json.load(metadata_file)
+        header['metadata'] = self.metadata
+        with open(metadata_path, 'wb') as metadata_file:
+            metadata_file.write(dill.dumps(header))
+
+        with self.assertRaisesRegex(CorruptDataError,
+                                    'migrate_memmap_metadata'):
+            from_memmap(dir_path, 'BARS')
+
+        migrate_memmap_metadata(dir_path)
+        self.assertEqual(from_memmap(dir_path, 'BARS')[0], self.metadata)
+
+    def test_classes_are_not_imported_outside_library(self):
+        for class_path in ('xml.dom.minidom:Node', 'os:PathLike',
+                           'test_downloader:FakeDataClient'):
+            metadata = json.loads(serialize_metadata(self.metadata))
+            metadata['data_schema'][0]['assets'][0]['class'] = class_path
+            with self.assertRaises(CorruptDataError):
+                deserialize_metadata(json.dumps(metadata))
+        self.assertNotIn('xml.dom.minidom', sys.modules)
+
+
+class TestCachedDownload(StubDownloadTest):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = DownloadCache(
+            dir_path=os.path.join(self.directory.name, 'cache'))
+
+    def test_rebuild_from_cache_needs_no_requests(self):
+        _, uncached_path = self.download('uncached.h5', row_budget=200)
+        self.download('first.h5', row_budget=200, cache=self.cache)
+        data_client, rebuilt_path = self.download('rebuilt.h5',
+                                                  row_budget=1,
+                                                  cache=self.cache)
+
+        self.assertEqual(data_client.n_calls, 0)
+        _, uncached_datasets = from_hdf5(uncached_path, 'BARS')
+        _, rebuilt_datasets = from_hdf5(rebuilt_path, 'BARS')
+        np.testing.assert_array_equal(rebuilt_datasets[0][:],
+                                      uncached_datasets[0][:])
+
+    def test_only_uncached_symbols_are_requested(self):
+        self.download('first.h5',
+                      row_budget=200,
+                      cache=self.cache,
+                      symbols=['AAPL', 'MSFT'])
+        data_client, _ = self.download('second.h5',
+                                       row_budget=200,
+                                       cache=self.cache,
+                                       symbols=['AAPL', 'GOOG'])
+
+        self.assertGreater(data_client.n_calls, 0)
+        self.assertEqual(
+            set(tuple(symbols) for symbols in data_client.requested_symbols),
+            {('GOOG', )})
+
+    def get_dataset(self):
+        index = pd.MultiIndex.from_product(
+            [['AAPL'],
+             pd.date_range('2023-01-03 14:30', periods=13, freq='30min',
+                           tz='UTC')],
+            names=['symbol', 'timestamp'])
+        return pd.DataFrame({'close': np.random.rand(13)}, index=index)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        dataset = self.get_dataset()
+
+        self.cache.put(('BAR', 'AAPL', 0), dataset)
+        entry_size = self.cache._size
+        cache = DownloadCache(dir_path=self.cache.dir_path,
+                              max_size=2 * entry_size)
+        cache.put(('BAR', 'AAPL', 1), dataset)
+        cache.get(('BAR', 'AAPL', 0))
+        cache.put(('BAR', 'AAPL', 2), dataset)
+
+        self.assertIsNotNone(cache.get(('BAR', 'AAPL', 0)))
+        self.assertIsNone(cache.get(('BAR', 'AAPL', 1)))
+        self.assertTrue(cache.get(('BAR', 'AAPL', 2)).equals(dataset))
+
+    def test_unreadable_entries_are_misses(self):
+        dataset = self.get_dataset()
+        key = ('BAR', 'AAPL', 0)
+        self.cache.put(key, dataset)
+        other_cache = DownloadCache(dir_path=self.cache.dir_path)
+        other_cache.clear()
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache._size, 0)
+
+        self.cache.put(key, dataset)
+        with open(self.cache._get_file_path(key), 'r+b') as entry_file:
+            entry_file.truncate(100)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, dataset)
+        self.assertTrue(self.cache.get(key).equals(dataset))
+
+        cache = DownloadCache(dir_path=self.cache.dir_path,
+                              max_size=self.cache._size)
+        os.remove(self.cache._get_file_path(key))
+        cache.put(('BAR', 'AAPL', 1), dataset)
+        self.assertTrue(cache.get(('BAR', 'AAPL', 1)).equals(dataset))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from gym import ActionWrapper, Wrapper, spaces
+
+from neural.data.alpaca import AlpacaDataType
+from neural.data.base import DataSchema, DatasetMetadata, StaticDataFeeder
+from neural.data.enums import AssetType, CalendarType
+from neural.env.base import TrainMarketEnv
+from neural.utils.time import Resolution
+
+from test_downloader import FakeAsset
+
+try:
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.utils import set_random_seed
+    from neural.meta.agent import Agent
+    from neural.meta.pipe import AbstractPipe
+    from neural.model.base import StableBaselinesModel
+    from neural.train.evaluate import (_StackedPolicies, _get_predictors,
+                                       evaluate_agents)
+except ImportError as exception:
+    raise unittest.SkipTest(
+        f'Evaluation requires stable-baselines3 and torch: {exception}')
+
+
+class EquityRewardWrapper(Wrapper):
+
+    def get_equity(self):
+        return self.env.cash[0] + np.dot(self.env.asset_quantities,
+                                         self.env.asset_prices)
+
+    def reset(self, *args, **kwargs):
+        observation = self.env.reset()
+        self.equity = self.get_equity()
+        return observation
+
+    def step(self, actions):
+        observation, _, done, info = self.env.step(actions)
+        equity = self.get_equity()
+        reward = equity - self.equity
+        self.equity = equity
+        return observation, reward, done, info
+
+
+class BoundedActionWrapper(ActionWrapper):
+
+    def __init__(self, env, bound=100):
+        super().__init__(env)
+        self.bound = bound
+        self.action_space = spaces.Box(-bound,
+                                       bound,
+                                       shape=env.action_space.shape,
+                                       dtype=np.float32)
+
+    def action(self, actions):
+        return np.clip(actions, -self.bound, self.bound)
+
+
+class EquityRewardPipe(AbstractPipe):
+
+    def pipe(self, env):
+        return BoundedActionWrapper(EquityRewardWrapper(env))
+
+
+class EvaluateTest(unittest.TestCase):
+
+    def setUp(self):
+        assets = [
+            FakeAsset(symbol, AssetType.STOCK, True, True)
+            for symbol in ('AAPL', 'MSFT', 'TSLA')
+        ]
+        self.metadata = DatasetMetadata(
+            data_schema=DataSchema(AlpacaDataType.BAR, assets),
+            resolution=Resolution(1, Resolution.Unit.HOUR),
+            calendar_type=CalendarType.TWENTY_FOUR_SEVEN,
+            start=pd.Timestamp('2023-01-02', tz='UTC'),
+            end=pd.Timestamp('2023-01-03', tz='UTC'))
+        self.array = np.random.default_rng(0).uniform(
+            1, 2, size=(self.metadata.n_rows,
+                        self.metadata.n_features)).astype(np.float32)
+        self.agents = [self.get_agent(seed) for seed in range(3)]
+
+    def get_data_feeder(self):
+        return StaticDataFeeder(metadata=self.metadata,
+                                datasets=[self.array])
+
+    def get_agent(self, seed):
+        model = StableBaselinesModel(algorithm='ppo',
+                                     policy='MultiInputPolicy')
+        pipe = EquityRewardPipe()
+        set_random_seed(seed)
+        model.base_model = PPO(policy='MultiInputPolicy',
+                               env=pipe.pipe(
+                                   TrainMarketEnv(
+                                       data_feeder=self.get_data_feeder())))
+        return Agent(model=model,
+                     pipe=pipe,
+                     dataset_metadata=self.metadata)
+
+
+class TestStackedPolicies(EvaluateTest):
+
+    def test_actions_match_policies(self):
+        policies = [agent.model.base_model.policy for agent in self.agents]
+        stacked_policies = _StackedPolicies(policies)
+
+        market_env = TrainMarketEnv(data_feeder=self.get_data_feeder())
+        observation = market_env.reset()
+        for _ in range(5):
+            observations = [{
+                key: np.array(value) * (index + 1)
+                for key, value in observation.items()
+            } for index in range(len(policies))]
+
+            actions = stacked_policies.predict(observations)
+            for policy, observation_, action in zip(
+                    policies, observations, actions):
+                np.testing.assert_allclose(
+                    action,
+                    policy.predict(observation_, deterministic=True)[0],
+                    rtol=1e-5,
+                    atol=1e-6)
+
+            observation, _, _, _ = market_env.step(actions[0])
+
+    def test_models_are_grouped_by_architecture(self):
+        models = [agent.model for agent in self.agents]
+        models.insert(1, StableBaselinesModel(algorithm='ppo'))
+        predictors = _get_predictors(models)
+
+        self.assertEqual(sorted(indices for indices, _ in predictors),
+                         [[0, 2, 3], [1]])
+        self.assertEqual([indices for indices, _ in _get_predictors(
+            models, batch_inference=False)], [[0], [1], [2], [3]])
+
+
+class TestEvaluateAgents(EvaluateTest):
+
+    def get_rewards(self, agent):
+        market_env = agent.pipe(
+            TrainMarketEnv(data_feeder=self.get_data_feeder()))
+        observation = market_env.reset()
+        rewards = 0
+        done = False
+        while not done:
+            action, _ = agent.model.base_model.predict(observation,
+                                                       deterministic=True)
+            observation, reward, done, _ = market_env.step(action)
+            rewards += reward
+        return rewards
+
+    def test_rewards_match_single_agents(self):
+        rewards = [self.get_rewards(agent) for agent in self.agents]
+
+        for batch_inference in (True, False):
+            evaluated_rewards = evaluate_agents(
+                self.agents,
+                self.get_data_feeder(),
+                n_episodes=2,
+                batch_inference=batch_inference)
+            self.assertEqual(evaluated_rewards.shape, (3, 2))
+            for episode_rewards in evaluated_rewards.T:
+                np.testing.assert_allclose(episode_rewards,
+                                           rewards,
+                                           rtol=1e-4,
+                                           atol=1e-2)
+
+    def test_no_agents(self):
+        with self.assertRaises(ValueError):
+            evaluate_agents([], self.get_data_feeder())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from neural.data.enums import CalendarType
+from neural.utils.time import Calendar, ScheduleCache
+
+
+class TestScheduleCache(unittest.TestCase):
+
+    def setUp(self):
+        self.generated_ranges = list()
+        self.temporary_directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def generate(self, calendar_type, start_date, end_date):
+        self.generated_ranges.append(
+            (pd.Timestamp(start_date), pd.Timestamp(end_date)))
+        return Calendar.generate_schedule(calendar_type, start_date, end_date)
+
+    def get(self, cache, start_date, end_date,
+            calendar_type=CalendarType.NEW_YORK_STOCK_EXCHANGE):
+        return cache.get(calendar_type, start_date, end_date, self.generate)
+
+    def assert_schedule(self, schedule, start_date, end_date,
+                        calendar_type=CalendarType.NEW_YORK_STOCK_EXCHANGE):
+        pd.testing.assert_frame_equal(
+            schedule,
+            Calendar.generate_schedule(calendar_type, start_date, end_date),
+            check_dtype=False,
+            check_index_type=False,
+            check_freq=False)
+
+    def test_memoized_ranges(self):
+        cache = ScheduleCache()
+        schedule = self.get(cache, '2023-01-01', '2023-12-31')
+        self.assertIs(self.get(cache, '2023-01-01', '2023-12-31'), schedule)
+
+        sliced_schedule = self.get(cache, '2023-03-01', '2023-03-31')
+        self.assert_schedule(sliced_schedule, '2023-03-01', '2023-03-31')
+        self.assertEqual(len(self.generated_ranges), 1)
+
+        self.get(cache, '2023-12-01', '2024-01-31')
+        self.assertEqual(self.generated_ranges[-1],
+                         (pd.Timestamp('2023-01-01'),
+                          pd.Timestamp('2024-01-31')))
+
+    def test_disjoint_ranges(self):
+        cache = ScheduleCache()
+        self.get(cache, '2005-01-01', '2005-01-31')
+        schedule = self.get(cache, '2023-01-01', '2023-01-31')
+        self.assert_schedule(schedule, '2023-01-01', '2023-01-31')
+        self.assertEqual(self.generated_ranges[-1],
+                         (pd.Timestamp('2023-01-01'),
+                          pd.Timestamp('2023-01-31')))
+
+        self.assert_schedule(self.get(cache, '2005-01-10', '2005-01-20'),
+                             '2005-01-10', '2005-01-20')
+        self.assertEqual(len(self.generated_ranges), 2)
+
+        self.get(cache, '2005-03-01', '2005-03-31')
+        self.assertEqual(self.generated_ranges[-1],
+                         (pd.Timestamp('2005-01-01'),
+                          pd.Timestamp('2005-03-31')))
+        self.assertEqual(
+            len(cache._sessions[CalendarType.NEW_YORK_STOCK_EXCHANGE.value]),
+            2)
+
+    def test_eviction(self):
+        cache = ScheduleCache(max_memoized=2)
+        first_schedule = self.get(cache, '2023-01-01', '2023-01-31')
+        self.get(cache, '2023-01-01', '2023-01-15')
+        self.get(cache, '2023-01-01', '2023-01-31')
+        self.get(cache, '2023-01-01', '2023-01-20')
+
+        self.assertEqual(list(cache._memo), [
+            ('NYSE', pd.Timestamp('2023-01-01'), pd.Timestamp('2023-01-31')),
+            ('NYSE', pd.Timestamp('2023-01-01'), pd.Timestamp('2023-01-20'))
+        ])
+        self.assertIs(self.get(cache, '2023-01-01', '2023-01-31'),
+                      first_schedule)
+        self.assertEqual(len(self.generated_ranges), 1)
+
+    def test_stored_sessions(self):
+        cache = ScheduleCache(dir_path=self.temporary_directory.name)
+        for calendar_type in (CalendarType.NEW_YORK_STOCK_EXCHANGE,
+                              CalendarType.TWENTY_FOUR_FIVE):
+            self.get(cache, '2005-01-01', '2005-01-31', calendar_type)
+            self.get(cache, '2023-01-01', '2023-01-31', calendar_type)
+
+        loaded_cache = ScheduleCache(dir_path=self.temporary_directory.name)
+        n_generated_ranges = len(self.generated_ranges)
+        for calendar_type in (CalendarType.NEW_YORK_STOCK_EXCHANGE,
+                              CalendarType.TWENTY_FOUR_FIVE):
+            for start_date, end_date in (('2005-01-03', '2005-01-28'),
+                                         ('2023-01-01', '2023-01-31')):
+                self.assert_schedule(
+                    self.get(loaded_cache, start_date, end_date,
+                             calendar_type), start_date, end_date,
+                    calendar_type)
+        self.assertEqual(len(self.generated_ranges), n_generated_ranges)
+
+        loaded_cache.clear()
+        self.get(loaded_cache, '2010-01-01', '2010-01-31')
+        self.assertEqual(len(self.generated_ranges), n_generated_ranges + 1)
+        reloaded_cache = ScheduleCache(dir_path=self.temporary_directory.name)
+        self.assertEqual(
+            len(reloaded_cache._load(CalendarType.NEW_YORK_STOCK_EXCHANGE)), 3)
+
+    def test_concurrent_queries(self):
+        cache = ScheduleCache()
+        months = pd.date_range('2023-01-01', '2023-12-01', freq='MS')
+        schedules = dict()
+
+        def query(month):
+            end_date = month + pd.offsets.MonthEnd()
+            schedules[month] = self.get(cache, month, end_date)
+
+        threads = [
+            threading.Thread(target=query, args=(month, ))
+            for month in months
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for month, schedule in schedules.items():
+            self.assert_schedule(schedule, month,
+                                 month + pd.offsets.MonthEnd())
+        self.assertEqual(
+            len(cache._sessions[CalendarType.NEW_YORK_STOCK_EXCHANGE.value]),
+            1)
+
+
+class TestContinuousSchedule(unittest.TestCase):
+
+    def get_expected_schedule(self, start_date, end_date, weekdays_only):
+        days = pd.date_range(start_date, end_date, freq='D')
+        if weekdays_only:
+            days = days[days.dayofweek < 5]
+        start = days.tz_localize('UTC')
+        end = start + pd.Timedelta(days=1)
+        return pd.DataFrame({'start': start, 'end': end}, index=days)
+
+    def test_sessions_are_full_days(self):
+        for calendar_type, weekdays_only in (
+            (CalendarType.TWENTY_FOUR_SEVEN, False),
+            (CalendarType.TWENTY_FOUR_FIVE, True)):
+            for start_date, end_date in (('2023-01-01', '2023-01-01'),
+                                         ('2023-01-07', '2023-01-08'),
+                                         ('2020-02-20', '2020-03-10'),
+                                         ('2019-12-25', '2024-01-05')):
+                pd.testing.assert_frame_equal(
+                    Calendar.generate_schedule(calendar_type, start_date,
+                                               end_date),
+                    self.get_expected_schedule(start_date, end_date,
+                                               weekdays_only),
+                    check_dtype=False,
+                    check_index_type=False,
+                    check_freq=False)
+
+    def test_dates_with_time_zone(self):
+        schedule = Calendar.generate_continuous_schedule(
+            pd.Timestamp('2023-01-06 23:00', tz='UTC'),
+            pd.Timestamp('2023-01-09 01:00', tz='UTC'),
+            weekdays_only=True)
+        self.assertEqual(list(schedule.index),
+                         list(pd.DatetimeIndex(['2023-01-06', '2023-01-09'])))
+        self.assertTrue(
+            (schedule['end'] - schedule['start'] == pd.Timedelta(days=1)
+             ).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from neural.data.alpaca import AlpacaDataType
+from neural.data.base import DataSchema, DatasetMetadata
+from neural.data.enums import AssetType, CalendarType
+from neural.utils.io import to_hdf5
+from neural.utils.time import Resolution
+
+from test_downloader import FakeAsset
+
+try:
+    from neural.meta.agent import Agent
+    from neural.meta.pipe import AbstractPipe
+    from neural.model.base import AbstractModel
+    from neural.train.base import StableBaselinesTrainer
+except ImportError as exception:
+    raise unittest.SkipTest(
+        f'Trainers require stable-baselines3 and torch: {exception}')
+
+
+class IdentityPipe(AbstractPipe):
+
+    def pipe(self, env):
+        return env
+
+
+class SpaceCheckingModel(AbstractModel):
+    """
+    Records the spaces of the environment it is trained on, and checks
+    that observations it is called on fit them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.observation_space = None
+        self.action_space = None
+        self.n_calls = 0
+
+    def __call__(self, observation):
+        for key, space in self.observation_space.spaces.items():
+            if np.shape(observation[key]) != space.shape:
+                raise ValueError(f'Observation {key} has shape '
+                                 f'{np.shape(observation[key])}, expected '
+                                 f'{space.shape}.')
+        self.n_calls += 1
+        return np.zeros(self.action_space.shape)
+
+    def train(self, env, total_timesteps, progress_bar=False):
+        self.observation_space = env.observation_space
+        self.action_space = env.action_space
+
+        env.reset()
+        for _ in range(total_timesteps):
+            _, _, done, _ = env.step(env.action_space.sample())
+            if done:
+                env.reset()
+
+
+class TestEpisodeAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temporary_directory.name,
+                                      'dataset.hdf5')
+
+        assets = [
+            FakeAsset(symbol, AssetType.STOCK, True, True)
+            for symbol in ('AAPL', 'MSFT', 'TSLA')
+        ]
+        metadata = DatasetMetadata(
+            data_schema=DataSchema(AlpacaDataType.BAR, assets),
+            resolution=Resolution(1, Resolution.Unit.HOUR),
+            calendar_type=CalendarType.TWENTY_FOUR_SEVEN,
+            start=pd.Timestamp('2023-01-02', tz='UTC'),
+            end=pd.Timestamp('2023-01-06', tz='UTC'))
+        array = np.random.default_rng(0).uniform(
+            1, 2, size=(metadata.n_rows, metadata.n_features)).astype(
+                np.float32)
+        to_hdf5(self.file_path, array, metadata, 'BARS')
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def get_trainer(self, agent):
+        return StableBaselinesTrainer(agent=agent,
+                                      file_path=self.file_path,
+                                      dataset_name='BARS',
+                                      train_ratio=0.5,
+                                      async_envs=False,
+                                      episode_assets=2)
+
+    def test_train_and_test(self):
+        agent = Agent(model=SpaceCheckingModel(), pipe=IdentityPipe())
+        trainer = self.get_trainer(agent)
+        trainer.train(n_warmup_episodes=1, steps=100, progress_bar=False)
+        self.assertEqual(agent.model.action_space.shape, (2, ))
+
+        trainer.test(n_episodes=2, n_warmup_episodes=1)
+        self.assertGreater(agent.model.n_calls, 0)
+
+    def test_agents_trade_the_same_subsets(self):
+        agents = [
+            Agent(model=SpaceCheckingModel(), pipe=IdentityPipe())
+            for _ in range(2)
+        ]
+        trainer = self.get_trainer(agents[0])
+        for agent in agents:
+            agent.dataset_metadata = trainer.dataset_metadata
+            trainer.agent = agent
+            trainer.train(n_warmup_episodes=0, steps=10, progress_bar=False)
+
+        rewards = trainer.test_agents(agents, n_episodes=3, seed=0)
+        self.assertEqual(rewards.shape, (2, 3))
+        self.assertEqual(agents[0].model.n_calls, agents[1].model.n_calls)
+        self.assertEqual(len(trainer.test_data_feeder.assets), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()